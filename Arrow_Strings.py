@@ -0,0 +1,83 @@
+"""
+Arrow-Backed Text Columns for the EG Retail Sales cleaning pipeline
+Keeps the text columns in Arrow string arrays from ingest to the Parquet output (RETAIL_ARROW_STRINGS=1)
+
+Approach:
+1. ARROW_STRING_DTYPE is pandas' Arrow-backed string dtype: the values of a column live in one
+   contiguous Arrow buffer instead of one Python object per row, so .str.strip() / .str.lower() /
+   .str.replace() run as Arrow compute kernels and groupby / merge factorize the buffer directly
+2. to_arrow_strings() converts the columns whose values are all strings (missing values allowed);
+   mixed columns (Discount numbers and text, Latitude floats and "30,1" strings) stay object, so
+   the row-wise functions still see the raw values
+3. Retail_Sales_Cleaned.py converts the input frames after loading (or restoring a checkpoint) and
+   the stage outputs after the column stages and before the BI export: text produced by
+   Python-level code (.apply, the alias maps) goes back into Arrow before the next stages read it
+4. text_values() is .astype(str) followed by the Arrow conversion, for the sections that turn a
+   column into text before using the .str methods on it
+5. Arrow strings are written to Parquet as they are, without a pass over Python objects
+
+On pandas 3 (with pyarrow installed) ARROW_STRING_DTYPE is already the default "str" dtype: every
+text column is an Arrow string array from the load on, to_arrow_strings() finds nothing to convert
+and the option only switches the product text to standardize_texts. ARROW_STRINGS_BY_DEFAULT tells
+the two cases apart; the conversions matter on pandas < 3, where text columns are object columns.
+
+The dtype uses NaN, not pd.NA, for missing values (pandas' "str" dtype rather than the NA-valued
+"string[pyarrow]"): comparisons stay boolean, so masks and `if` tests behave like on object columns.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - the string dtype below needs it
+except ImportError:  # optional: only needed for Arrow-backed text columns
+    pyarrow = None
+
+
+def _arrow_string_dtype():
+    if pyarrow is None:
+        return None
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:  # pandas < 2.3 names the same dtype "pyarrow_numpy"
+        return pd.StringDtype('pyarrow_numpy')
+
+
+ARROW_STRING_DTYPE = _arrow_string_dtype()
+
+# True when pandas already infers Arrow strings for text (pandas 3 "str" dtype)
+ARROW_STRINGS_BY_DEFAULT = (ARROW_STRING_DTYPE is not None
+                            and pd.Series(['text'], dtype=object).infer_objects().dtype == ARROW_STRING_DTYPE)
+
+
+def _require_pyarrow():
+    if ARROW_STRING_DTYPE is None:
+        raise ImportError("pyarrow is required for Arrow-backed text columns")
+
+
+def is_text_column(values):
+    """True for a column whose non-missing values are all strings (and that has some)"""
+    if not (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)):
+        return False
+    return pd.api.types.infer_dtype(values, skipna=True) == 'string'
+
+
+def to_arrow_strings(df, columns=None):
+    """Converts the text columns of `df` (all, or those of `columns`) in place; returns their names"""
+    _require_pyarrow()
+    converted = []
+    for column in df.columns if columns is None else [column for column in columns if column in df.columns]:
+        values = df[column]
+        if values.dtype != ARROW_STRING_DTYPE and is_text_column(values):
+            df[column] = values.astype(ARROW_STRING_DTYPE)
+            converted.append(column)
+    return converted
+
+
+def text_values(values, arrow=True):
+    """values.astype(str), kept in an Arrow string array when `arrow` is set"""
+    text = values.astype(str)
+    if arrow:
+        _require_pyarrow()
+        text = text.astype(ARROW_STRING_DTYPE)
+    return text
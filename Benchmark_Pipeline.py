@@ -0,0 +1,184 @@
+"""
+Benchmark Harness for the EG Retail Sales cleaning pipeline
+Runs Retail_Sales_Cleaned.py on synthetic inputs and reports rows/sec and peak memory per stage
+
+Approach:
+1. Synthetic_Data_Generator.py writes one input per (rows, seed) into the benchmark folder; it is
+   reused by later runs, so two commits are always measured on byte-identical data
+2. The cleaner runs in a fresh process with RETAIL_RAW_INPUT / RETAIL_OUTPUT_DIR pointing at the
+   benchmark folder and RETAIL_MAPPING_CONFIG at the repo's Category_Mappings.json, so no path
+   outside the repo is read; the OrderID registry is deleted first and stage checkpoints are
+   switched off, so every run starts from the same state
+3. The per-stage records come from the StageProfiler run log the cleaner already writes
+   (Pipeline_Run_Log.json); rows/sec is rows_in / wall_seconds of each stage
+4. Every stage record is appended to Benchmark_History.csv with the git commit, scale, seed,
+   lean mode and library versions, and the run is compared with the latest run of another commit
+
+Usage:
+    python Benchmark_Pipeline.py --rows 10000 100000 1000000
+    python Benchmark_Pipeline.py --rows 10000000 --lean            # Parquet input, lean mode
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from Synthetic_Data_Generator import EXCEL_MAX_ROWS, write_synthetic_input
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(REPO_DIR, "benchmarks")
+PIPELINE_SCRIPT = os.path.join(REPO_DIR, "Retail_Sales_Cleaned.py")
+MAPPING_CONFIG = os.path.join(REPO_DIR, "Category_Mappings.json")
+HISTORY_FILE = "Benchmark_History.csv"
+
+HISTORY_FIELDS = [
+    'commit', 'dirty', 'benchmarked_at', 'rows', 'seed', 'lean_mode', 'stage',
+    'wall_seconds', 'cpu_seconds', 'rows_per_second', 'peak_rss_mb', 'df_memory_out_mb',
+    'rows_in', 'rows_out', 'python', 'pandas', 'numpy', 'machine',
+]
+
+
+def git_revision():
+    """(short commit hash, True if the working tree has uncommitted changes)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, bool(status)
+
+
+def ensure_input(rows, seed, bench_dir=BENCH_DIR):
+    """Path of the synthetic input for (rows, seed); generated once and reused afterwards"""
+    os.makedirs(bench_dir, exist_ok=True)
+    name = f"Synthetic_{rows}_seed{seed}"
+    path = os.path.join(bench_dir, f"{name}.xlsx" if rows <= EXCEL_MAX_ROWS else name)
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        write_synthetic_input(path, rows, seed)
+        print(f"Generated {rows:,} synthetic orders in {time.perf_counter() - started:.1f}s -> {path}")
+    return path
+
+
+def run_pipeline(input_path, run_dir, lean=False):
+    """Runs the cleaner on `input_path` in a fresh process; returns its stage records"""
+    os.makedirs(run_dir, exist_ok=True)
+    for leftover in ["OrderID_Registry.sqlite", "Pipeline_Run_Log.json"]:
+        if os.path.exists(os.path.join(run_dir, leftover)):
+            os.remove(os.path.join(run_dir, leftover))
+
+    # Every path the cleaner reads or writes is inside the repo or the benchmark folder
+    env = dict(os.environ, RETAIL_RAW_INPUT=input_path, RETAIL_OUTPUT_DIR=run_dir,
+               RETAIL_MAPPING_CONFIG=MAPPING_CONFIG, RETAIL_LEAN_MODE='1' if lean else '0',
+               RETAIL_CHECKPOINTS='0', MPLBACKEND='Agg')
+    with open(os.path.join(run_dir, "pipeline_output.txt"), 'w', encoding='utf-8') as output:
+        result = subprocess.run([sys.executable, PIPELINE_SCRIPT], cwd=REPO_DIR, env=env,
+                                stdout=output, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Retail_Sales_Cleaned.py failed (exit {result.returncode}); "
+                           f"see {os.path.join(run_dir, 'pipeline_output.txt')}")
+
+    with open(os.path.join(run_dir, "Pipeline_Run_Log.json"), encoding='utf-8') as log_file:
+        return json.load(log_file)['stages']
+
+
+def stage_rows(records, rows, seed, lean, commit, dirty):
+    """Benchmark history rows (one per stage plus a 'TOTAL' row) for one pipeline run"""
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    versions = {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                'machine': f"{platform.system()} {platform.machine()}"}
+    total = {'stage': 'TOTAL',
+             'wall_seconds': sum(record['wall_seconds'] for record in records),
+             'cpu_seconds': sum(record['cpu_seconds'] for record in records),
+             'peak_rss_mb': max(record['peak_rss_mb'] for record in records),
+             'df_memory_out_mb': records[-1]['df_memory_out_mb'],
+             'rows_in': rows, 'rows_out': records[-1]['rows_out']}
+    history = []
+    for record in records + [total]:
+        processed = record['rows_in'] if record['rows_in'] is not None else record['rows_out']
+        history.append({
+            'commit': commit, 'dirty': dirty, 'benchmarked_at': started_at,
+            'rows': rows, 'seed': seed, 'lean_mode': lean, 'stage': record['stage'],
+            'wall_seconds': round(record['wall_seconds'], 4),
+            'cpu_seconds': round(record['cpu_seconds'], 4),
+            'rows_per_second': round(processed / record['wall_seconds']) if processed and record['wall_seconds'] else None,
+            'peak_rss_mb': round(record['peak_rss_mb'], 1),
+            'df_memory_out_mb': round(record['df_memory_out_mb'], 2) if record['df_memory_out_mb'] is not None else None,
+            'rows_in': record['rows_in'], 'rows_out': record['rows_out'],
+            **versions,
+        })
+    return history
+
+
+def append_history(history, path):
+    """Appends benchmark rows to the CSV history (header written once)"""
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='', encoding='utf-8') as history_file:
+        writer = csv.DictWriter(history_file, fieldnames=HISTORY_FIELDS)
+        if write_header:
+            writer.writeheader()
+        writer.writerows(history)
+
+
+def compare_with_previous(history, path):
+    """Per-stage wall time and peak RSS against the latest run of another commit at the same scale"""
+    current = pd.DataFrame(history)
+    commit, rows, seed, lean = current.loc[0, ['commit', 'rows', 'seed', 'lean_mode']]
+    if not os.path.exists(path):
+        return "No benchmark history to compare with."
+    past = pd.read_csv(path)
+    past = past[(past['commit'] != commit) & (past['rows'] == rows) & (past['seed'] == seed)
+                & (past['lean_mode'] == lean)]
+    if past.empty:
+        return f"No earlier commit benchmarked at {rows:,} rows (seed {seed}, lean={lean})."
+
+    previous_run = past[past['benchmarked_at'] == past['benchmarked_at'].max()]
+    merged = current.merge(previous_run, on='stage', how='left', suffixes=('', '_previous'))
+    merged['wall_change_%'] = (merged['wall_seconds'] / merged['wall_seconds_previous'] - 1) * 100
+    merged['peak_rss_change_mb'] = merged['peak_rss_mb'] - merged['peak_rss_mb_previous']
+    columns = ['stage', 'wall_seconds_previous', 'wall_seconds', 'wall_change_%',
+               'peak_rss_mb_previous', 'peak_rss_mb', 'peak_rss_change_mb']
+    return (f"Compared with commit {previous_run['commit'].iloc[0]} ({previous_run['benchmarked_at'].iloc[0]}):\n"
+            + merged[columns].round(2).to_string(index=False))
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arguments.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    arguments.add_argument('--seed', type=int, default=42)
+    arguments.add_argument('--lean', action='store_true', help="run the cleaner with RETAIL_LEAN_MODE=1")
+    arguments.add_argument('--bench-dir', default=BENCH_DIR)
+    options = arguments.parse_args()
+
+    commit, dirty = git_revision()
+    if dirty:
+        print("⚠️ Uncommitted changes: results are recorded with dirty=True")
+    history_path = os.path.join(options.bench_dir, HISTORY_FILE)
+
+    for rows in options.rows:
+        input_path = ensure_input(rows, options.seed, options.bench_dir)
+        run_dir = os.path.join(options.bench_dir, f"run_{rows}_seed{options.seed}{'_lean' if options.lean else ''}")
+        records = run_pipeline(input_path, run_dir, options.lean)
+        history = stage_rows(records, rows, options.seed, options.lean, commit, dirty)
+
+        print(f"\n----- {rows:,} rows (seed {options.seed}, lean={options.lean}, commit {commit}) -----")
+        print(pd.DataFrame(history)[['stage', 'wall_seconds', 'rows_per_second', 'peak_rss_mb',
+                                     'df_memory_out_mb']].to_string(index=False))
+        print(compare_with_previous(history, history_path))
+        append_history(history, history_path)
+
+    print(f"\n✅ Benchmark history: {history_path}")
+
+
+if __name__ == '__main__':
+    main()
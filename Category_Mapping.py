@@ -0,0 +1,68 @@
+"""
+Lookup-Table Mapping Engine for EG Retail Sales Case Study
+Applies every alias table from Category_Mappings.json through categorical code remapping
+
+Each rule in the config looks like:
+    "PaymentStatus_Clean": {
+        "source": "PaymentStatus",          # column the raw values are read from
+        "unmapped": "keep" | "null",        # keep = .replace() behaviour, null = .map() behaviour
+        "fill_missing": "Unknown",          # optional value for nulls (and for unmapped with "null")
+        "canonical": ["Paid", "Unpaid"],    # already-clean values (not reported as unmapped)
+        "aliases": {"مدفوع": "Paid"}        # raw spelling -> clean value
+    }
+
+The column is factorized once, the alias table is applied to the UNIQUE values only and
+the rows are rebuilt from the codes, so each column costs O(unique) lookups + O(n) indexing.
+Adding a new spelling is a config edit, not a code change.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class CategoryMapper:
+    """Holds the alias tables and collects the unmapped values seen per column"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.unmapped = {}
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, encoding='utf-8') as config_file:
+            return cls(json.load(config_file))
+
+    def map_series(self, series, target):
+        """Maps a Series with the rule stored under `target` and returns the clean Series"""
+        rule = self.rules[target]
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Series(uniques, dtype=object)
+
+        mapped = uniques.map(rule['aliases'])
+        is_canonical = uniques.isin(rule.get('canonical', []))
+        if rule.get('unmapped', 'keep') == 'keep':
+            mapped = mapped.fillna(uniques)
+        else:
+            mapped = mapped.fillna(uniques.where(is_canonical))
+
+        unmapped_values = uniques[mapped.isna() | ~(uniques.isin(rule['aliases'].keys()) | is_canonical)]
+        self.unmapped[target] = sorted(unmapped_values.astype(str).tolist())
+
+        # The extra last slot receives code -1 (null input)
+        lookup = np.append(mapped.to_numpy(dtype=object), np.nan)
+        result = pd.Series(lookup[codes], index=series.index, dtype=object)
+        if 'fill_missing' in rule:
+            result = result.fillna(rule['fill_missing'])
+        return result
+
+    def apply(self, df, target):
+        """Writes `target` into `df` from the rule's source column"""
+        df[target] = self.map_series(df[self.rules[target]['source']], target)
+        return df[target]
+
+    def unmapped_report(self):
+        """One row per column and raw value that no alias or canonical value covered"""
+        rows = [(column, value) for column, values in self.unmapped.items() for value in values]
+        return pd.DataFrame(rows, columns=['Column', 'Unmapped_Value'])
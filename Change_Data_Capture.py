@@ -0,0 +1,185 @@
+"""
+Change Data Capture for the EG Retail Sales BI dataset
+Compares the BI rows of this run with the previous run's snapshot and writes only the changed rows
+
+Approach:
+1. Every BI row gets a 64-bit Row_Hash of all its columns; the snapshot of a run is just
+   OrderID_cleaned + Row_Hash, so it stays small however wide the BI dataset gets
+2. The snapshot is hash-partitioned: a row goes to bucket hash(OrderID_cleaned) % CDC_BUCKETS, one
+   Parquet file per bucket. The same key always lands in the same bucket, so the diff runs bucket by
+   bucket and only one bucket of the previous snapshot is in memory at a time
+3. Per bucket, a merge on OrderID_cleaned gives the operation of every key:
+   I (insert) - only in this run;  U (update) - in both runs with a different Row_Hash;
+   D (delete) - only in the previous run (the delta row carries the key, the other columns are null)
+4. The changed rows of the buckets are collected and appended to BI_Sales_Delta.parquet in row
+   groups of DELTA_ROW_GROUP_ROWS (CDC_Op + the BI columns): a small nightly delta is one row group,
+   not one per bucket. The warehouse applies it as upserts/deletes instead of reloading the dataset
+5. The new snapshot is written next to the old one and swapped in only after the delta is complete,
+   so a run that crashes halfway diffs against the same previous snapshot again
+
+Without a previous snapshot (the first run, or after deleting the folder) every row is an insert.
+OrderID_cleaned must be unique and not null: it is the key the warehouse upserts on.
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for the change-data-capture delta
+    pa = pq = None
+
+CDC_KEY = 'OrderID_cleaned'
+CDC_BUCKETS = 64
+CDC_OPERATIONS = {'insert': 'I', 'update': 'U', 'delete': 'D'}
+BUCKET_FILE = 'bucket-{:03d}.parquet'
+DELTA_ROW_GROUP_ROWS = 100_000
+
+
+def row_hashes(df):
+    """64-bit hash of every row's values (same values -> same hash in every run)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+
+def key_buckets(keys, buckets=CDC_BUCKETS):
+    """Snapshot bucket of every key"""
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64)
+            % np.uint64(buckets)).astype(np.intp)
+
+
+def _read_bucket(snapshot_dir, bucket):
+    """OrderID_cleaned/Row_Hash of one bucket of a snapshot (empty when it does not exist)"""
+    path = os.path.join(snapshot_dir, BUCKET_FILE.format(bucket))
+    if not os.path.exists(path):
+        return pd.DataFrame({CDC_KEY: pd.Series(dtype=object), 'Row_Hash': pd.Series(dtype=np.uint64)})
+    return pd.read_parquet(path)
+
+
+class ChangeDataCapture:
+    """
+    Delta of one run against the snapshot in `snapshot_dir`.
+    counts - rows per operation code after write_delta()
+    """
+
+    def __init__(self, snapshot_dir, delta_path, buckets=CDC_BUCKETS, key=CDC_KEY,
+                 row_group_rows=DELTA_ROW_GROUP_ROWS):
+        if pq is None:
+            raise ImportError("pyarrow is required to write the change-data-capture delta")
+        self.snapshot_dir = snapshot_dir
+        self.delta_path = delta_path
+        self.buckets = buckets
+        self.key = key
+        self.row_group_rows = row_group_rows
+        self.counts = {code: 0 for code in CDC_OPERATIONS.values()}
+        self.unchanged = 0
+
+    def _check_keys(self, keys):
+        missing = int(keys.isna().sum())
+        duplicated = int(keys.duplicated().sum())
+        if missing or duplicated:
+            raise ValueError(f"{self.key} is the change-data-capture key: {missing} rows have no key, "
+                             f"{duplicated} rows repeat a key")
+
+    def _previous_buckets(self):
+        """Bucket count of the previous snapshot (None when there is none)"""
+        if not os.path.isdir(self.snapshot_dir):
+            return None
+        files = [name for name in os.listdir(self.snapshot_dir) if name.endswith('.parquet')]
+        return len(files) or None
+
+    def write_delta(self, df):
+        """Writes the inserted/updated/deleted rows of `df` to delta_path and rotates the snapshot"""
+        keys = df[self.key]
+        self._check_keys(keys)
+        hashes = row_hashes(df)
+        buckets = key_buckets(keys, self.buckets)
+
+        # A snapshot written with another bucket count is re-bucketed into one frame first
+        previous_all = None
+        previous_buckets = self._previous_buckets()
+        if previous_buckets is not None and previous_buckets != self.buckets:
+            previous_all = pd.concat([_read_bucket(self.snapshot_dir, bucket) for bucket in range(previous_buckets)],
+                                     ignore_index=True)
+            previous_all['bucket'] = key_buckets(previous_all[self.key], self.buckets)
+
+        new_snapshot = self.snapshot_dir + '.new'
+        shutil.rmtree(new_snapshot, ignore_errors=True)
+        os.makedirs(new_snapshot)
+        schema = pa.Schema.from_pandas(df, preserve_index=False).insert(0, pa.field('CDC_Op', pa.string()))
+        temporary = self.delta_path + '.tmp'
+        self._buffered, self._buffered_rows = [], 0
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(self.buckets + 1))
+
+        with pq.ParquetWriter(temporary, schema) as writer:
+            for bucket in range(self.buckets):
+                positions = order[bounds[bucket]:bounds[bucket + 1]]
+                current = pd.DataFrame({self.key: keys.iloc[positions].to_numpy(dtype=object),
+                                        'Row_Hash': hashes[positions]})
+                pq.write_table(pa.Table.from_pandas(current, preserve_index=False),
+                               os.path.join(new_snapshot, BUCKET_FILE.format(bucket)))
+
+                if previous_all is not None:
+                    previous = previous_all.loc[previous_all['bucket'] == bucket, [self.key, 'Row_Hash']]
+                elif previous_buckets is not None:
+                    previous = _read_bucket(self.snapshot_dir, bucket)
+                else:
+                    previous = current.iloc[:0]
+                self._write_bucket(writer, schema, df, positions, current, previous)
+            self._flush(writer, final=True)
+
+        os.replace(temporary, self.delta_path)
+        # Swap the snapshots only once the delta is complete
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+        os.replace(new_snapshot, self.snapshot_dir)
+        return self
+
+    def _write_bucket(self, writer, schema, df, positions, current, previous):
+        merged = current.assign(position=positions).merge(previous, on=self.key, how='outer',
+                                                          suffixes=('', '_previous'), indicator=True)
+        inserted = merged['_merge'] == 'left_only'
+        updated = (merged['_merge'] == 'both') & (merged['Row_Hash'] != merged['Row_Hash_previous'])
+        deleted = merged['_merge'] == 'right_only'
+        self.unchanged += int(((merged['_merge'] == 'both') & ~updated).sum())
+
+        changed = inserted | updated
+        if changed.any():
+            rows = df.iloc[merged.loc[changed, 'position'].astype(np.intp).to_numpy()]
+            rows = rows.assign(CDC_Op=np.where(inserted[changed], 'I', 'U'))[schema.names]
+            self._buffer(writer, pa.Table.from_pandas(rows, schema=schema, preserve_index=False))
+        if deleted.any():
+            # Only the key of a deleted row: every other column is null
+            count = int(deleted.sum())
+            columns = {'CDC_Op': pa.array(['D'] * count, pa.string()),
+                       self.key: pa.array(merged.loc[deleted, self.key].to_numpy(dtype=object),
+                                          schema.field(self.key).type)}
+            self._buffer(writer, pa.table([columns.get(field.name, pa.nulls(count, field.type)) for field in schema],
+                                          schema=schema))
+        self.counts['I'] += int(inserted.sum())
+        self.counts['U'] += int(updated.sum())
+        self.counts['D'] += int(deleted.sum())
+
+    def _buffer(self, writer, table):
+        """Collects changed rows until a full row group can be written"""
+        self._buffered.append(table)
+        self._buffered_rows += table.num_rows
+        if self._buffered_rows >= self.row_group_rows:
+            self._flush(writer)
+
+    def _flush(self, writer, final=False):
+        """Writes the full row groups of the buffer (and the rest when `final`)"""
+        if not self._buffered_rows:
+            return
+        table = pa.concat_tables(self._buffered).combine_chunks()
+        complete = table.num_rows if final else table.num_rows - table.num_rows % self.row_group_rows
+        writer.write_table(table.slice(0, complete), row_group_size=self.row_group_rows)
+        rest = table.slice(complete)
+        self._buffered, self._buffered_rows = ([rest], rest.num_rows) if rest.num_rows else ([], 0)
+
+    def summary(self):
+        return (f"{self.counts['I']} inserted, {self.counts['U']} updated, {self.counts['D']} deleted, "
+                f"{self.unchanged} unchanged")
@@ -0,0 +1,168 @@
+"""
+Column Pruning Planner for the EG Retail Sales cleaning pipeline
+Works backwards from a declared output schema to the stages and raw columns it needs
+
+Approach:
+1. Every stage of Retail_Sales_Cleaned.py declares the columns it reads and writes (STAGES)
+2. Walking the stages in reverse, a stage is required when it writes a column that is
+   still needed; its reads then become needed too
+3. The raw Sales_Orders_Raw columns that are still needed at the top become `usecols`
+   for the ingest, and the last stage that touches each column gives the lean-mode
+   release schedule (see Lean_Execution.py)
+4. Consumers of the BI file (Create_Dashboard.py, the KPI cube) declare the columns they read, and a
+   request for a column the cleaner never exports fails before any work is done
+
+'*' as a read means "every raw column" (Initial Inspection profiles them all).
+DQ_Flags (Quality_Flags.py) is created by the OrderID stage and gains bits in later stages. Like any
+other column, a needed accumulated column makes EVERY stage that writes it required: the exported
+DQ_Flags keeps the coordinate bits of Latitude/Longitude in lean mode too.
+When a section of the script starts reading or writing a new column, declare it here: the stage
+scheduler (Stage_Scheduler.py) gives a stage only the columns it declares and fails on any other.
+"""
+
+from Customer_Matching import DIM_CUSTOMER_COLUMNS
+from Order_Deduplication import FINGERPRINT_COLUMNS
+
+ALL_RAW_COLUMNS = '*'
+
+# Columns later stages only add to (flag bits ORed in); Stage_Scheduler.py merges them the same way
+ACCUMULATED_COLUMNS = ['DQ_Flags']
+
+RAW_SALES_COLUMNS = [
+    'OrderID', 'OrderDate', 'DeliveryDate', 'CustomerID', 'CustomerName', 'Gender', 'Phone', 'Email',
+    'Governorate', 'City', 'Address', 'Latitude', 'Longitude', 'ProductSKU', 'ProductName', 'Category',
+    'UnitPrice', 'Quantity', 'Subtotal', 'Discount', 'TotalAmount', 'Currency', 'PaymentMethod',
+    'PaymentStatus', 'ShipperName', 'ShippingCost', 'SalesRep', 'Channel', 'ReturnFlag', 'ReturnDate',
+    'Status', 'Notes',
+]
+
+# (stage, reads, writes) in the order the script runs them
+STAGES = [
+    ('Initial Inspection', [ALL_RAW_COLUMNS], []),
+    ('OrderID', list(dict.fromkeys(['OrderID', 'CustomerID'] + FINGERPRINT_COLUMNS)),
+     ['OrderID_cleaned', 'Original OrderID', 'DQ_Flags']),
+    ('Dates', ['OrderDate', 'DeliveryDate', 'ReturnDate', 'ReturnFlag'],
+     ['OrderDate', 'DeliveryDate', 'ReturnDate', 'ReturnFlag_Clean']),
+    ('BI Date Columns', ['OrderDate', 'DeliveryDate', 'ReturnDate'],
+     ['Order_Year', 'Order_Month', 'Order_Quarter', 'Order_YearMonth',
+      'Delivery_Year', 'Delivery_Month', 'Delivery_Quarter', 'Delivery_YearMonth',
+      'Return_Year', 'Return_Month', 'Return_Quarter', 'Return_YearMonth',
+      'Delivery_Time_Days', 'Delivery_Delayed', 'Return_Time_Days']),
+    ('CustomerName', ['CustomerName'], ['CustomerName_clean']),
+    ('Phone', ['Phone'], ['Phone_Clean', 'Phone_Type', 'Phone_IsValid']),
+    ('Customer Matching', DIM_CUSTOMER_COLUMNS, ['Customer_Key', 'Customer_Match']),
+    ('Gender', ['Gender'], ['Gender_Clean']),
+    ('Governorate', ['Governorate', 'City'], ['Governorate_Clean']),
+    ('PaymentStatus', ['PaymentStatus'], ['PaymentStatus_Clean']),
+    ('PaymentMethod', ['PaymentMethod'], ['PaymentMethod_Clean']),
+    ('Status', ['Status', 'Channel', 'PaymentStatus', 'OrderDate'], ['Status_Clean']),
+    ('ShipperName', ['ShipperName'], ['ShipperName_Clean']),
+    ('Channel', ['Channel'], ['Channel_Clean']),
+    ('Validation Rules', ['OrderDate', 'DeliveryDate', 'ReturnDate', 'Subtotal', 'UnitPrice', 'Quantity',
+                          'Latitude', 'Longitude', 'Channel_Clean', 'ShipperName', 'ShippingCost',
+                          'ReturnFlag_Clean', 'PaymentStatus_Clean', 'Status_Clean'],
+     ['Valid_Delivery', 'Valid_Return', 'DQ_Flags']),
+    ('Latitude/Longitude', ['Latitude', 'Longitude', 'Address', 'City', 'Governorate'],
+     ['Latitude_Clean', 'Longitude_Clean', 'DQ_Flags']),
+    ('Product Text', ['ProductSKU', 'ProductName', 'Category'],
+     ['ProductSKU_Clean', 'ProductName_Clean', 'Category_Clean']),
+    ('Product Lookup', ['ProductSKU_Clean', 'ProductName_Clean', 'Category_Clean'],
+     ['ProductSKU_Clean', 'Category_Clean', 'DQ_Flags']),
+    ('Monetary', ['UnitPrice', 'Quantity', 'Subtotal', 'Discount', 'TotalAmount', 'Currency', 'ProductSKU_Clean',
+                  'DQ_Flags'],
+     ['Currency_Clean', 'FX_Rate', 'UnitPrice_EGP', 'Quantity_Clean', 'Subtotal_Calc', 'Discount_Rate_Clean',
+      'UnitPrice_EGP_capped', 'Subtotal_Calc_Capped']),
+    ('Shipping Cost', ['ShippingCost', 'ShipperName_Clean', 'Governorate_Clean', 'City', 'Channel_Clean',
+                       'Subtotal_Calc_Capped', 'Discount_Rate_Clean', 'UnitPrice_EGP_capped', 'Quantity_Clean'],
+     ['ShippingCost_Filled', 'TotalAmount_Calc', 'DQ_Flags', 'Test_Subtotal']),
+]
+
+# Columns of BI_Ready_Sales_Dataset.xlsx read by Create_Dashboard.py: only the detail rows of the
+# order lists; every other KPI comes from the KPI cube (Dashboard_KPIs.CUBE_SOURCE_COLUMNS)
+DASHBOARD_COLUMNS = [
+    'OrderID_cleaned', 'OrderDate', 'Order_YearMonth', 'Delivery_Time_Days', 'Delivery_Delayed',
+    'ProductName_Clean', 'TotalAmount_Calc', 'PaymentStatus_Clean', 'CustomerName_clean',
+    'Governorate_Clean', 'Status_Clean',
+]
+
+
+def expand_columns(columns):
+    """`columns` with ALL_RAW_COLUMNS replaced by the raw column names"""
+    expanded = []
+    for column in columns:
+        expanded.extend(RAW_SALES_COLUMNS if column == ALL_RAW_COLUMNS else [column])
+    return expanded
+
+
+def check_consumer(consumer, requested, exported):
+    """Raises ValueError when `consumer` reads columns that are not in the exported schema"""
+    missing = [column for column in requested if column not in set(exported)]
+    if missing:
+        raise ValueError(f"{consumer} reads columns the cleaner never exports: {missing}. "
+                         f"Add them to bi_columns in Retail_Sales_Cleaned.py or stop reading them.")
+
+
+class PipelinePlan:
+    """The stages to run, the raw columns to load and when each column can be released"""
+
+    def __init__(self, output_columns, stages, raw_columns):
+        self.output_columns = list(output_columns)
+        self.stages = stages
+        self.raw_columns = raw_columns
+
+    @property
+    def stage_names(self):
+        return [name for name, _, _ in self.stages]
+
+    def runs(self, stage):
+        return stage in self.stage_names
+
+    def usecols(self, column):
+        """Callable for read_excel(usecols=...): True for the raw columns the plan needs"""
+        return column in self.raw_columns
+
+    def release_schedule(self):
+        """{stage: columns} - each column is released after the last planned stage that touches it"""
+        last_touch = {}
+        for name, reads, writes in self.stages:
+            for column in expand_columns(reads) + writes:
+                last_touch[column] = name
+        schedule = {}
+        for column, name in last_touch.items():
+            if column not in self.output_columns:
+                schedule.setdefault(name, []).append(column)
+        return schedule
+
+    def describe(self):
+        skipped = [name for name, _, _ in STAGES if not self.runs(name)]
+        unused = [column for column in RAW_SALES_COLUMNS if column not in self.raw_columns]
+        return (f"Stages to run ({len(self.stages)}): {self.stage_names}\n"
+                f"Stages skipped ({len(skipped)}): {skipped}\n"
+                f"Raw columns loaded: {len(self.raw_columns)} of {len(RAW_SALES_COLUMNS)}; not loaded: {unused}")
+
+
+def plan_pipeline(output_columns, stages=STAGES, skippable=None, prune=True):
+    """
+    Plans the run for `output_columns`.
+    skippable - stages the script can actually skip (None = all); the others always run,
+                so their raw columns are always loaded
+    prune     - False runs every stage and loads every raw column (the exploratory mode
+                of the script); the release schedule is still derived
+    """
+    producible = set(RAW_SALES_COLUMNS).union(*(writes for _, _, writes in stages))
+    unknown = [column for column in output_columns if column not in producible]
+    if unknown:
+        raise ValueError(f"No stage produces the output columns {unknown}")
+
+    if not prune:
+        return PipelinePlan(output_columns, list(stages), set(RAW_SALES_COLUMNS))
+
+    # A needed accumulated column (DQ_Flags) keeps every stage that adds bits to it, not only its creator
+    needed = set(output_columns)
+    planned = []
+    for name, reads, writes in reversed(stages):
+        if needed.intersection(writes) or (skippable is not None and name not in skippable):
+            planned.append((name, reads, writes))
+            needed.update(expand_columns(reads))
+    planned.reverse()
+    return PipelinePlan(output_columns, planned, needed.intersection(RAW_SALES_COLUMNS))
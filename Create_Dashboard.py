@@ -12,13 +12,20 @@ Requirements from Part B:
 
 import pandas as pd
 import numpy as np
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.chart import BarChart, PieChart, LineChart, Reference
-from openpyxl.utils.dataframe import dataframe_to_rows
+import os
 import warnings
+from Column_Planner import DASHBOARD_COLUMNS
+from Dashboard_KPIs import DashboardKPIs, read_kpi_cube, slice_kpi_cube
+from Partitioned_Dataset import read_partitions, opened_partitions
+from Excel_Table_Writer import NUMBER_FORMATS, OpenpyxlTableWriter, XlsxwriterTableWriter
 warnings.filterwarnings('ignore')
 
+# Months shown on the dashboard ('YYYY-MM', inclusive); None on both ends shows the whole dataset.
+# With a range the detail rows come from the month-partitioned dataset, and only those months are read.
+DASHBOARD_FIRST_MONTH = None
+DASHBOARD_LAST_MONTH = None
+PARTITIONED_DATASET_PATH = "/Users/instabug/Downloads/salma/BI_Sales_Partitioned"
+
 print("="*60)
 print("CREATING EXCEL DASHBOARD")
 print("="*60)
@@ -26,15 +33,41 @@ print("="*60)
 # ============================================
 # 1. LOAD BI-READY DATASET
 # ============================================
-print("\n1. Loading BI-Ready dataset...")
+print("\n1. Loading KPI cube and BI-Ready dataset...")
 
 try:
-    bi_sales = pd.read_excel("/Users/instabug/Downloads/salma/BI_Ready_Sales_Dataset.xlsx")
+    # Every aggregate KPI comes from the pre-aggregated cube written by Retail_Sales_Cleaned.py
+    kpi_cube, kpi_totals = read_kpi_cube("/Users/instabug/Downloads/salma/BI_KPI_Cube.xlsx")
+    print(f"✓ Loaded KPI cube: {len(kpi_cube)} cells")
+    date_range = DASHBOARD_FIRST_MONTH is not None or DASHBOARD_LAST_MONTH is not None
+    if date_range and not os.path.isdir(PARTITIONED_DATASET_PATH):
+        raise FileNotFoundError(2, "No such directory", PARTITIONED_DATASET_PATH)
+    if date_range:
+        # Only the month folders inside the range are opened
+        start = None if DASHBOARD_FIRST_MONTH is None else pd.Period(DASHBOARD_FIRST_MONTH, 'M').start_time
+        end = None if DASHBOARD_LAST_MONTH is None else pd.Period(DASHBOARD_LAST_MONTH, 'M').end_time
+        bi_sales = read_partitions(PARTITIONED_DATASET_PATH, start, end, columns=DASHBOARD_COLUMNS)
+        opened, total = opened_partitions(PARTITIONED_DATASET_PATH, start, end)
+        print(f"✓ Read {opened} of {total} month partitions "
+              f"(months {DASHBOARD_FIRST_MONTH or 'first'} to {DASHBOARD_LAST_MONTH or 'last'})")
+        kpi_cube, kpi_totals = slice_kpi_cube(kpi_cube, bi_sales, DASHBOARD_FIRST_MONTH, DASHBOARD_LAST_MONTH)
+        print(f"✓ KPI cube narrowed to {len(kpi_cube)} cells")
+    else:
+        # Only the columns of the order lists (DASHBOARD_COLUMNS in Column_Planner.py) are loaded from the detail
+        bi_sales = pd.read_excel("/Users/instabug/Downloads/salma/BI_Ready_Sales_Dataset.xlsx",
+                                 usecols=lambda column: column in DASHBOARD_COLUMNS)
     print(f"✓ Loaded {len(bi_sales)} records")
     print(f"✓ Columns: {len(bi_sales.columns)}")
-except FileNotFoundError:
-    print("❌ Error: BI_Ready_Sales_Dataset.xlsx not found!")
-    print("Please run Retail_Sales_Cleaned.py first to generate the BI dataset.")
+except FileNotFoundError as error:
+    print(f"❌ Error: {error.filename} not found!")
+    print("Please run Retail_Sales_Cleaned.py first to generate the BI dataset and the KPI cube.")
+    exit(1)
+
+# Fail fast instead of a KeyError halfway through the workbook
+missing_columns = [column for column in DASHBOARD_COLUMNS if column not in bi_sales.columns]
+if missing_columns:
+    print(f"❌ Error: BI_Ready_Sales_Dataset.xlsx is missing columns the dashboard needs: {missing_columns}")
+    print("Add them to bi_columns in Retail_Sales_Cleaned.py and run it again.")
     exit(1)
 
 # ============================================
@@ -42,69 +75,56 @@ except FileNotFoundError:
 # ============================================
 print("\n2. Calculating KPIs...")
 
+# Every KPI comes from the cube; only the order lists read the detail rows (see Dashboard_KPIs.py)
+kpi = DashboardKPIs(kpi_cube, kpi_totals, bi_sales)
+
 # 2.1 Total Sales Revenue
-total_revenue = bi_sales['TotalAmount_Calc'].sum()
+total_revenue = kpi.total_revenue
 print(f"   Total Revenue: {total_revenue:,.2f} EGP")
 
 # 2.2 Revenue by Month
-revenue_by_month = bi_sales.groupby('Order_YearMonth')['TotalAmount_Calc'].sum().reset_index()
-revenue_by_month.columns = ['Month', 'Revenue']
-revenue_by_month = revenue_by_month.sort_values('Month')
+revenue_by_month = kpi.revenue_by_month
 print(f"   Months analyzed: {len(revenue_by_month)}")
 
 # 2.3 Revenue by Quarter
-revenue_by_quarter = bi_sales.groupby(['Order_Year', 'Order_Quarter'])['TotalAmount_Calc'].sum().reset_index()
-revenue_by_quarter['Quarter'] = revenue_by_quarter['Order_Year'].astype(str) + '-Q' + revenue_by_quarter['Order_Quarter'].astype(str)
-revenue_by_quarter = revenue_by_quarter[['Quarter', 'TotalAmount_Calc']]
-revenue_by_quarter.columns = ['Quarter', 'Revenue']
+revenue_by_quarter = kpi.revenue_by_quarter
 print(f"   Quarters analyzed: {len(revenue_by_quarter)}")
 
 # 2.4 Top 3 Orders by Revenue
-top_3_orders = bi_sales.nlargest(3, 'TotalAmount_Calc')[['OrderID_cleaned', 'TotalAmount_Calc', 'Order_YearMonth', 'ProductName_Clean', 'CustomerName_clean']]
+top_3_orders = kpi.top_3_orders
 print(f"   Top 3 orders identified")
 
 # 2.5 Average Order Value (AOV)
-total_orders = bi_sales['OrderID_cleaned'].nunique()
-aov = total_revenue / total_orders
+total_orders = kpi.total_orders
+aov = kpi.aov
 print(f"   Average Order Value: {aov:,.2f} EGP")
 
 # 2.6 Products with Above-Average AOV
-product_aov = bi_sales.groupby('ProductName_Clean')['TotalAmount_Calc'].mean().reset_index()
-product_aov.columns = ['Product', 'AOV']
-product_aov['Above_Average'] = product_aov['AOV'] > aov
-products_above_aov = product_aov[product_aov['Above_Average']].sort_values('AOV', ascending=False)
+products_above_aov = kpi.products_above_aov
 print(f"   Products above AOV: {len(products_above_aov)}")
 
 # 2.7 Average Delivery Time
-avg_delivery_time = bi_sales['Delivery_Time_Days'].mean()
+avg_delivery_time = kpi.avg_delivery_time
 print(f"   Avg Delivery Time: {avg_delivery_time:.1f} days")
 
 # 2.8 Delayed Deliveries (>5 days)
-delayed_deliveries = bi_sales[bi_sales['Delivery_Delayed'] == True]
-delayed_pct = len(delayed_deliveries) / len(bi_sales) * 100
-print(f"   Delayed orders: {len(delayed_deliveries)} ({delayed_pct:.1f}%)")
+delayed_count = kpi.delayed_count
+delayed_pct = kpi.delayed_pct
+print(f"   Delayed orders: {delayed_count} ({delayed_pct:.1f}%)")
 
 # 2.9 Top 3 Categories by Revenue
-category_revenue = bi_sales.groupby('Category_Clean')['TotalAmount_Calc'].sum().reset_index()
-category_revenue.columns = ['Category', 'Revenue']
-top_3_categories = category_revenue.nlargest(3, 'Revenue')
+category_revenue = kpi.category_revenue
+top_3_categories = kpi.top_3_categories
 print(f"   Top 3 categories identified")
 
 # 2.10 Product Performance (Quantity sold)
-product_performance = bi_sales.groupby('ProductName_Clean').agg({
-    'Quantity_Clean': 'sum',
-    'TotalAmount_Calc': 'sum'
-}).reset_index()
-product_performance.columns = ['Product', 'Quantity_Sold', 'Revenue']
-product_performance = product_performance.sort_values('Quantity_Sold', ascending=True)
-underperforming_products = product_performance.head(10)  # Bottom 10
+underperforming_products = kpi.underperforming_products
 print(f"   Underperforming products identified")
 
 # 2.11 Unpaid Orders Analysis
-unpaid_orders = bi_sales[bi_sales['PaymentStatus_Clean'] == 'Unpaid']
-unpaid_count = len(unpaid_orders)
-unpaid_pct = unpaid_count / len(bi_sales) * 100
-revenue_at_risk = unpaid_orders['TotalAmount_Calc'].sum()
+unpaid_count = kpi.unpaid_count
+unpaid_pct = kpi.unpaid_pct
+revenue_at_risk = kpi.revenue_at_risk
 print(f"   Unpaid orders: {unpaid_count} ({unpaid_pct:.1f}%)")
 print(f"   Revenue at risk: {revenue_at_risk:,.2f} EGP")
 
@@ -113,336 +133,254 @@ print(f"   Revenue at risk: {revenue_at_risk:,.2f} EGP")
 # ============================================
 print("\n3. Creating Excel workbook...")
 
-wb = Workbook()
-wb.remove(wb.active)  # Remove default sheet
-
-# Define styles
-header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-header_font = Font(color="FFFFFF", bold=True, size=12)
-kpi_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
-kpi_font = Font(bold=True, size=14)
-title_font = Font(bold=True, size=16)
-center_align = Alignment(horizontal="center", vertical="center")
-border = Border(
-    left=Side(style='thin'),
-    right=Side(style='thin'),
-    top=Side(style='thin'),
-    bottom=Side(style='thin')
-)
+# Tables are written in bulk with named styles registered once (see Excel_Table_Writer.py).
+# Values are written as numbers with Excel number formats, so the sheets stay sortable and chartable.
+writer = OpenpyxlTableWriter()
+MONEY, COUNT, DAYS, PERCENT = (NUMBER_FORMATS[name] for name in ['money', 'count', 'days', 'percent'])
 
 # ============================================
 # SHEET 1: EXECUTIVE SUMMARY
 # ============================================
 print("   Creating Executive Summary sheet...")
-ws_summary = wb.create_sheet("Executive Summary")
+ws_summary = writer.sheet("Executive Summary")
 
 # Title
-ws_summary['A1'] = "EG RETAIL SALES DASHBOARD"
-ws_summary['A1'].font = title_font
-ws_summary.merge_cells('A1:D1')
+writer.cell(ws_summary, 1, 1, "EG RETAIL SALES DASHBOARD", 'Dashboard Title')
+writer.merge(ws_summary, 'A1:D1')
 
-ws_summary['A2'] = "Executive Summary - Key Performance Indicators"
-ws_summary['A2'].font = Font(size=12, italic=True)
-ws_summary.merge_cells('A2:D2')
+writer.cell(ws_summary, 2, 1, "Executive Summary - Key Performance Indicators", 'Dashboard Subtitle')
+writer.merge(ws_summary, 'A2:D2')
 
 # KPI Section
 row = 4
-ws_summary[f'A{row}'] = "KEY METRICS"
-ws_summary[f'A{row}'].font = Font(bold=True, size=14)
-ws_summary.merge_cells(f'A{row}:D{row}')
-ws_summary[f'A{row}'].fill = header_fill
-ws_summary[f'A{row}'].font = header_font
+writer.cell(ws_summary, row, 1, "KEY METRICS", 'Section Header')
+writer.merge(ws_summary, f'A{row}:D{row}')
 
 # KPI Values
 kpis = [
-    ("Total Revenue (EGP)", f"{total_revenue:,.2f}"),
-    ("Total Orders", f"{total_orders:,}"),
-    ("Average Order Value (EGP)", f"{aov:,.2f}"),
-    ("Average Delivery Time (days)", f"{avg_delivery_time:.1f}"),
-    ("Delayed Deliveries (%)", f"{delayed_pct:.1f}%"),
-    ("Unpaid Orders (%)", f"{unpaid_pct:.1f}%"),
-    ("Revenue at Risk (EGP)", f"{revenue_at_risk:,.2f}"),
+    ("Total Revenue (EGP)", total_revenue, MONEY),
+    ("Total Orders", total_orders, COUNT),
+    ("Average Order Value (EGP)", aov, MONEY),
+    ("Average Delivery Time (days)", avg_delivery_time, DAYS),
+    ("Delayed Deliveries (%)", delayed_pct / 100, PERCENT),
+    ("Unpaid Orders (%)", unpaid_pct / 100, PERCENT),
+    ("Revenue at Risk (EGP)", revenue_at_risk, MONEY),
 ]
 
 row = 5
-for kpi_name, kpi_value in kpis:
-    ws_summary[f'A{row}'] = kpi_name
-    ws_summary[f'B{row}'] = kpi_value
-    ws_summary[f'A{row}'].fill = kpi_fill
-    ws_summary[f'B{row}'].font = kpi_font
-    ws_summary[f'B{row}'].alignment = Alignment(horizontal="right")
+for kpi_name, kpi_value, number_format in kpis:
+    writer.cell(ws_summary, row, 1, kpi_name, 'KPI Label')
+    writer.cell(ws_summary, row, 2, kpi_value, 'KPI Value', number_format)
     row += 1
 
 # Top 3 Orders Section
 row += 2
-ws_summary[f'A{row}'] = "TOP 3 ORDERS BY REVENUE"
-ws_summary[f'A{row}'].font = Font(bold=True, size=14)
-ws_summary.merge_cells(f'A{row}:E{row}')
-ws_summary[f'A{row}'].fill = header_fill
-ws_summary[f'A{row}'].font = header_font
-
-row += 1
-headers = ['Rank', 'Order ID', 'Revenue (EGP)', 'Month', 'Product']
-for col_idx, header in enumerate(headers, start=1):
-    cell = ws_summary.cell(row, col_idx, header)
-    cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-    cell.font = Font(bold=True)
-    cell.border = border
-
-for idx, (_, order_row) in enumerate(top_3_orders.iterrows(), start=1):
-    row += 1
-    ws_summary.cell(row, 1, idx)
-    ws_summary.cell(row, 2, order_row['OrderID_cleaned'])
-    ws_summary.cell(row, 3, f"{order_row['TotalAmount_Calc']:,.2f}")
-    ws_summary.cell(row, 4, str(order_row['Order_YearMonth']))
-    ws_summary.cell(row, 5, order_row['ProductName_Clean'])
+writer.cell(ws_summary, row, 1, "TOP 3 ORDERS BY REVENUE", 'Section Header')
+writer.merge(ws_summary, f'A{row}:E{row}')
+
+top_3_table = pd.DataFrame({
+    'Rank': range(1, len(top_3_orders) + 1),
+    'Order ID': top_3_orders['OrderID_cleaned'].to_numpy(),
+    'Revenue (EGP)': top_3_orders['TotalAmount_Calc'].to_numpy(),
+    'Month': top_3_orders['Order_YearMonth'].astype(str).to_numpy(),
+    'Product': top_3_orders['ProductName_Clean'].to_numpy(),
+})
+row = writer.table(ws_summary, top_3_table, row + 1, header_style='Table Header',
+                   number_formats={'Revenue (EGP)': MONEY})
 
 # Top 3 Categories
 row += 3
-ws_summary[f'A{row}'] = "TOP 3 CATEGORIES BY REVENUE"
-ws_summary[f'A{row}'].font = Font(bold=True, size=14)
-ws_summary.merge_cells(f'A{row}:C{row}')
-ws_summary[f'A{row}'].fill = header_fill
-ws_summary[f'A{row}'].font = header_font
-
-row += 1
-ws_summary.cell(row, 1, 'Rank').font = Font(bold=True)
-ws_summary.cell(row, 2, 'Category').font = Font(bold=True)
-ws_summary.cell(row, 3, 'Revenue (EGP)').font = Font(bold=True)
-
-for idx, (_, cat_row) in enumerate(top_3_categories.iterrows(), start=1):
-    row += 1
-    ws_summary.cell(row, 1, idx)
-    ws_summary.cell(row, 2, cat_row['Category'])
-    ws_summary.cell(row, 3, f"{cat_row['Revenue']:,.2f}")
+writer.cell(ws_summary, row, 1, "TOP 3 CATEGORIES BY REVENUE", 'Section Header')
+writer.merge(ws_summary, f'A{row}:C{row}')
+
+top_3_categories_table = pd.DataFrame({
+    'Rank': range(1, len(top_3_categories) + 1),
+    'Category': top_3_categories['Category'].to_numpy(),
+    'Revenue (EGP)': top_3_categories['Revenue'].to_numpy(),
+})
+categories_last_row = writer.table(ws_summary, top_3_categories_table, row + 1,
+                                   number_formats={'Revenue (EGP)': MONEY})
+writer.chart(ws_summary, 'pie', "Top 3 Categories by Revenue", row + 1, categories_last_row,
+             value_column=3, category_column=2, anchor='G4', width=12)
 
 # Adjust column widths
-ws_summary.column_dimensions['A'].width = 30
-ws_summary.column_dimensions['B'].width = 20
-ws_summary.column_dimensions['C'].width = 20
-ws_summary.column_dimensions['D'].width = 15
-ws_summary.column_dimensions['E'].width = 30
+writer.widths(ws_summary, {'A': 30, 'B': 20, 'C': 20, 'D': 15, 'E': 30})
 
 # ============================================
 # SHEET 2: REVENUE ANALYSIS
 # ============================================
 print("   Creating Revenue Analysis sheet...")
-ws_revenue = wb.create_sheet("Revenue Analysis")
+ws_revenue = writer.sheet("Revenue Analysis")
 
 # Title
-ws_revenue['A1'] = "REVENUE ANALYSIS"
-ws_revenue['A1'].font = title_font
-ws_revenue.merge_cells('A1:C1')
+writer.cell(ws_revenue, 1, 1, "REVENUE ANALYSIS", 'Dashboard Title')
+writer.merge(ws_revenue, 'A1:C1')
 
 # Monthly Revenue
-ws_revenue['A3'] = "Monthly Revenue"
-ws_revenue['A3'].font = Font(bold=True, size=12)
-
-ws_revenue.cell(4, 1, 'Month').font = Font(bold=True)
-ws_revenue.cell(4, 2, 'Revenue (EGP)').font = Font(bold=True)
-
-for idx, (_, month_row) in enumerate(revenue_by_month.iterrows(), start=5):
-    ws_revenue.cell(idx, 1, month_row['Month'])
-    ws_revenue.cell(idx, 2, month_row['Revenue'])
+writer.cell(ws_revenue, 3, 1, "Monthly Revenue", 'Section Title')
+month_last_row = writer.table(ws_revenue, revenue_by_month.set_axis(['Month', 'Revenue (EGP)'], axis=1), 4,
+                              number_formats={'Revenue (EGP)': MONEY})
 
 # Quarterly Revenue
 col_start = 4
-ws_revenue.cell(3, col_start, "Quarterly Revenue").font = Font(bold=True, size=12)
-ws_revenue.cell(4, col_start, 'Quarter').font = Font(bold=True)
-ws_revenue.cell(4, col_start+1, 'Revenue (EGP)').font = Font(bold=True)
-
-for idx, (_, quarter_row) in enumerate(revenue_by_quarter.iterrows(), start=5):
-    ws_revenue.cell(idx, col_start, quarter_row['Quarter'])
-    ws_revenue.cell(idx, col_start+1, quarter_row['Revenue'])
+writer.cell(ws_revenue, 3, col_start, "Quarterly Revenue", 'Section Title')
+quarter_last_row = writer.table(ws_revenue, revenue_by_quarter.set_axis(['Quarter', 'Revenue (EGP)'], axis=1), 4,
+                                col_start, number_formats={'Revenue (EGP)': MONEY})
 
 # Category Revenue
-ws_revenue.cell(len(revenue_by_month) + 7, 1, "Revenue by Category").font = Font(bold=True, size=12)
+writer.cell(ws_revenue, len(revenue_by_month) + 7, 1, "Revenue by Category", 'Section Title')
 cat_start_row = len(revenue_by_month) + 8
+category_last_row = writer.table(ws_revenue, category_revenue.sort_values('Revenue', ascending=False)
+                                 .set_axis(['Category', 'Revenue (EGP)'], axis=1), cat_start_row,
+                                 number_formats={'Revenue (EGP)': MONEY})
 
-ws_revenue.cell(cat_start_row, 1, 'Category').font = Font(bold=True)
-ws_revenue.cell(cat_start_row, 2, 'Revenue (EGP)').font = Font(bold=True)
-
-for idx, (_, cat_row) in enumerate(category_revenue.sort_values('Revenue', ascending=False).iterrows(), start=cat_start_row+1):
-    ws_revenue.cell(idx, 1, cat_row['Category'])
-    ws_revenue.cell(idx, 2, cat_row['Revenue'])
+# Native charts over the aggregate tables above (Excel renders them from the ranges)
+writer.chart(ws_revenue, 'line', "Monthly Revenue (EGP)", 4, month_last_row, value_column=2, category_column=1,
+             anchor='G3', number_format=MONEY)
+writer.chart(ws_revenue, 'bar', "Quarterly Revenue (EGP)", 4, quarter_last_row, value_column=col_start + 1,
+             category_column=col_start, anchor='G20', number_format=MONEY)
+writer.chart(ws_revenue, 'bar', "Revenue by Category (EGP)", cat_start_row, category_last_row, value_column=2,
+             category_column=1, anchor='G37', number_format=MONEY)
 
-ws_revenue.column_dimensions['A'].width = 20
-ws_revenue.column_dimensions['B'].width = 20
-ws_revenue.column_dimensions['D'].width = 20
-ws_revenue.column_dimensions['E'].width = 20
+writer.widths(ws_revenue, {'A': 20, 'B': 20, 'D': 20, 'E': 20})
 
 # ============================================
 # SHEET 3: PRODUCT PERFORMANCE
 # ============================================
 print("   Creating Product Performance sheet...")
-ws_products = wb.create_sheet("Product Performance")
+ws_products = writer.sheet("Product Performance")
 
-ws_products['A1'] = "PRODUCT PERFORMANCE ANALYSIS"
-ws_products['A1'].font = title_font
-ws_products.merge_cells('A1:D1')
+writer.cell(ws_products, 1, 1, "PRODUCT PERFORMANCE ANALYSIS", 'Dashboard Title')
+writer.merge(ws_products, 'A1:D1')
 
 # Products Above AOV
-ws_products['A3'] = f"Products with Above-Average Order Value (AOV > {aov:,.2f} EGP)"
-ws_products['A3'].font = Font(bold=True, size=12)
-ws_products.merge_cells('A3:C3')
+writer.cell(ws_products, 3, 1, f"Products with Above-Average Order Value (AOV > {aov:,.2f} EGP)", 'Section Title')
+writer.merge(ws_products, 'A3:C3')
 
-ws_products.cell(4, 1, 'Product').font = Font(bold=True)
-ws_products.cell(4, 2, 'Average Order Value (EGP)').font = Font(bold=True)
-ws_products.cell(4, 3, 'Above Average?').font = Font(bold=True)
-
-for idx, (_, prod_row) in enumerate(products_above_aov.iterrows(), start=5):
-    ws_products.cell(idx, 1, prod_row['Product'])
-    ws_products.cell(idx, 2, prod_row['AOV'])
-    ws_products.cell(idx, 3, 'Yes')
+above_aov_table = pd.DataFrame({
+    'Product': products_above_aov['Product'].to_numpy(),
+    'Average Order Value (EGP)': products_above_aov['AOV'].to_numpy(),
+    'Above Average?': 'Yes',
+})
+writer.table(ws_products, above_aov_table, 4, number_formats={'Average Order Value (EGP)': MONEY})
 
 # Underperforming Products
 under_start_row = len(products_above_aov) + 7
-ws_products.cell(under_start_row, 1, "Underperforming Products (Lowest 10 by Quantity Sold)").font = Font(bold=True, size=12)
-ws_products.merge_cells(f'A{under_start_row}:D{under_start_row}')
-
-ws_products.cell(under_start_row+1, 1, 'Product').font = Font(bold=True)
-ws_products.cell(under_start_row+1, 2, 'Quantity Sold').font = Font(bold=True)
-ws_products.cell(under_start_row+1, 3, 'Revenue (EGP)').font = Font(bold=True)
+writer.cell(ws_products, under_start_row, 1, "Underperforming Products (Lowest 10 by Quantity Sold)", 'Section Title')
+writer.merge(ws_products, f'A{under_start_row}:D{under_start_row}')
 
-for idx, (_, prod_row) in enumerate(underperforming_products.iterrows(), start=under_start_row+2):
-    ws_products.cell(idx, 1, prod_row['Product'])
-    ws_products.cell(idx, 2, prod_row['Quantity_Sold'])
-    ws_products.cell(idx, 3, prod_row['Revenue'])
+under_last_row = writer.table(ws_products,
+                              underperforming_products.set_axis(['Product', 'Quantity Sold', 'Revenue (EGP)'], axis=1),
+                              under_start_row + 1, number_formats={'Quantity Sold': COUNT, 'Revenue (EGP)': MONEY})
+writer.chart(ws_products, 'bar', "Underperforming Products - Quantity Sold", under_start_row + 1, under_last_row,
+             value_column=2, category_column=1, anchor='F3', number_format=COUNT)
 
-ws_products.column_dimensions['A'].width = 35
-ws_products.column_dimensions['B'].width = 25
-ws_products.column_dimensions['C'].width = 20
+writer.widths(ws_products, {'A': 35, 'B': 25, 'C': 20})
 
 # ============================================
 # SHEET 4: DELIVERY PERFORMANCE
 # ============================================
 print("   Creating Delivery Performance sheet...")
-ws_delivery = wb.create_sheet("Delivery Performance")
+ws_delivery = writer.sheet("Delivery Performance")
 
-ws_delivery['A1'] = "DELIVERY PERFORMANCE ANALYSIS"
-ws_delivery['A1'].font = title_font
-ws_delivery.merge_cells('A1:D1')
+writer.cell(ws_delivery, 1, 1, "DELIVERY PERFORMANCE ANALYSIS", 'Dashboard Title')
+writer.merge(ws_delivery, 'A1:D1')
 
 # Summary Metrics
-ws_delivery['A3'] = "Delivery Metrics"
-ws_delivery['A3'].font = Font(bold=True, size=12)
-
-ws_delivery.cell(4, 1, 'Metric').font = Font(bold=True)
-ws_delivery.cell(4, 2, 'Value').font = Font(bold=True)
+writer.cell(ws_delivery, 3, 1, "Delivery Metrics", 'Section Title')
 
 delivery_metrics = [
-    ("Average Delivery Time (days)", f"{avg_delivery_time:.1f}"),
-    ("Delayed Deliveries (>5 days)", f"{len(delayed_deliveries)}"),
-    ("Delayed Delivery Rate (%)", f"{delayed_pct:.1f}%"),
-    ("On-Time Deliveries", f"{len(bi_sales) - len(delayed_deliveries)}"),
-    ("On-Time Rate (%)", f"{100 - delayed_pct:.1f}%"),
+    ("Average Delivery Time (days)", avg_delivery_time, DAYS),
+    ("Delayed Deliveries (>5 days)", delayed_count, COUNT),
+    ("Delayed Delivery Rate (%)", delayed_pct / 100, PERCENT),
+    ("On-Time Deliveries", kpi.row_count - delayed_count, COUNT),
+    ("On-Time Rate (%)", 1 - delayed_pct / 100, PERCENT),
 ]
 
-for idx, (metric, value) in enumerate(delivery_metrics, start=5):
-    ws_delivery.cell(idx, 1, metric)
-    ws_delivery.cell(idx, 2, value)
+writer.row(ws_delivery, 4, 1, ['Metric', 'Value'], 'Column Header')
+for idx, (metric, value, number_format) in enumerate(delivery_metrics, start=5):
+    writer.cell(ws_delivery, idx, 1, metric)
+    writer.cell(ws_delivery, idx, 2, value, number_format=number_format)
 
 # Delayed Orders List
-ws_delivery.cell(12, 1, "Delayed Orders (Delivery Time > 5 days)").font = Font(bold=True, size=12)
-ws_delivery.merge_cells('A12:E12')
-
-ws_delivery.cell(13, 1, 'Order ID').font = Font(bold=True)
-ws_delivery.cell(13, 2, 'Delivery Time (days)').font = Font(bold=True)
-ws_delivery.cell(13, 3, 'Product').font = Font(bold=True)
-ws_delivery.cell(13, 4, 'Governorate').font = Font(bold=True)
+writer.cell(ws_delivery, 12, 1, "Delayed Orders (Delivery Time > 5 days)", 'Section Title')
+writer.merge(ws_delivery, 'A12:E12')
 
-for idx, (_, del_row) in enumerate(delayed_deliveries.head(20).iterrows(), start=14):
-    ws_delivery.cell(idx, 1, del_row['OrderID_cleaned'])
-    ws_delivery.cell(idx, 2, del_row['Delivery_Time_Days'])
-    ws_delivery.cell(idx, 3, del_row['ProductName_Clean'])
-    ws_delivery.cell(idx, 4, del_row['Governorate_Clean'])
+delayed_table = kpi.delayed_orders[['OrderID_cleaned', 'Delivery_Time_Days', 'ProductName_Clean', 'Governorate_Clean']]
+writer.table(ws_delivery, delayed_table.set_axis(['Order ID', 'Delivery Time (days)', 'Product', 'Governorate'], axis=1),
+             13, number_formats={'Delivery Time (days)': COUNT})
 
-ws_delivery.column_dimensions['A'].width = 20
-ws_delivery.column_dimensions['B'].width = 25
-ws_delivery.column_dimensions['C'].width = 35
-ws_delivery.column_dimensions['D'].width = 20
+writer.widths(ws_delivery, {'A': 20, 'B': 25, 'C': 35, 'D': 20})
 
 # ============================================
 # SHEET 5: PAYMENT & RISK ANALYSIS
 # ============================================
 print("   Creating Payment & Risk Analysis sheet...")
-ws_payment = wb.create_sheet("Payment & Risk Analysis")
+ws_payment = writer.sheet("Payment & Risk Analysis")
 
-ws_payment['A1'] = "PAYMENT STATUS & RISK ANALYSIS"
-ws_payment['A1'].font = title_font
-ws_payment.merge_cells('A1:D1')
+writer.cell(ws_payment, 1, 1, "PAYMENT STATUS & RISK ANALYSIS", 'Dashboard Title')
+writer.merge(ws_payment, 'A1:D1')
 
 # Payment Status Summary
-payment_summary = bi_sales.groupby('PaymentStatus_Clean').agg({
-    'OrderID_cleaned': 'count',
-    'TotalAmount_Calc': 'sum'
-}).reset_index()
-payment_summary.columns = ['Payment Status', 'Order Count', 'Total Amount (EGP)']
-payment_summary['Percentage (%)'] = payment_summary['Order Count'] / len(bi_sales) * 100
-
-ws_payment['A3'] = "Payment Status Breakdown"
-ws_payment['A3'].font = Font(bold=True, size=12)
-
-ws_payment.cell(4, 1, 'Payment Status').font = Font(bold=True)
-ws_payment.cell(4, 2, 'Order Count').font = Font(bold=True)
-ws_payment.cell(4, 3, 'Total Amount (EGP)').font = Font(bold=True)
-ws_payment.cell(4, 4, 'Percentage (%)').font = Font(bold=True)
-
-for idx, (_, pay_row) in enumerate(payment_summary.iterrows(), start=5):
-    ws_payment.cell(idx, 1, pay_row['Payment Status'])
-    ws_payment.cell(idx, 2, pay_row['Order Count'])
-    ws_payment.cell(idx, 3, f"{pay_row['Total Amount (EGP)']:,.2f}")
-    ws_payment.cell(idx, 4, f"{pay_row['Percentage (%)']:.1f}%")
+payment_summary = kpi.payment_summary
+
+writer.cell(ws_payment, 3, 1, "Payment Status Breakdown", 'Section Title')
+
+payment_table = payment_summary.assign(**{'Percentage (%)': payment_summary['Percentage (%)'] / 100})
+payment_last_row = writer.table(ws_payment, payment_table, 4, number_formats={
+    'Order Count': COUNT, 'Total Amount (EGP)': MONEY, 'Percentage (%)': PERCENT})
+writer.chart(ws_payment, 'pie', "Orders by Payment Status", 4, payment_last_row, value_column=2,
+             category_column=1, anchor='G3', width=12)
 
 # Risk Analysis
 row = len(payment_summary) + 7
-ws_payment.cell(row, 1, "RISK ANALYSIS").font = Font(bold=True, size=12)
-ws_payment.cell(row, 1).fill = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
-ws_payment.merge_cells(f'A{row}:B{row}')
+writer.cell(ws_payment, row, 1, "RISK ANALYSIS", 'Risk Header')
+writer.merge(ws_payment, f'A{row}:B{row}')
 
 risk_metrics = [
-    ("Unpaid Orders Count", f"{unpaid_count}"),
-    ("Unpaid Orders (%)", f"{unpaid_pct:.1f}%"),
-    ("Revenue at Risk (EGP)", f"{revenue_at_risk:,.2f}"),
-    ("Percentage of Total Revenue at Risk (%)", f"{revenue_at_risk/total_revenue*100:.1f}%"),
+    ("Unpaid Orders Count", unpaid_count, COUNT),
+    ("Unpaid Orders (%)", unpaid_pct / 100, PERCENT),
+    ("Revenue at Risk (EGP)", revenue_at_risk, MONEY),
+    ("Percentage of Total Revenue at Risk (%)", revenue_at_risk / total_revenue, PERCENT),
 ]
 
 row += 1
-for metric, value in risk_metrics:
-    ws_payment.cell(row, 1, metric)
-    ws_payment.cell(row, 2, value)
-    ws_payment.cell(row, 2).font = Font(bold=True, color="FF0000")
+for metric, value, number_format in risk_metrics:
+    writer.cell(ws_payment, row, 1, metric)
+    writer.cell(ws_payment, row, 2, value, 'Risk Value', number_format)
     row += 1
 
 # Unpaid Orders List
 row += 2
-ws_payment.cell(row, 1, "Unpaid Orders (Top 20 by Amount)").font = Font(bold=True, size=12)
-ws_payment.merge_cells(f'A{row}:E{row}')
+writer.cell(ws_payment, row, 1, "Unpaid Orders (Top 20 by Amount)", 'Section Title')
+writer.merge(ws_payment, f'A{row}:E{row}')
+
+unpaid_top = kpi.unpaid_top
+unpaid_table = pd.DataFrame({
+    'Order ID': unpaid_top['OrderID_cleaned'].to_numpy(),
+    'Amount (EGP)': unpaid_top['TotalAmount_Calc'].to_numpy(),
+    'Customer': unpaid_top['CustomerName_clean'].to_numpy(),
+    'Status': unpaid_top['Status_Clean'].to_numpy(),
+    # Days since order (empty when the order date is unknown)
+    'Days Since Order': (pd.Timestamp.now() - unpaid_top['OrderDate']).dt.days.astype('Int64').to_numpy(),
+})
+writer.table(ws_payment, unpaid_table, row + 1, number_formats={'Amount (EGP)': MONEY, 'Days Since Order': COUNT})
+
+writer.widths(ws_payment, {'A': 25, 'B': 20, 'C': 25, 'D': 20, 'E': 20})
 
-row += 1
-ws_payment.cell(row, 1, 'Order ID').font = Font(bold=True)
-ws_payment.cell(row, 2, 'Amount (EGP)').font = Font(bold=True)
-ws_payment.cell(row, 3, 'Customer').font = Font(bold=True)
-ws_payment.cell(row, 4, 'Status').font = Font(bold=True)
-ws_payment.cell(row, 5, 'Days Since Order').font = Font(bold=True)
-
-unpaid_top = unpaid_orders.nlargest(20, 'TotalAmount_Calc')
-for _, unpaid_row in unpaid_top.iterrows():
-    row += 1
-    ws_payment.cell(row, 1, unpaid_row['OrderID_cleaned'])
-    ws_payment.cell(row, 2, f"{unpaid_row['TotalAmount_Calc']:,.2f}")
-    ws_payment.cell(row, 3, unpaid_row['CustomerName_clean'])
-    ws_payment.cell(row, 4, unpaid_row['Status_Clean'])
-    # Calculate days since order (if we have the date)
-    if pd.notna(unpaid_row['OrderDate']):
-        days_since = (pd.Timestamp.now() - unpaid_row['OrderDate']).days
-        ws_payment.cell(row, 5, days_since)
-
-ws_payment.column_dimensions['A'].width = 25
-ws_payment.column_dimensions['B'].width = 20
-ws_payment.column_dimensions['C'].width = 25
-ws_payment.column_dimensions['D'].width = 20
-ws_payment.column_dimensions['E'].width = 20
+# ============================================
+# SHEET 6: KPI CUBE (pivot-ready)
+# ============================================
+print("   Creating KPI Cube sheet...")
+ws_cube = writer.sheet("KPI Cube")
+
+# The pre-aggregated cube as an Excel Table: insert a PivotTable on it to slice any KPI by
+# month, quarter, category, product or payment status without touching the detail data
+cube_columns = list(kpi_cube.columns)
+cube_last_row = writer.table(ws_cube, kpi_cube, 1, number_formats={
+    'revenue': MONEY, 'unpaid_amount': MONEY, 'quantity': COUNT, 'order_count': COUNT, 'rows': COUNT})
+writer.excel_table(ws_cube, "KPI_Cube", 1, cube_last_row, 1, len(cube_columns))
+writer.widths(ws_cube, {'C': 15, 'D': 20, 'E': 35, 'F': 20})
 
 # ============================================
 # 4. SAVE WORKBOOK
@@ -450,7 +388,22 @@ ws_payment.column_dimensions['E'].width = 20
 print("\n4. Saving dashboard...")
 
 output_file = "/Users/instabug/Downloads/salma/EG_Retail_Sales_Dashboard.xlsx"
-wb.save(output_file)
+writer.save(output_file)
+
+# Optional detail workbook with EVERY delayed and unpaid order (thousands of rows at scale),
+# written with the constant-memory xlsxwriter backend; set to None to skip it
+detail_output_file = None  # e.g. "/Users/instabug/Downloads/salma/EG_Retail_Sales_Dashboard_Detail.xlsx"
+if detail_output_file:
+    detail_writer = XlsxwriterTableWriter(detail_output_file)
+    detail_sheets = [
+        ("Delayed Orders", bi_sales[bi_sales['Delivery_Delayed'] == True]),
+        ("Unpaid Orders", bi_sales[bi_sales['PaymentStatus_Clean'] == 'Unpaid']),
+    ]
+    for title, orders in detail_sheets:
+        detail_writer.table(detail_writer.sheet(title), orders, 1,
+                            number_formats={'TotalAmount_Calc': '#,##0.00', 'OrderDate': 'yyyy-mm-dd'})
+    detail_writer.save()
+    print(f"📄 Detail orders saved to: {detail_output_file}")
 
 print(f"\n✅ Dashboard created successfully!")
 print(f"📊 File saved to: {output_file}")
@@ -462,6 +415,7 @@ print("Sheet 2: Revenue Analysis - Monthly, quarterly, category breakdown")
 print("Sheet 3: Product Performance - Above-AOV products, underperformers")
 print("Sheet 4: Delivery Performance - Avg time, delays, SLA tracking")
 print("Sheet 5: Payment & Risk Analysis - Unpaid orders, revenue at risk")
+print("Sheet 6: KPI Cube - Pre-aggregated table, ready for PivotTables")
 print("="*60)
 print("\n✅ Ready for submission!\n")
 
@@ -0,0 +1,213 @@
+"""
+Customer Entity Resolution for EG Retail Sales Case Study
+Links every sales order to a customer in Customers_Raw and gives it a stable key
+
+Approach:
+1. Normalize names (Arabic letter variants, case, spacing), phones (E.164), emails and CustomerIDs
+2. Block records by phone suffix, CustomerID and name tokens
+3. Score candidate pairs ONLY inside their blocks (no full pairwise comparison)
+4. Link matched pairs into clusters and hash each cluster into a stable Customer_Key
+"""
+
+import hashlib
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from Phone_Normalization import ARABIC_DIGIT_MAP, normalize_phones
+
+# Arabic letters that are written in several ways for the same name
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+})
+NON_NAME_CHARS = re.compile(r'[^\w\s]')
+MULTI_SPACE = re.compile(r'\s+')
+
+# How many trailing digits of the E.164 phone are used as its blocking key
+PHONE_SUFFIX_LENGTH = 9
+
+# Blocks bigger than this (e.g. the token "mohamed") are skipped; those records
+# still meet their true matches through their phone / CustomerID blocks
+MAX_BLOCK_SIZE = 200
+
+# Weights of each evidence type in the match score (they sum to 1)
+# An exact name needs at least one agreeing identifier to pass the threshold
+MATCH_WEIGHTS = {'name': 0.4, 'phone': 0.3, 'email': 0.15, 'customer_id': 0.15}
+MATCH_THRESHOLD = 0.55
+
+# Order columns Dim_Customer is built from (the first four are also the match evidence); every one of
+# them must be in `orders`, Column_Planner.py declares them as reads of the Customer Matching stage
+DIM_CUSTOMER_COLUMNS = ['CustomerID', 'CustomerName', 'Gender', 'Phone', 'Email', 'Governorate', 'City', 'Address']
+
+
+def _map_unique(series, func):
+    """Apply a Python function once per unique value and map the results back"""
+    uniques = series.dropna().unique()
+    lookup = {value: func(value) for value in uniques}
+    return series.map(lookup)
+
+
+def _normalize_name(name):
+    name = str(name).translate(ARABIC_LETTER_MAP).translate(ARABIC_DIGIT_MAP).lower()
+    name = NON_NAME_CHARS.sub(' ', name)
+    tokens = MULTI_SPACE.sub(' ', name).strip().split(' ')
+    # Sorted tokens make "Ali Mohamed" and "Mohamed Ali" identical
+    name = ' '.join(sorted(token for token in tokens if token))
+    return name or np.nan
+
+
+def _normalize_email(email):
+    email = str(email).strip().lower()
+    return email if '@' in email else np.nan
+
+
+def _normalize_customer_id(customer_id):
+    customer_id = str(customer_id).strip().upper().replace('CUS-', 'C')
+    return customer_id or np.nan
+
+
+def prepare_customer_records(df, source, id_col='CustomerID', name_col='CustomerName',
+                             phone_col='Phone', email_col='Email'):
+    """
+    Builds the normalized matching attributes for a customer-bearing table.
+    Every normalization runs over unique values only and is mapped back.
+    """
+    records = pd.DataFrame(index=df.index)
+    records['source'] = source
+    records['source_index'] = df.index
+    records['customer_id_norm'] = _map_unique(df[id_col], _normalize_customer_id)
+    records['name_norm'] = _map_unique(df[name_col], _normalize_name)
+    records['phone_e164'] = normalize_phones(df[phone_col])['Phone_Clean']
+    records['email_norm'] = _map_unique(df[email_col], _normalize_email)
+    return records.reset_index(drop=True)
+
+
+def build_blocks(records, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Returns a long table of (record, block_key) pairs.
+    Block keys: phone suffix, normalized CustomerID and each name token.
+    """
+    name_tokens = records['name_norm'].str.split(' ').explode()
+    name_tokens = name_tokens[name_tokens.str.len() >= 3]
+
+    blocks = pd.concat([
+        'P:' + records['phone_e164'].dropna().str[-PHONE_SUFFIX_LENGTH:],
+        'I:' + records['customer_id_norm'].dropna(),
+        'N:' + name_tokens,
+    ])
+    blocks = pd.DataFrame({'record': blocks.index, 'block_key': blocks.values}).drop_duplicates()
+
+    # Drop blocks that are too generic to be useful (and too expensive to compare)
+    block_sizes = blocks.groupby('block_key')['record'].transform('size')
+    return blocks[(block_sizes > 1) & (block_sizes <= max_block_size)]
+
+
+def generate_candidate_pairs(records, max_block_size=MAX_BLOCK_SIZE):
+    """Self-joins the block index so that only records sharing a block are paired"""
+    blocks = build_blocks(records, max_block_size)
+    pairs = blocks.merge(blocks, on='block_key', suffixes=('_a', '_b'))
+    pairs = pairs.loc[pairs['record_a'] < pairs['record_b'], ['record_a', 'record_b']]
+    return pairs.drop_duplicates().reset_index(drop=True)
+
+
+def score_candidate_pairs(records, pairs):
+    """
+    Scores every candidate pair: fuzzy name similarity plus exact agreement
+    on phone, email and CustomerID. Name similarity is computed once per unique name pair.
+    """
+    left = records.loc[pairs['record_a']].reset_index(drop=True)
+    right = records.loc[pairs['record_b']].reset_index(drop=True)
+    scored = pairs.copy()
+
+    name_pairs = pd.DataFrame({'a': left['name_norm'], 'b': right['name_norm']})
+    unique_name_pairs = name_pairs.dropna().drop_duplicates()
+    similarity = {
+        (a, b): SequenceMatcher(None, a, b).ratio()
+        for a, b in zip(unique_name_pairs['a'], unique_name_pairs['b'])
+    }
+    scored['name_similarity'] = [similarity.get(key, 0.0) for key in zip(name_pairs['a'], name_pairs['b'])]
+
+    for evidence, column in [('phone', 'phone_e164'), ('email', 'email_norm'), ('customer_id', 'customer_id_norm')]:
+        scored[f'{evidence}_match'] = (left[column] == right[column]).fillna(False).to_numpy()
+
+    scored['score'] = (
+        MATCH_WEIGHTS['name'] * scored['name_similarity']
+        + MATCH_WEIGHTS['phone'] * scored['phone_match']
+        + MATCH_WEIGHTS['email'] * scored['email_match']
+        + MATCH_WEIGHTS['customer_id'] * scored['customer_id_match']
+    )
+    return scored
+
+
+def link_clusters(n_records, matched_pairs):
+    """Connected components over matched pairs (vectorized label propagation)"""
+    labels = np.arange(n_records)
+    a = matched_pairs['record_a'].to_numpy()
+    b = matched_pairs['record_b'].to_numpy()
+    while len(a):
+        new_labels = labels.copy()
+        smallest = np.minimum(labels[a], labels[b])
+        np.minimum.at(new_labels, a, smallest)
+        np.minimum.at(new_labels, b, smallest)
+        new_labels = new_labels[new_labels]  # pointer jumping
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+
+def _stable_key(identity):
+    return 'CUST-' + hashlib.sha1(identity.encode('utf-8')).hexdigest()[:10].upper()
+
+
+def resolve_customers(orders, customers, threshold=MATCH_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Resolves every order to a stable customer key using Customers_Raw as the master list.
+
+    Returns:
+        order_keys   - DataFrame aligned to `orders.index` with Customer_Key and Customer_Match
+        dim_customer - one row per Customer_Key (master attributes preferred), ready for Dim_Customer
+    """
+    missing = [column for column in DIM_CUSTOMER_COLUMNS if column not in orders.columns]
+    if missing:
+        raise ValueError(f"resolve_customers needs the order columns {missing} to build Dim_Customer")
+
+    records = pd.concat([
+        prepare_customer_records(customers, 'master'),
+        prepare_customer_records(orders, 'order'),
+    ], ignore_index=True)
+
+    pairs = generate_candidate_pairs(records, max_block_size)
+    scored = score_candidate_pairs(records, pairs)
+    matched = scored[scored['score'] >= threshold]
+    records['cluster'] = link_clusters(len(records), matched)
+
+    # The cluster key is derived from its smallest member identity, so the
+    # same customer gets the same key on every run regardless of row order
+    identity = ('P:' + records['phone_e164']).fillna('N:' + records['name_norm'])
+    identity = identity.fillna('R:' + records['source'] + records['source_index'].astype(str))
+    records['identity'] = identity
+    cluster_identity = records.groupby('cluster')['identity'].transform('min')
+    records['Customer_Key'] = _map_unique(cluster_identity, _stable_key)
+
+    has_master = records['source'].eq('master').groupby(records['cluster']).transform('any')
+    records['Customer_Match'] = np.where(has_master, 'Matched_Master', 'Order_Only')
+
+    order_records = records[records['source'] == 'order'].set_index('source_index')
+    order_keys = order_records[['Customer_Key', 'Customer_Match']].reindex(orders.index)
+
+    # Dim_Customer: master rows first so their attributes win over order snapshots
+    dim_source = pd.concat([
+        customers.rename(columns={'Gov': 'Governorate'}).assign(
+            Customer_Key=records.loc[records['source'] == 'master', 'Customer_Key'].to_numpy()),
+        orders.assign(Customer_Key=order_keys['Customer_Key']),
+    ], ignore_index=True)
+    dim_customer = (dim_source[['Customer_Key'] + DIM_CUSTOMER_COLUMNS]
+                    .drop_duplicates(subset=['Customer_Key'], keep='first')
+                    .reset_index(drop=True))
+
+    return order_keys, dim_customer
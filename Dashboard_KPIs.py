@@ -0,0 +1,167 @@
+"""
+KPI Cube and KPI Engine for the EG Retail Sales dashboard
+The cleaner persists a compact pre-aggregated cube; the dashboard builds every KPI from it
+
+Approach:
+1. build_kpi_cube() aggregates the BI dataset ONCE, in Retail_Sales_Cleaned.py, by
+   Order_Year × Order_Quarter × Order_YearMonth × Category × Product × PaymentStatus
+   (year and quarter follow from the month, so they add no cells) into additive measures:
+   revenue, order count, quantity, delayed count, unpaid amount, delivery-day sum/count, rows
+2. Measures that are not additive are stored once for the whole dataset in the totals
+   (rows, distinct OrderIDs)
+3. DashboardKPIs derives totals, AOV, percentages, the month/quarter/category/product/payment
+   breakdowns and every aggregate top-N by regrouping the cube (one row per key combination)
+4. Only the lists of single orders (top 3 orders, top unpaid orders, delayed orders) need the
+   detail rows, and only the columns listed in Column_Planner.DASHBOARD_COLUMNS
+
+The cube keeps null keys (dropna=False), so the totals cover every row; the breakdowns drop
+null keys like the per-KPI groupbys they replace. slice_kpi_cube() narrows the cube to a range of
+months (the dashboard reads the detail rows of the same months from the partitioned dataset).
+"""
+
+import numpy as np
+import pandas as pd
+
+CUBE_KEYS = ['Order_Year', 'Order_Quarter', 'Order_YearMonth', 'Category_Clean', 'ProductName_Clean',
+             'PaymentStatus_Clean']
+# Columns of the BI dataset the cube is built from
+CUBE_SOURCE_COLUMNS = CUBE_KEYS + ['TotalAmount_Calc', 'OrderID_cleaned', 'Quantity_Clean',
+                                   'Delivery_Delayed', 'Delivery_Time_Days']
+
+DELAYED_LIST_SIZE = 20
+UNPAID_LIST_SIZE = 20
+
+
+def _delayed(df):
+    return df['Delivery_Delayed'] == True  # noqa: E712 - NaN counts as not delayed
+
+
+def _unpaid(df):
+    return df['PaymentStatus_Clean'] == 'Unpaid'
+
+
+def build_kpi_cube(bi_sales):
+    """(cube, totals): additive measures per key combination and the dataset-wide non-additive ones"""
+    revenue = bi_sales['TotalAmount_Calc']
+    delivery_days = bi_sales['Delivery_Time_Days']
+    cube = pd.DataFrame({
+        'revenue': revenue,
+        'revenue_count': revenue.notna(),
+        'order_count': bi_sales['OrderID_cleaned'].notna(),
+        'quantity': bi_sales['Quantity_Clean'],
+        'delayed_count': _delayed(bi_sales),
+        'unpaid_amount': revenue.where(_unpaid(bi_sales)),
+        'delivery_days_sum': delivery_days,
+        'delivery_days_count': delivery_days.notna(),
+        'rows': 1,
+    }).groupby([bi_sales[key] for key in CUBE_KEYS], dropna=False).sum().reset_index()
+
+    totals = {'rows': len(bi_sales), 'distinct_orders': bi_sales['OrderID_cleaned'].nunique()}
+    return cube, totals
+
+
+def write_kpi_cube(cube, totals, path):
+    """Writes the cube and its totals as two sheets of one small workbook"""
+    with pd.ExcelWriter(path) as writer:
+        cube.to_excel(writer, sheet_name='KPI_Cube', index=False)
+        pd.DataFrame([totals]).to_excel(writer, sheet_name='Totals', index=False)
+
+
+def read_kpi_cube(path):
+    with pd.ExcelFile(path) as workbook:
+        cube = workbook.parse('KPI_Cube')
+        totals = workbook.parse('Totals').iloc[0].to_dict()
+    return cube, totals
+
+
+def slice_kpi_cube(cube, detail, first_month=None, last_month=None):
+    """
+    (cube, totals) of the months first_month..last_month ('YYYY-MM', inclusive, None = open):
+    the cube cells of those months, and totals with the distinct OrderIDs counted on `detail`,
+    which must hold the detail rows of the same months
+    """
+    months = cube['Order_YearMonth'].astype(str)
+    in_range = cube['Order_YearMonth'].notna() & (months != 'NaT')
+    if first_month is not None:
+        in_range &= months >= first_month
+    if last_month is not None:
+        in_range &= months <= last_month
+    cube = cube[in_range].reset_index(drop=True)
+    totals = {'rows': int(cube['rows'].sum()), 'distinct_orders': detail['OrderID_cleaned'].nunique()}
+    return cube, totals
+
+
+def _regroup(cube, keys, measures):
+    """Sums `measures` of the cube over a coarser key (null keys dropped)"""
+    return cube.groupby(keys)[measures].sum()
+
+
+class DashboardKPIs:
+    """All dashboard KPIs, computed from the KPI cube plus the detail rows of the order lists"""
+
+    def __init__(self, cube, totals, detail):
+        self.cube = cube
+
+        # ---- Totals ----
+        self.row_count = int(totals['rows'])
+        self.total_revenue = cube['revenue'].sum()
+        self.total_orders = int(totals['distinct_orders'])
+        self.aov = self.total_revenue / self.total_orders
+
+        # ---- Revenue by month / quarter ----
+        by_month = _regroup(cube, 'Order_YearMonth', ['revenue']).reset_index()
+        by_month.columns = ['Month', 'Revenue']
+        self.revenue_by_month = by_month.sort_values('Month')
+
+        by_quarter = _regroup(cube, ['Order_Year', 'Order_Quarter'], ['revenue']).reset_index()
+        by_quarter['Quarter'] = by_quarter['Order_Year'].astype(str) + '-Q' + by_quarter['Order_Quarter'].astype(str)
+        self.revenue_by_quarter = by_quarter[['Quarter', 'revenue']].rename(columns={'revenue': 'Revenue'})
+
+        # ---- Products ----
+        products = _regroup(cube, 'ProductName_Clean', ['revenue', 'revenue_count', 'quantity'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            product_aov = (products['revenue'] / products['revenue_count']).rename('AOV')
+        self.product_aov = product_aov.rename_axis('Product').reset_index()
+        self.product_aov['Above_Average'] = self.product_aov['AOV'] > self.aov
+        self.products_above_aov = (self.product_aov[self.product_aov['Above_Average']]
+                                   .sort_values('AOV', ascending=False))
+
+        performance = products[['quantity', 'revenue']].rename_axis('Product').reset_index()
+        performance.columns = ['Product', 'Quantity_Sold', 'Revenue']
+        self.product_performance = performance.sort_values('Quantity_Sold', ascending=True)
+        self.underperforming_products = self.product_performance.head(10)  # Bottom 10
+
+        # ---- Categories ----
+        categories = _regroup(cube, 'Category_Clean', ['revenue']).reset_index()
+        categories.columns = ['Category', 'Revenue']
+        self.category_revenue = categories
+        self.top_3_categories = categories.nlargest(3, 'Revenue')
+
+        # ---- Delivery ----
+        self.avg_delivery_time = cube['delivery_days_sum'].sum() / cube['delivery_days_count'].sum()
+        self.delayed_count = int(cube['delayed_count'].sum())
+        self.delayed_pct = self.delayed_count / self.row_count * 100
+
+        # ---- Payment status / risk ----
+        payment = _regroup(cube, 'PaymentStatus_Clean', ['order_count', 'revenue', 'rows'])
+        self.payment_summary = payment[['order_count', 'revenue']].reset_index()
+        self.payment_summary.columns = ['Payment Status', 'Order Count', 'Total Amount (EGP)']
+        self.payment_summary['Percentage (%)'] = self.payment_summary['Order Count'] / self.row_count * 100
+
+        self.unpaid_count = int(payment['rows'].get('Unpaid', 0))
+        self.unpaid_pct = self.unpaid_count / self.row_count * 100
+        self.revenue_at_risk = cube['unpaid_amount'].sum()
+
+        # ---- Order lists (the only KPIs read from the detail rows) ----
+        revenue = detail['TotalAmount_Calc']
+        self.top_3_orders = detail.loc[revenue.nlargest(3).index, ['OrderID_cleaned', 'TotalAmount_Calc',
+                                                                   'Order_YearMonth', 'ProductName_Clean',
+                                                                   'CustomerName_clean']]
+        self.unpaid_top = detail.loc[revenue.where(_unpaid(detail)).nlargest(UNPAID_LIST_SIZE).index]
+        self.delayed_orders = detail.iloc[np.flatnonzero(_delayed(detail).to_numpy())[:DELAYED_LIST_SIZE]]
+
+    @classmethod
+    def from_detail(cls, bi_sales):
+        """Builds the cube in memory (when no persisted cube is available)"""
+        cube, totals = build_kpi_cube(bi_sales)
+        return cls(cube, totals, bi_sales)
@@ -0,0 +1,405 @@
+"""
+Single-Pass Data Profiler for the EG Retail Sales raw extract
+Nulls, distinct counts, min/max/mean/std/quantiles, top-k values and duplicate rows of every column
+
+Approach:
+1. The frame (or any iterable of chunks) is read ONCE, chunk by chunk; for each chunk every column
+   updates its accumulator and the chunk's row hashes update the duplicate counter
+2. An exact column accumulator keeps rows, nulls and the value counts of the column; distinct,
+   top-k, min/max, mean/std and quantiles are all derived from those counts at the end,
+   so no statistic needs another scan
+3. Duplicate rows are rows whose 64-bit content hash was already seen (df.duplicated() semantics)
+4. The profile is written as JSON (everything) and as a CSV with one row per column and a
+   stable layout, which diff_profiles() (or any diff tool) compares between runs;
+   Completeness % is the Completeness score of Data_Quality_Report.md
+
+Memory of the exact mode grows with the number of distinct values per column. The approximate mode
+(approximate=True, chosen automatically from APPROXIMATE_PROFILE_ROWS rows in the cleaner) keeps
+mergeable sketches instead (Streaming_Sketches.py): HyperLogLog distinct counts, SpaceSaving top
+values and KLL quantiles, in memory that does not grow with the data. Parquet inputs are read in
+record batches, and their row groups can be profiled by several worker processes whose profiles
+are merged:
+    python Data_Profiler.py benchmarks/Synthetic_10000000_seed42 --approximate --workers 4
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from Streaming_Sketches import HyperLogLog, KLLSketch, SpaceSaving, hash_values
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed to profile Parquet inputs batch by batch
+    pq = None
+
+TOP_K = 5
+QUANTILES = [0.25, 0.5, 0.75]
+PROFILE_CHUNK_ROWS = 250_000
+APPROXIMATE_PROFILE_ROWS = 2_000_000
+
+PROFILE_FIELDS = ['column', 'dtype', 'rows', 'nulls', 'null_%', 'completeness_%', 'distinct', 'uniqueness_%',
+                  'min', 'max', 'mean', 'std'] + [f"p{int(q * 100)}" for q in QUANTILES] + ['top_values']
+
+
+def iter_chunks(df, chunk_rows=PROFILE_CHUNK_ROWS):
+    """Row slices of `df` (views, no copies)"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _merged_dtype(current, new):
+    """
+    dtype of a column whose chunks came as `current` and `new`: numbers are promoted to a common
+    numeric dtype (a Parquet int64 column gives int64 batches without nulls and float64 batches with
+    nulls), any other mix is object
+    """
+    if current is None or current == new:
+        return new
+    if _is_numeric(current) and _is_numeric(new):
+        return np.result_type(getattr(current, 'numpy_dtype', current), getattr(new, 'numpy_dtype', new))
+    return np.dtype(object)
+
+
+def _hashed_as_float(dtype):
+    """Numbers are hashed as float64, so 5 and 5.0 hash alike whichever chunk or worker they come from"""
+    return _is_numeric(dtype) and dtype.kind in 'iuf'
+
+
+def _weighted_quantiles(values, counts, quantiles):
+    """Quantiles (linear interpolation, as Series.quantile) of sorted distinct `values` with `counts`"""
+    ends = np.cumsum(counts)
+    result = []
+    for q in quantiles:
+        position = (ends[-1] - 1) * q
+        low = int(np.floor(position))
+        low_value = values[np.searchsorted(ends, low, side='right')]
+        high_value = values[np.searchsorted(ends, min(low + 1, ends[-1] - 1), side='right')]
+        result.append(low_value + (high_value - low_value) * (position - low))
+    return result
+
+
+class ExactColumnProfile:
+    """Rows, nulls and value counts of one column; every statistic is derived from them"""
+
+    def __init__(self, name):
+        self.name = name
+        self.dtype = None
+        self.rows = 0
+        self.nulls = 0
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, values):
+        self.dtype = _merged_dtype(self.dtype, values.dtype)
+        self.rows += len(values)
+        self.nulls += int(values.isna().sum())
+        self._add_counts(values.value_counts(dropna=True))
+
+    def merge(self, other):
+        """Adds the accumulator of the same column over other rows (e.g. another partition)"""
+        if other.dtype is not None:
+            self.dtype = _merged_dtype(self.dtype, other.dtype)
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self._add_counts(other.counts)
+
+    def _add_counts(self, counts):
+        self.counts = self.counts.add(counts, fill_value=0)
+        if _is_numeric(self.dtype) and len(self.counts):
+            # 5 (int chunk) and 5.0 (float chunk) are one value of the promoted column
+            self.counts.index = self.counts.index.astype(getattr(self.dtype, 'numpy_dtype', self.dtype))
+
+    def result(self, top_k=TOP_K, quantiles=QUANTILES):
+        counts = self.counts.astype('int64')
+        present = self.rows - self.nulls
+        profile = {
+            'column': self.name,
+            'dtype': str(self.dtype),
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'null_%': round(self.nulls / self.rows * 100, 2) if self.rows else 0.0,
+            'completeness_%': round(present / self.rows * 100, 2) if self.rows else 0.0,
+            'distinct': len(counts),
+            'uniqueness_%': round(len(counts) / present * 100, 2) if present else 0.0,
+            'top_values': [[_plain(value), int(count)] for value, count in
+                           counts.sort_values(ascending=False, kind='stable').head(top_k).items()],
+        }
+        ordered = _sorted_counts(counts, self.dtype)
+        if ordered is not None and len(ordered):
+            values, weights = ordered.index.to_numpy(), ordered.to_numpy()
+            profile['min'], profile['max'] = _plain(values[0]), _plain(values[-1])
+            if _is_numeric(self.dtype):
+                mean = float(np.dot(values.astype(float), weights) / weights.sum())
+                variance = float(np.dot((values.astype(float) - mean) ** 2, weights) / max(weights.sum() - 1, 1))
+                profile['mean'], profile['std'] = mean, variance ** 0.5
+            if values.dtype.kind == 'M':
+                unit = np.datetime_data(values.dtype)[0]
+                positions = _weighted_quantiles(values.astype('int64'), weights, quantiles)
+                quantile_values = [np.datetime64(int(round(position)), unit) for position in positions]
+            else:
+                quantile_values = _weighted_quantiles(values, weights, quantiles)
+            for q, value in zip(quantiles, quantile_values):
+                profile[f"p{int(q * 100)}"] = _plain(value)
+        return profile
+
+
+class SketchColumnProfile:
+    """Approximate accumulator of one column: exact rows/nulls/mean/std, sketched everything else"""
+
+    def __init__(self, name):
+        self.name = name
+        self.dtype = None
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.frequent = SpaceSaving()
+        self.quantiles = KLLSketch()
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def _kind(self):
+        if _is_numeric(self.dtype):
+            return 'numeric'
+        if pd.api.types.is_datetime64_any_dtype(self.dtype):
+            return 'datetime'
+        return None
+
+    def update(self, values):
+        self.dtype = _merged_dtype(self.dtype, values.dtype)
+        self.rows += len(values)
+        self.nulls += int(values.isna().sum())
+        counts = values.value_counts(dropna=True)
+        distinct = counts.index.astype('float64') if _hashed_as_float(counts.index.dtype) else counts.index
+        self.distinct.update_distinct(distinct)
+        self.frequent.update_counts(counts)
+        if self._kind() == 'numeric':
+            numbers = values.to_numpy(dtype=float, na_value=np.nan)
+            self.quantiles.update(numbers)
+            self.total += np.nansum(numbers)
+            self.total_squares += np.nansum(numbers ** 2)
+        elif self._kind() == 'datetime':
+            self.quantiles.update(values.dropna().astype('datetime64[ns]').astype('int64'))
+
+    def merge(self, other):
+        if other.dtype is not None:
+            self.dtype = _merged_dtype(self.dtype, other.dtype)
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+        self.quantiles.merge(other.quantiles)
+        self.total += other.total
+        self.total_squares += other.total_squares
+
+    def result(self, top_k=TOP_K, quantiles=QUANTILES):
+        present = self.rows - self.nulls
+        distinct = min(int(round(self.distinct.estimate())), present)
+        profile = {
+            'column': self.name,
+            'dtype': str(self.dtype),
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'null_%': round(self.nulls / self.rows * 100, 2) if self.rows else 0.0,
+            'completeness_%': round(present / self.rows * 100, 2) if self.rows else 0.0,
+            'distinct': distinct,
+            'uniqueness_%': round(distinct / present * 100, 2) if present else 0.0,
+            'top_values': [[_plain(value), int(count)] for value, count in self.frequent.top(top_k).items()],
+        }
+        kind = self._kind()
+        if kind and self.quantiles.n:
+            bounds = [self.quantiles.min, self.quantiles.max]
+            values = self.quantiles.quantiles(quantiles)
+            if kind == 'datetime':
+                bounds = [np.datetime64(int(value), 'ns') for value in bounds]
+                values = [np.datetime64(int(value), 'ns') for value in values]
+            else:
+                mean = self.total / present
+                variance = (self.total_squares - present * mean ** 2) / max(present - 1, 1)
+                profile['mean'], profile['std'] = mean, max(variance, 0.0) ** 0.5
+            profile['min'], profile['max'] = _plain(bounds[0]), _plain(bounds[1])
+            for q, value in zip(quantiles, values):
+                profile[f"p{int(q * 100)}"] = _plain(value)
+        return profile
+
+
+def _sorted_counts(counts, dtype):
+    """Value counts in value order when the column is numeric or datetime, else None"""
+    if not (_is_numeric(dtype) or pd.api.types.is_datetime64_any_dtype(dtype)):
+        return None
+    return counts.sort_index()
+
+
+def _plain(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(pd.Timestamp(value))
+    return value.item() if hasattr(value, 'item') else value
+
+
+class DataProfiler:
+    """Profiles every column of a frame in one chunked pass (exact counts or sketches)"""
+
+    def __init__(self, top_k=TOP_K, quantiles=QUANTILES, approximate=False):
+        self.top_k = top_k
+        self.quantiles = quantiles
+        self.approximate = approximate
+        self.column_profile = SketchColumnProfile if approximate else ExactColumnProfile
+        self.columns = {}
+        # Distinct rows: exact hash counts, or a HyperLogLog of the row hashes
+        self.row_hashes = HyperLogLog() if approximate else pd.Series(dtype='int64')
+        self.rows = 0
+
+    def update(self, chunk):
+        """Adds one chunk of rows (same columns in every chunk)"""
+        for column in chunk.columns:
+            if column not in self.columns:
+                self.columns[column] = self.column_profile(column)
+            self.columns[column].update(chunk[column])
+        numbers = {column: 'float64' for column, dtype in chunk.dtypes.items() if _hashed_as_float(dtype)}
+        hashes = pd.util.hash_pandas_object(chunk.astype(numbers) if numbers else chunk, index=False)
+        if self.approximate:
+            self.row_hashes.update_hashes(hashes.to_numpy(dtype=np.uint64))
+        else:
+            self.row_hashes = self.row_hashes.add(hashes.value_counts(), fill_value=0)
+        self.rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Adds the profile of other rows with the same columns (another partition or worker)"""
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        if self.approximate:
+            self.row_hashes.merge(other.row_hashes)
+        else:
+            self.row_hashes = self.row_hashes.add(other.row_hashes, fill_value=0)
+        self.rows += other.rows
+        return self
+
+    def profile_frame(self, df, chunk_rows=PROFILE_CHUNK_ROWS):
+        for chunk in iter_chunks(df, chunk_rows):
+            self.update(chunk)
+        return self
+
+    @property
+    def duplicate_rows(self):
+        """Rows that repeat an earlier row (an estimate, ±0.8% of the rows, in approximate mode)"""
+        if self.approximate:
+            return max(self.rows - int(round(self.row_hashes.estimate())), 0)
+        return self.rows - len(self.row_hashes)
+
+    def report(self):
+        return {
+            'approximate': self.approximate,
+            'rows': self.rows,
+            'columns': len(self.columns),
+            'duplicate_rows': int(self.duplicate_rows),
+            'profile': [column.result(self.top_k, self.quantiles) for column in self.columns.values()],
+        }
+
+    def table(self):
+        """One row per column in the PROFILE_FIELDS layout (top values as 'value (count); ...')"""
+        table = pd.DataFrame(self.report()['profile']).reindex(columns=PROFILE_FIELDS)
+        table['top_values'] = table['top_values'].map(
+            lambda pairs: '; '.join(f"{value} ({count})" for value, count in pairs))
+        return table
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.report(), report_file, ensure_ascii=False, indent=2, default=str)
+
+    def write_csv(self, path):
+        self.table().to_csv(path, index=False, float_format='%.6g')
+
+
+def diff_profiles(previous_path, current_path):
+    """Cells of two profile CSVs that differ: one row per (column, statistic)"""
+    previous = pd.read_csv(previous_path, dtype=str).set_index('column')
+    current = pd.read_csv(current_path, dtype=str).set_index('column')
+    columns = previous.index.union(current.index, sort=False)
+    previous, current = previous.reindex(columns), current.reindex(columns)
+    changed = (previous.fillna('') != current.fillna('')).stack()
+    changed = changed[changed]
+    return pd.DataFrame({
+        'column': changed.index.get_level_values(0),
+        'statistic': changed.index.get_level_values(1),
+        'previous': [previous.at[column, stat] for column, stat in changed.index],
+        'current': [current.at[column, stat] for column, stat in changed.index],
+    })
+
+
+def _profile_row_groups(path, row_groups, columns, approximate, batch_rows):
+    """Profile of some row groups of one Parquet file (one worker task)"""
+    profiler = DataProfiler(approximate=approximate)
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, row_groups=row_groups, columns=columns):
+        profiler.update(batch.to_pandas())
+    return profiler
+
+
+def profile_parquet(paths, columns=None, approximate=True, workers=1, batch_rows=PROFILE_CHUNK_ROWS):
+    """
+    Profiles Parquet files (e.g. the files of a partitioned dataset) in record batches.
+    With workers > 1 the row groups are split over processes and their profiles are merged.
+    """
+    if pq is None:
+        raise ImportError("pyarrow is required to profile Parquet inputs")
+    tasks = []
+    for path in paths:
+        groups = list(range(pq.ParquetFile(path).num_row_groups))
+        per_task = max(1, -(-len(groups) // workers))
+        tasks.extend((path, groups[start:start + per_task]) for start in range(0, len(groups), per_task))
+
+    arguments = [(path, groups, columns, approximate, batch_rows) for path, groups in tasks]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(_profile_row_groups, *zip(*arguments)))
+    else:
+        partials = [_profile_row_groups(*task) for task in arguments]
+
+    profiler = DataProfiler(approximate=approximate)
+    for partial in partials:
+        profiler.merge(partial)
+    return profiler
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arguments.add_argument('input', help="raw workbook, Parquet file, or folder of Parquet files")
+    arguments.add_argument('--sheet', default='Sales_Orders_Raw')
+    arguments.add_argument('--approximate', action='store_true', help="sketches instead of exact counts")
+    arguments.add_argument('--workers', type=int, default=1)
+    arguments.add_argument('--json', default='Raw_Sales_Profile.json')
+    arguments.add_argument('--csv', default='Raw_Sales_Profile.csv')
+    options = arguments.parse_args()
+
+    if options.input.endswith('.xlsx'):
+        sales = pd.read_excel(options.input, sheet_name=options.sheet)
+        profiler = DataProfiler(approximate=options.approximate).profile_frame(sales)
+    else:
+        if os.path.isdir(options.input):
+            sheet_file = os.path.join(options.input, f"{options.sheet}.parquet")
+            paths = [sheet_file] if os.path.exists(sheet_file) else sorted(
+                os.path.join(root, name) for root, _, names in os.walk(options.input)
+                for name in names if name.endswith('.parquet'))
+        else:
+            paths = [options.input]
+        profiler = profile_parquet(paths, approximate=options.approximate, workers=options.workers)
+
+    profiler.write_json(options.json)
+    profiler.write_csv(options.csv)
+    print(profiler.table().to_string(index=False))
+    print(f"\n✅ Profile of {profiler.rows:,} rows: {options.json}, {options.csv}")
+
+
+if __name__ == '__main__':
+    main()
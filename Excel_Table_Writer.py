@@ -0,0 +1,248 @@
+"""
+Bulk Worksheet Writer for the EG Retail Sales dashboard
+Writes whole DataFrames into worksheets with shared named styles instead of per-cell calls
+
+Approach:
+1. Styles are declared once (DASHBOARD_STYLES, backend-neutral) and registered once per workbook:
+   as openpyxl NamedStyles or as cached xlsxwriter Formats; a cell only stores the style name
+2. A table is converted to plain Python rows once (`to_numpy().tolist()`, NaN/NaT -> empty cell)
+   and written row by row - no iterrows(), no Font/PatternFill objects created in loops
+3. OpenpyxlTableWriter writes anywhere on a sheet (the dashboard layout places tables side by side);
+   a table that starts in column A below everything else goes through ws.append()
+4. Values stay numeric; money, counts, days and percentages get Excel number formats (NUMBER_FORMATS)
+   instead of being written as pre-formatted strings
+5. Native charts reference the ranges of the small aggregate tables already on the sheet, and
+   aggregate tables can be registered as Excel Tables (ListObjects) so they are pivot-ready
+6. XlsxwriterTableWriter uses xlsxwriter's constant_memory mode for large detail sheets: each row is
+   flushed to disk as soon as a later row is written, so memory stays flat, but rows must be written
+   top to bottom (writing above a flushed row raises ValueError instead of being silently dropped)
+"""
+
+from openpyxl import Workbook
+from openpyxl.chart import BarChart, LineChart, PieChart, Reference
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+try:
+    import xlsxwriter
+except ImportError:  # optional: only needed for the constant-memory backend
+    xlsxwriter = None
+
+# name -> bold / italic / size / color (font), fill (background), align, border
+DASHBOARD_STYLES = {
+    'Dashboard Title': {'bold': True, 'size': 16},
+    'Dashboard Subtitle': {'italic': True, 'size': 12},
+    'Section Header': {'bold': True, 'size': 12, 'color': 'FFFFFF', 'fill': '366092'},
+    'Section Title': {'bold': True, 'size': 12},
+    'Risk Header': {'bold': True, 'size': 12, 'fill': 'FF6B6B'},
+    'Column Header': {'bold': True},
+    'Table Header': {'bold': True, 'fill': 'D3D3D3', 'border': True},
+    'KPI Label': {'fill': 'E7E6E6'},
+    'KPI Value': {'bold': True, 'size': 14, 'align': 'right'},
+    'Risk Value': {'bold': True, 'color': 'FF0000'},
+}
+
+
+NUMBER_FORMATS = {
+    'money': '#,##0.00',
+    'count': '#,##0',
+    'days': '0.0',
+    'percent': '0.0%',   # the value is a fraction: 0.273 -> 27.3%
+    'date': 'yyyy-mm-dd',
+}
+
+CHART_TYPES = {'bar': BarChart, 'line': LineChart, 'pie': PieChart}
+
+
+def table_rows(df):
+    """DataFrame values as lists of plain Python values, with NaN/NaT as None (empty cells)"""
+    values = df.astype(object).where(df.notna(), None).to_numpy()
+    return values.tolist()
+
+
+def _named_style(name, spec):
+    style = NamedStyle(name=name)
+    style.font = Font(bold=spec.get('bold', False), italic=spec.get('italic', False),
+                      size=spec.get('size', 11), color=spec.get('color'))
+    if 'fill' in spec:
+        style.fill = PatternFill(start_color=spec['fill'], end_color=spec['fill'], fill_type='solid')
+    if 'align' in spec:
+        style.alignment = Alignment(horizontal=spec['align'])
+    if spec.get('border'):
+        thin = Side(style='thin')
+        style.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    return style
+
+
+def _xlsxwriter_format(spec):
+    properties = {'bold': spec.get('bold', False), 'italic': spec.get('italic', False),
+                  'font_size': spec.get('size', 11)}
+    if 'color' in spec:
+        properties['font_color'] = f"#{spec['color']}"
+    if 'fill' in spec:
+        properties.update(bg_color=f"#{spec['fill']}", pattern=1)
+    if 'align' in spec:
+        properties['align'] = spec['align']
+    if spec.get('border'):
+        properties['border'] = 1
+    return properties
+
+
+class OpenpyxlTableWriter:
+    """openpyxl workbook with the named styles registered once; tables can go anywhere on a sheet"""
+
+    def __init__(self, styles=DASHBOARD_STYLES):
+        self.workbook = Workbook()
+        self.workbook.remove(self.workbook.active)
+        for name, spec in styles.items():
+            self.workbook.add_named_style(_named_style(name, spec))
+
+    def sheet(self, title):
+        return self.workbook.create_sheet(title)
+
+    def cell(self, ws, row, column, value, style=None, number_format=None):
+        cell = ws.cell(row, column, value)
+        if style:
+            cell.style = style
+        if number_format:
+            cell.number_format = number_format
+        return cell
+
+    def row(self, ws, row, column, values, style=None):
+        """Writes `values` to consecutive cells of one row"""
+        for offset, value in enumerate(values):
+            self.cell(ws, row, column + offset, value, style)
+
+    def table(self, ws, df, row, column=1, header=True, header_style='Column Header', style=None,
+              number_formats=None):
+        """
+        Writes `df` with its top-left corner at (row, column); returns the last row written.
+        number_formats - {column name: Excel number format} applied to the data cells
+        """
+        if header:
+            self.row(ws, row, column, list(df.columns), header_style)
+            row += 1
+        rows = table_rows(df)
+        formats = [(number_formats or {}).get(name) for name in df.columns]
+
+        if column == 1 and row == ws.max_row + 1 and style is None and not any(formats):
+            for values in rows:
+                ws.append(values)
+        else:
+            for offset, values in enumerate(rows):
+                for position, value in enumerate(values):
+                    cell = ws.cell(row + offset, column + position, value)
+                    if style:
+                        cell.style = style
+                    if formats[position]:
+                        cell.number_format = formats[position]
+        return row + len(rows) - 1
+
+    def chart(self, ws, kind, title, header_row, last_row, value_column, category_column, anchor,
+              number_format=None, width=18, height=8):
+        """
+        Adds a native bar / line / pie chart of one table column at `anchor` (e.g. 'G3').
+        header_row..last_row is the table range (header included); columns are 1-based.
+        """
+        if last_row <= header_row:
+            return None
+        chart = CHART_TYPES[kind]()
+        chart.title = title
+        chart.add_data(Reference(ws, min_col=value_column, min_row=header_row, max_row=last_row),
+                       titles_from_data=True)
+        chart.set_categories(Reference(ws, min_col=category_column, min_row=header_row + 1, max_row=last_row))
+        if kind != 'pie':
+            chart.legend = None
+            chart.x_axis.delete = False
+            chart.y_axis.delete = False
+            if number_format:
+                chart.y_axis.number_format = number_format
+        chart.width, chart.height = width, height
+        ws.add_chart(chart, anchor)
+        return chart
+
+    def excel_table(self, ws, name, header_row, last_row, first_column, last_column, style='TableStyleMedium2'):
+        """Registers a written range as an Excel Table (filterable, pivot-ready) named `name`"""
+        if last_row <= header_row:
+            return None
+        ref = f"{get_column_letter(first_column)}{header_row}:{get_column_letter(last_column)}{last_row}"
+        table = Table(displayName=name, ref=ref)
+        table.tableStyleInfo = TableStyleInfo(name=style, showRowStripes=True)
+        ws.add_table(table)
+        return table
+
+    def merge(self, ws, cell_range):
+        ws.merge_cells(cell_range)
+
+    def widths(self, ws, widths):
+        """widths - {column letter: width}"""
+        for letter, width in widths.items():
+            ws.column_dimensions[letter].width = width
+
+    def save(self, path):
+        self.workbook.save(path)
+
+
+class XlsxwriterTableWriter:
+    """Constant-memory xlsxwriter workbook for large detail sheets; rows go top to bottom"""
+
+    def __init__(self, path, styles=DASHBOARD_STYLES):
+        if xlsxwriter is None:
+            raise ImportError("xlsxwriter is required for the constant-memory backend")
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True,
+                                                   'default_date_format': 'yyyy-mm-dd'})
+        self.styles = styles
+        self.formats = {name: self.workbook.add_format(_xlsxwriter_format(spec)) for name, spec in styles.items()}
+        self._number_formats = {}
+        self._last_row = {}
+
+    def _format(self, style, number_format=None):
+        if number_format is None:
+            return self.formats.get(style)
+        key = (style, number_format)
+        if key not in self._number_formats:
+            properties = _xlsxwriter_format(self.styles.get(style, {})) if style else {}
+            self._number_formats[key] = self.workbook.add_format(dict(properties, num_format=number_format))
+        return self._number_formats[key]
+
+    def _check_order(self, ws, row):
+        if row < self._last_row.get(ws.name, 0):
+            raise ValueError(f"Row {row} of '{ws.name}' was already flushed (constant_memory writes top to bottom)")
+        self._last_row[ws.name] = row
+
+    def sheet(self, title):
+        return self.workbook.add_worksheet(title)
+
+    def cell(self, ws, row, column, value, style=None, number_format=None):
+        self._check_order(ws, row)
+        ws.write(row - 1, column - 1, value, self._format(style, number_format))
+
+    def row(self, ws, row, column, values, style=None):
+        self._check_order(ws, row)
+        ws.write_row(row - 1, column - 1, values, self._format(style))
+
+    def table(self, ws, df, row, column=1, header=True, header_style='Column Header', style=None,
+              number_formats=None):
+        """Same arguments as OpenpyxlTableWriter.table(); 1-based row/column"""
+        if header:
+            self.row(ws, row, column, list(df.columns), header_style)
+            row += 1
+        formats = [self._format(style, (number_formats or {}).get(name)) for name in df.columns]
+        uniform = all(fmt is formats[0] for fmt in formats)
+        for offset, values in enumerate(table_rows(df)):
+            self._check_order(ws, row + offset)
+            if uniform:
+                ws.write_row(row + offset - 1, column - 1, values, formats[0] if formats else None)
+            else:
+                for position, value in enumerate(values):
+                    ws.write(row + offset - 1, column + position - 1, value, formats[position])
+        return row + len(df) - 1
+
+    def widths(self, ws, widths):
+        for letter, width in widths.items():
+            ws.set_column(f"{letter}:{letter}", width)
+
+    def save(self, path=None):
+        """Closes the workbook (its path was given to the constructor)"""
+        self.workbook.close()
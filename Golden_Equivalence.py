@@ -0,0 +1,294 @@
+"""
+Golden-Output Equivalence Harness for the EG Retail Sales cleaning pipeline
+Proves that an optimized stage gives the same output as the row-wise function in Retail_Sales_Cleaned.py
+
+Approach:
+1. The reference functions (clean_date_robust, standardize_discount, cap_unitprice, fill_shipping_cost,
+   standardize_text and the helpers that build their inputs) are taken from the script's source with
+   `ast`, so the golden output always follows the CURRENT script - there is no copy to keep in sync
+2. The stage inputs are built from a synthetic input (Synthetic_Data_Generator.py) the way the
+   script builds them; the context the functions read (sku_99, median_level1..4, global_median)
+   is computed once and shared by both sides
+3. The reference runs on the DISTINCT input tuples only and is broadcast back to the rows, which
+   gives the exact row-wise result while keeping multi-million-row inputs practical
+4. Both outputs are compared row by row (floats with rtol/atol, NaN == NaN, NaT == NaT) and the
+   differing rows are printed with their inputs; --diff-dir writes all of them to CSV
+
+Register a new candidate in CANDIDATES; a stage may have several.
+
+Usage:
+    python Golden_Equivalence.py --rows 2000000
+    python Golden_Equivalence.py --input my_raw.xlsx --stages discount shipping --diff-dir diffs
+"""
+
+import argparse
+import ast
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil import parser
+
+from Benchmark_Pipeline import BENCH_DIR, ensure_input
+from Category_Mapping import CategoryMapper
+from Arrow_Strings import ARROW_STRING_DTYPE
+from Vectorized_Cleaning import (SHIPPING_MEDIAN_KEYS, cap_unitprices, clean_dates, fill_shipping_costs,
+                                 shipping_median_levels, standardize_discounts, standardize_texts)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(REPO_DIR, "Retail_Sales_Cleaned.py")
+MAPPING_CONFIG_PATH = os.path.join(REPO_DIR, "Category_Mappings.json")
+
+# Top-level definitions taken from the script
+REFERENCE_FUNCTIONS = ['clean_date_robust', 'standardize_discount', 'cap_unitprice', 'fill_shipping_cost']
+HELPER_FUNCTIONS = ['standardize_text', 'clean_currency', 'get_fx_rate']
+CONSTANTS = ['currency_map', 'EGP_PER_USD']
+
+DATE_COLUMNS = ['OrderDate', 'DeliveryDate', 'ReturnDate']
+TEXT_COLUMNS = ['ProductSKU', 'ProductName', 'Category']
+UNRESOLVED_SKU = 'unresolved'  # stands in for the Product Lookup fill, which the harness does not run
+
+
+def load_reference(script_path=SCRIPT_PATH):
+    """Namespace with the reference functions and constants, compiled from the script's source"""
+    with open(script_path, encoding='utf-8') as script_file:
+        tree = ast.parse(script_file.read(), filename=script_path)
+    wanted = set(REFERENCE_FUNCTIONS + HELPER_FUNCTIONS + CONSTANTS)
+    nodes = [node for node in tree.body
+             if (isinstance(node, ast.FunctionDef) and node.name in wanted)
+             or (isinstance(node, ast.Assign) and any(getattr(t, 'id', None) in wanted for t in node.targets))]
+    missing = wanted - {getattr(node, 'name', None) or node.targets[0].id for node in nodes}
+    if missing:
+        raise ValueError(f"{script_path} no longer defines {sorted(missing)} at the top level")
+
+    namespace = {'pd': pd, 'np': np, 'parser': parser, 're': re}
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), script_path, 'exec'), namespace)
+    return namespace
+
+
+def prepare_inputs(sales, reference, mapper):
+    """Adds the columns the four stages read, built the way Retail_Sales_Cleaned.py builds them"""
+    sales = sales.copy()
+    sales['Currency_Clean'] = sales['Currency'].apply(reference['clean_currency'])
+    sales['FX_Rate'] = sales['Currency_Clean'].apply(reference['get_fx_rate'])
+    sales['UnitPrice_EGP'] = sales['UnitPrice'] * sales['FX_Rate']
+    sales['Quantity_Clean'] = sales['Quantity'].where(~(sales['Quantity'] <= 0))
+    sales['Subtotal_Calc'] = sales['UnitPrice_EGP'] * sales['Quantity_Clean']
+
+    sku = sales['ProductSKU'].apply(reference['standardize_text']).str.replace('-', '', regex=False)
+    sales['ProductSKU_Clean'] = sku.fillna(UNRESOLVED_SKU)
+
+    for target in ['ShipperName_Clean', 'Governorate_Clean']:
+        mapper.apply(sales, target)
+    return sales
+
+
+def _distinct_apply(frame, keys, func, axis=1):
+    """
+    func applied once per distinct row of `keys` and broadcast back to every row.
+    `keys` must determine the result of func (same keys -> same output).
+    """
+    codes = keys.groupby(list(keys.columns), dropna=False, sort=False).ngroup().to_numpy()
+    first = np.unique(codes, return_index=True)[1]
+    distinct = frame.iloc[first]
+    values = distinct.apply(func, axis=axis) if axis == 1 else distinct.apply(func)
+    return pd.Series(values.to_numpy()[codes], index=frame.index), len(first)
+
+
+# ---------------------------
+# Stage definitions
+# ---------------------------
+# Each reference runner returns (result, distinct evaluations); each candidate returns the result.
+
+def reference_dates(sales, context, reference):
+    results, evaluations = {}, 0
+    for column in DATE_COLUMNS:
+        # clean_date_robust only looks at str(x)
+        keys = sales[[column]].astype(str)
+        results[column], count = _distinct_apply(sales[column], keys, reference['clean_date_robust'], axis=0)
+        results[column] = pd.to_datetime(results[column])
+        evaluations += count
+    return pd.DataFrame(results), evaluations
+
+
+def vectorized_dates(sales, context):
+    return pd.DataFrame({column: clean_dates(sales[column]) for column in DATE_COLUMNS})
+
+
+def reference_text(sales, context, reference):
+    results, evaluations = {}, 0
+    for column in TEXT_COLUMNS:
+        results[column], count = _distinct_apply(sales[column], sales[[column]], reference['standardize_text'],
+                                                 axis=0)
+        evaluations += count
+    return pd.DataFrame(results), evaluations
+
+
+def vectorized_text(sales, context):
+    return pd.DataFrame({column: standardize_texts(sales[column]) for column in TEXT_COLUMNS})
+
+
+def arrow_text(sales, context):
+    return pd.DataFrame({column: standardize_texts(sales[column], ARROW_STRING_DTYPE) for column in TEXT_COLUMNS})
+
+
+def reference_discount(sales, context, reference):
+    # standardize_discount only looks at str(Discount), Subtotal_Calc and FX_Rate
+    frame = sales[['Discount', 'Subtotal_Calc', 'FX_Rate']]
+    keys = frame.assign(Discount=frame['Discount'].astype(str))
+    result, evaluations = _distinct_apply(frame, keys, reference['standardize_discount'])
+    return result.astype(float).to_frame('Discount_Rate_Clean'), evaluations
+
+
+def vectorized_discount(sales, context):
+    return standardize_discounts(sales['Discount'], sales['Subtotal_Calc'], sales['FX_Rate']).to_frame(
+        'Discount_Rate_Clean')
+
+
+def reference_cap(sales, context, reference):
+    frame = sales[['UnitPrice_EGP', 'ProductSKU_Clean']]
+    result, evaluations = _distinct_apply(frame, frame, reference['cap_unitprice'])
+    return result.astype(float).to_frame('UnitPrice_EGP_capped'), evaluations
+
+
+def vectorized_cap(sales, context):
+    return cap_unitprices(sales['UnitPrice_EGP'], sales['ProductSKU_Clean'], context['sku_99']).to_frame(
+        'UnitPrice_EGP_capped')
+
+
+def reference_shipping(sales, context, reference):
+    frame = sales[['ShippingCost', 'ShipperName_Clean', 'Governorate_Clean', 'City']]
+    result, evaluations = _distinct_apply(frame, frame, reference['fill_shipping_cost'])
+    return result.astype(float).to_frame('ShippingCost_Filled'), evaluations
+
+
+def vectorized_shipping(sales, context):
+    median_levels = [context[f'median_level{level}'] for level in range(1, len(SHIPPING_MEDIAN_KEYS) + 1)]
+    return fill_shipping_costs(sales, median_levels, context['global_median']).to_frame('ShippingCost_Filled')
+
+
+# stage -> (input columns shown in the diff report, reference runner)
+STAGES = {
+    'dates': (DATE_COLUMNS, reference_dates),
+    'discount': (['Discount', 'Subtotal_Calc', 'FX_Rate'], reference_discount),
+    'cap': (['UnitPrice_EGP', 'ProductSKU_Clean'], reference_cap),
+    'shipping': (['ShippingCost', 'ShipperName_Clean', 'Governorate_Clean', 'City'], reference_shipping),
+    'text': (TEXT_COLUMNS, reference_text),
+}
+
+# stage -> {candidate name: callable(sales, context) -> DataFrame with the reference's columns}
+CANDIDATES = {
+    'dates': {'Vectorized_Cleaning.clean_dates': vectorized_dates},
+    'discount': {'Vectorized_Cleaning.standardize_discounts': vectorized_discount},
+    'cap': {'Vectorized_Cleaning.cap_unitprices': vectorized_cap},
+    'shipping': {'Vectorized_Cleaning.fill_shipping_costs': vectorized_shipping},
+    'text': {'Vectorized_Cleaning.standardize_texts': vectorized_text,
+             'Vectorized_Cleaning.standardize_texts (Arrow strings)': arrow_text},
+}
+
+
+def build_context(sales, reference):
+    """The globals the reference functions read, computed as in the script"""
+    context = {'sku_99': sales.groupby('ProductSKU_Clean')['UnitPrice_EGP'].quantile(0.99)}
+    for level, medians in enumerate(shipping_median_levels(sales), start=1):
+        context[f'median_level{level}'] = medians
+    context['global_median'] = sales['ShippingCost'].median()
+    reference.update(context)
+    return context
+
+
+def differing_rows(expected, actual, rtol=1e-9, atol=1e-9):
+    """Boolean mask of the rows where any column differs (floats within tolerance, missing == missing)"""
+    differs = np.zeros(len(expected), dtype=bool)
+    for column in expected.columns:
+        left, right = expected[column], actual[column]
+        if pd.api.types.is_datetime64_any_dtype(left) or pd.api.types.is_datetime64_any_dtype(right):
+            left, right = pd.to_datetime(left), pd.to_datetime(right)
+            same = (left == right).to_numpy() | (left.isna() & right.isna()).to_numpy()
+        elif pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+            same = np.isclose(left.to_numpy(dtype=float), right.to_numpy(dtype=float),
+                              rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            same = (left == right).to_numpy() | (left.isna() & right.isna()).to_numpy()
+        differs |= ~same
+    return differs
+
+
+def check_stage(stage, sales, context, reference, rtol, atol, max_report=10, diff_dir=None):
+    """Runs the reference and every candidate of `stage`; returns one summary row per candidate"""
+    input_columns, run_reference = STAGES[stage]
+    started = time.perf_counter()
+    expected, evaluations = run_reference(sales, context, reference)
+    reference_seconds = time.perf_counter() - started
+
+    summary = []
+    for name, candidate in CANDIDATES.get(stage, {}).items():
+        started = time.perf_counter()
+        actual = candidate(sales, context)
+        candidate_seconds = time.perf_counter() - started
+
+        missing_columns = [column for column in expected.columns if column not in actual.columns]
+        if missing_columns or len(actual) != len(expected):
+            raise ValueError(f"{name} must return {len(expected)} rows with columns {list(expected.columns)}")
+        actual = actual[expected.columns].set_axis(expected.index)
+        differs = differing_rows(expected, actual, rtol, atol)
+
+        print(f"\n----- {stage}: {name} -----")
+        print(f"Reference: {reference_seconds:.2f}s ({evaluations:,} distinct evaluations for {len(sales):,} rows)")
+        print(f"Candidate: {candidate_seconds:.2f}s")
+        if differs.any():
+            report = pd.concat([sales.loc[differs, input_columns],
+                                expected[differs].add_suffix('_expected'),
+                                actual[differs].add_suffix('_actual')], axis=1)
+            print(f"❌ {differs.sum():,} differing rows; first {min(max_report, len(report))}:")
+            print(report.head(max_report).to_string())
+            if diff_dir:
+                os.makedirs(diff_dir, exist_ok=True)
+                report.to_csv(os.path.join(diff_dir, f"{stage}__{name}.csv"))
+        else:
+            print("✅ identical")
+
+        summary.append({'stage': stage, 'candidate': name, 'rows': len(sales), 'differing_rows': int(differs.sum()),
+                        'reference_seconds': round(reference_seconds, 3),
+                        'candidate_seconds': round(candidate_seconds, 3)})
+    return summary
+
+
+def load_sales(path):
+    if path.endswith('.xlsx'):
+        return pd.read_excel(path, sheet_name='Sales_Orders_Raw')
+    return pd.read_parquet(os.path.join(path, 'Sales_Orders_Raw.parquet'))
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arguments.add_argument('--rows', type=int, default=1_000_000, help="size of the synthetic input")
+    arguments.add_argument('--seed', type=int, default=42)
+    arguments.add_argument('--input', help="raw workbook or Parquet folder instead of a synthetic input")
+    arguments.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    arguments.add_argument('--rtol', type=float, default=1e-9)
+    arguments.add_argument('--atol', type=float, default=1e-9)
+    arguments.add_argument('--max-report', type=int, default=10)
+    arguments.add_argument('--diff-dir', help="folder for one CSV of differing rows per candidate")
+    options = arguments.parse_args()
+
+    input_path = options.input or ensure_input(options.rows, options.seed, BENCH_DIR)
+    reference = load_reference()
+    sales = prepare_inputs(load_sales(input_path), reference, CategoryMapper.from_json(MAPPING_CONFIG_PATH))
+    context = build_context(sales, reference)
+
+    summary = []
+    for stage in options.stages:
+        summary.extend(check_stage(stage, sales, context, reference, options.rtol, options.atol,
+                                   options.max_report, options.diff_dir))
+
+    print("\n----- Summary -----")
+    print(pd.DataFrame(summary).to_string(index=False))
+    if any(row['differing_rows'] for row in summary):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Lean Execution Mode for the EG Retail Sales cleaning pipeline
+Drops raw and intermediate columns as soon as the last stage that reads them has finished
+
+Approach:
+1. The release schedule lists, per stage, the columns that no later stage reads
+   (raw columns whose clean equivalent exists, helper flags, debugging columns);
+   it is derived from the stage declarations by PipelinePlan.release_schedule()
+2. At the end of each stage the released columns are deleted from the frame in place (`del`),
+   never by rebuilding the frame, so no whole-frame copy is made
+3. Columns of the BI output are never released, so the frame shrinks towards the final dataset
+"""
+
+from Pipeline_Profiler import MB
+
+
+class ColumnReleaser:
+    """Deletes the columns scheduled after each stage, except the ones in `keep`"""
+
+    def __init__(self, keep, schedule, enabled=True):
+        self.keep = set(keep)
+        self.schedule = schedule
+        self.enabled = enabled
+        self.released = {}
+
+    def release(self, df, stage):
+        """Drops the columns released after `stage` from `df` in place; returns their names"""
+        if not self.enabled:
+            return []
+        columns = [c for c in self.schedule.get(stage, []) if c in df.columns and c not in self.keep]
+        if columns:
+            freed = sum(df[column].memory_usage(deep=True, index=False) for column in columns) / MB
+            for column in columns:
+                del df[column]
+            self.released[stage] = (columns, freed)
+        return columns
+
+    def summary(self):
+        """One line per stage: how many columns were released and the memory they held"""
+        if not self.enabled:
+            return "Lean mode disabled."
+        lines = [f"{stage:<20} released {len(columns):2d} columns ({freed:.2f} MB)"
+                 for stage, (columns, freed) in self.released.items()]
+        return '\n'.join(lines) or "No columns released."
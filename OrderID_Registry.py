@@ -0,0 +1,104 @@
+"""
+Persistent OrderID Registry for EG Retail Sales Case Study
+Maps (original OrderID, row fingerprint, occurrence) -> permanent cleaned ID (NEW00001, ...)
+
+The registry is a local SQLite file. A run does ONE batched lookup of all keys and
+ONE batched insert of the keys it has never seen, so the same conflicting order gets
+the same OrderID_cleaned on every run and warehouse joins stay valid without full reloads.
+"""
+
+import sqlite3
+
+import pandas as pd
+
+REPLACEMENT_PREFIX = 'NEW'
+REPLACEMENT_DIGITS = 5
+
+KEY_COLUMNS = ['id', 'fp', 'occurrence']
+
+
+class OrderIDRegistry:
+    """SQLite-backed key -> cleaned ID store with bulk lookup and bulk allocation"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS order_id_map (
+                original_order_id TEXT NOT NULL,
+                row_fingerprint   TEXT NOT NULL,
+                occurrence        INTEGER NOT NULL,
+                sequence          INTEGER NOT NULL UNIQUE,
+                cleaned_id        TEXT NOT NULL UNIQUE,
+                first_seen        TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (original_order_id, row_fingerprint, occurrence)
+            )
+        """)
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def _key_rows(keys):
+        return list(zip(keys['id'].astype(str), keys['fp'].astype(str), keys['occurrence'].astype(int)))
+
+    def bulk_lookup(self, keys):
+        """Returns the stored cleaned ID for every key (missing where never allocated)"""
+        cursor = self.connection.cursor()
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys "
+                       "(position INTEGER, original_order_id TEXT, row_fingerprint TEXT, occurrence INTEGER)")
+        cursor.execute("DELETE FROM lookup_keys")
+        cursor.executemany("INSERT INTO lookup_keys VALUES (?, ?, ?, ?)",
+                           [(position, *row) for position, row in enumerate(self._key_rows(keys))])
+        found = cursor.execute("""
+            SELECT k.position, m.cleaned_id
+            FROM lookup_keys k
+            JOIN order_id_map m
+              ON m.original_order_id = k.original_order_id
+             AND m.row_fingerprint = k.row_fingerprint
+             AND m.occurrence = k.occurrence
+        """).fetchall()
+
+        cleaned = pd.Series(pd.NA, index=range(len(keys)), dtype=object)
+        if found:
+            positions, ids = zip(*found)
+            cleaned.iloc[list(positions)] = list(ids)
+        cleaned.index = keys.index
+        return cleaned
+
+    def bulk_allocate(self, keys):
+        """Allocates the next sequence numbers to new keys and stores them in one transaction"""
+        if keys.empty:
+            return pd.Series(dtype=object, index=keys.index)
+
+        last_sequence = self.connection.execute("SELECT COALESCE(MAX(sequence), 0) FROM order_id_map").fetchone()[0]
+        sequences = pd.Series(range(last_sequence + 1, last_sequence + 1 + len(keys)), index=keys.index)
+        cleaned = REPLACEMENT_PREFIX + sequences.astype(str).str.zfill(REPLACEMENT_DIGITS)
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO order_id_map (original_order_id, row_fingerprint, occurrence, sequence, cleaned_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(*row, int(sequence), cleaned_id)
+                 for row, sequence, cleaned_id in zip(self._key_rows(keys), sequences, cleaned)]
+            )
+        return cleaned
+
+    def assign(self, keys):
+        """
+        Cleaned IDs for all keys: existing ones are reused, new ones are allocated.
+        Keys are unique per row (the occurrence column separates exact duplicates).
+        """
+        keys = keys[KEY_COLUMNS]
+        cleaned = self.bulk_lookup(keys)
+        new_keys = keys[cleaned.isna()]
+        if not new_keys.empty:
+            cleaned = cleaned.fillna(self.bulk_allocate(new_keys))
+        return cleaned
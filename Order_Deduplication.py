@@ -0,0 +1,92 @@
+"""
+OrderID Duplicate Analysis for EG Retail Sales Case Study
+Splits duplicated OrderIDs into exact duplicates and conflicting records
+
+Approach:
+1. Hash the identifying columns of every row (FINGERPRINT_COLUMNS) into a 64-bit fingerprint
+   (no Python per row); correcting a descriptive field such as Notes or SalesRep keeps the fingerprint
+2. Compare fingerprints and CustomerIDs inside each OrderID with vectorized nunique transforms
+3. Give duplicated rows a replacement ID keyed by (OrderID, fingerprint, occurrence),
+   so the same record gets the same ID on every run instead of being renumbered
+   (permanent sequential IDs when an OrderIDRegistry is supplied, see OrderID_Registry.py)
+"""
+
+import pandas as pd
+
+REPLACEMENT_PREFIX = 'NEW'
+REPLACEMENT_DIGITS = 20  # every digit of a 64-bit hash
+
+# Columns that identify an order line: two rows of one OrderID with the same values here are the same record
+FINGERPRINT_COLUMNS = ['OrderDate', 'CustomerID', 'ProductSKU', 'ProductName', 'Quantity', 'UnitPrice', 'Currency']
+
+
+def row_fingerprints(df, columns=FINGERPRINT_COLUMNS):
+    """64-bit hash of the identifying columns of every row"""
+    return pd.util.hash_pandas_object(df[list(columns)], index=False)
+
+
+def analyze_order_duplicates(df, id_col='OrderID', customer_col='CustomerID', fingerprint_columns=FINGERPRINT_COLUMNS):
+    """
+    Classifies every row of a duplicated OrderID.
+
+    Returns a DataFrame aligned to `df.index`:
+        Row_Fingerprint            - hash of the row's identifying columns (fingerprint_columns)
+        is_OrderID_duplicated_flag - OrderID appears more than once
+        is_exact_duplicate         - another row has the same OrderID AND the same identifying content
+        has_content_conflict       - rows sharing the OrderID differ in identifying content
+        has_customer_conflict      - rows sharing the OrderID have different CustomerIDs
+    """
+    analysis = pd.DataFrame(index=df.index)
+    analysis['Row_Fingerprint'] = row_fingerprints(df, fingerprint_columns)
+
+    keyed = pd.DataFrame({'id': df[id_col], 'fp': analysis['Row_Fingerprint'], 'customer': df[customer_col]})
+    by_id = keyed.groupby('id', dropna=False)
+
+    analysis['is_OrderID_duplicated_flag'] = df[id_col].duplicated(keep=False)
+    analysis['is_exact_duplicate'] = keyed.duplicated(subset=['id', 'fp'], keep=False)
+    analysis['has_content_conflict'] = by_id['fp'].transform('nunique') > 1
+    analysis['has_customer_conflict'] = by_id['customer'].transform('nunique') > 1
+    return analysis
+
+
+def replacement_keys(df, analysis, id_col='OrderID'):
+    """(OrderID, fingerprint, occurrence) key of every duplicated row"""
+    duplicated = analysis['is_OrderID_duplicated_flag']
+    keys = pd.DataFrame({
+        'id': df.loc[duplicated, id_col].astype(str),
+        'fp': analysis.loc[duplicated, 'Row_Fingerprint'],
+    })
+    # Exact duplicates share a fingerprint; the occurrence number keeps their IDs unique
+    keys['occurrence'] = keys.groupby(['id', 'fp']).cumcount()
+    return keys
+
+
+def stable_replacement_ids(keys):
+    """
+    Hash-derived replacement IDs (the full 64-bit hash of the key, as 20 digits), formatted with
+    vectorized string operations. They do not depend on row position in the current load.
+    A key whose hash collides with another key's is re-hashed with a salt until every ID is unique.
+    """
+    key_hash = pd.util.hash_pandas_object(keys, index=False)
+    salt = 0
+    while True:
+        clashing = key_hash.duplicated(keep='first')
+        if not clashing.any():
+            break
+        salt += 1
+        salted = keys[clashing.to_numpy()].assign(salt=salt)
+        key_hash[clashing] = pd.util.hash_pandas_object(salted, index=False).to_numpy()
+    return REPLACEMENT_PREFIX + key_hash.astype(str).str.zfill(REPLACEMENT_DIGITS)
+
+
+def create_cleaned_ids(df, analysis, id_col='OrderID', registry=None):
+    """
+    OrderID_cleaned: the original ID, or a stable replacement for duplicated rows.
+    With an OrderIDRegistry the replacements are permanent sequential IDs (NEW00001, ...)
+    looked up / allocated in one batch; without one they are hash-derived.
+    """
+    cleaned = df[id_col].astype(object).copy()
+    keys = replacement_keys(df, analysis, id_col)
+    replacements = registry.assign(keys) if registry is not None else stable_replacement_ids(keys)
+    cleaned.loc[replacements.index] = replacements
+    return cleaned
@@ -0,0 +1,167 @@
+"""
+Partitioned BI Dataset for the EG Retail Sales dashboard
+The BI dataset as a Hive-partitioned Parquet folder, one file per order month, read back month by month
+
+Approach:
+1. write_partitions() splits the BI rows by Order_Year / Order_YearMonth and writes each month to
+   <root>/Order_Year=2024/Order_YearMonth=2024-03/part-0.parquet (the partition columns live in the
+   folder names, not in the files); rows without an order date go to __HIVE_DEFAULT_PARTITION__
+2. _partitions.json keeps a content hash per month: a re-run only rewrites the months whose rows
+   changed and deletes the months that no longer have rows, the unchanged files are left alone
+3. read_partitions() takes a date range and opens only the month folders that overlap it (the
+   partition filter is evaluated on the folder names before a file is opened); the rows of the
+   first and last month are then filtered on OrderDate
+4. Every month file uses the schema of the whole frame, so a month whose column is all-null still
+   has the same types as the others
+
+Files and the manifest are written under a temporary name and renamed, so a reader never sees a
+half-written month. pandas can read the folder too: pd.read_parquet(root, filters=[...]).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for the partitioned BI dataset
+    pa = ds = pq = None
+
+PARTITION_COLUMNS = ['Order_Year', 'Order_YearMonth']
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+MANIFEST_FILE = '_partitions.json'
+PART_FILE = 'part-0.parquet'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the partitioned BI dataset")
+
+
+def _partition_schema():
+    return pa.schema([('Order_Year', pa.int32()), ('Order_YearMonth', pa.string())])
+
+
+def _folder_values(df):
+    """Folder name of every row's Order_Year and Order_YearMonth (missing dates -> default partition)"""
+    years = pd.to_numeric(df['Order_Year'], errors='coerce')
+    months = df['Order_YearMonth'].astype(object)
+    dated = years.notna() & months.notna() & (months != 'NaT')
+    year_folder = pd.Series(DEFAULT_PARTITION, index=df.index, dtype=object)
+    year_folder[dated] = years[dated].astype('int64').astype(str)
+    month_folder = pd.Series(DEFAULT_PARTITION, index=df.index, dtype=object)
+    month_folder[dated] = months[dated].astype(str)
+    return year_folder, month_folder
+
+
+def _content_hash(part, schema):
+    """sha256 of a month's rows (values, order and schema)"""
+    digest = hashlib.sha256(str(schema).encode())
+    digest.update(pd.util.hash_pandas_object(part, index=False).to_numpy(dtype=np.uint64).tobytes())
+    return digest.hexdigest()
+
+
+def read_manifest(root):
+    """{partition folder: {'rows', 'hash'}} of the last write (empty when there is none)"""
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def _write_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def write_partitions(df, root):
+    """
+    Writes `df` as one Parquet file per Order_Year / Order_YearMonth under `root`, rewriting only the
+    months whose rows changed since the last write; returns {'written', 'unchanged', 'deleted'}
+    """
+    _require_pyarrow()
+    os.makedirs(root, exist_ok=True)
+    previous = read_manifest(root)
+    data = df.drop(columns=PARTITION_COLUMNS)
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+
+    manifest, written, unchanged = {}, [], []
+    year_folder, month_folder = _folder_values(df)
+    for (year, month), positions in data.groupby([year_folder, month_folder], sort=True).indices.items():
+        folder = f"Order_Year={year}/Order_YearMonth={month}"
+        part = data.iloc[positions]
+        content_hash = _content_hash(part, schema)
+        manifest[folder] = {'rows': len(part), 'hash': content_hash}
+        file_path = os.path.join(root, folder, PART_FILE)
+        if previous.get(folder, {}).get('hash') == content_hash and os.path.exists(file_path):
+            unchanged.append(folder)
+            continue
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False), file_path + '.tmp')
+        os.replace(file_path + '.tmp', file_path)
+        written.append(folder)
+
+    # Months of the last write that have no rows any more
+    deleted = [folder for folder in previous if folder not in manifest]
+    for folder in deleted:
+        shutil.rmtree(os.path.join(root, folder), ignore_errors=True)
+        year_path = os.path.dirname(os.path.join(root, folder))
+        if os.path.isdir(year_path) and not os.listdir(year_path):
+            os.rmdir(year_path)
+
+    _write_manifest(root, manifest)
+    return {'written': written, 'unchanged': unchanged, 'deleted': deleted}
+
+
+def _dataset(root):
+    return ds.dataset(root, format='parquet', exclude_invalid_files=True,
+                      partitioning=ds.partitioning(_partition_schema(), flavor='hive'))
+
+
+def _range_filter(start, end):
+    """Dataset filter for OrderDate in [start, end] (whole days): a month filter the partitions are
+    pruned with, and an OrderDate filter for the rows of the boundary months"""
+    expression = None
+    if start is not None:
+        start = pd.Timestamp(start).normalize()
+        expression = ((ds.field('Order_YearMonth') >= start.strftime('%Y-%m'))
+                      & (ds.field('OrderDate') >= pa.scalar(start.to_pydatetime(), pa.timestamp('us'))))
+    if end is not None:
+        end = pd.Timestamp(end).normalize()
+        before_end = ((ds.field('Order_YearMonth') <= end.strftime('%Y-%m'))
+                      & (ds.field('OrderDate') < pa.scalar((end + pd.Timedelta(days=1)).to_pydatetime(),
+                                                            pa.timestamp('us'))))
+        expression = before_end if expression is None else expression & before_end
+    return expression
+
+
+def read_partitions(root, start=None, end=None, columns=None):
+    """
+    The rows of the partitioned dataset at `root` with OrderDate from `start` to `end` (inclusive,
+    either may be None), as a DataFrame of `columns` (None = all, partition columns included).
+    Only the month folders that overlap the range are opened.
+    """
+    _require_pyarrow()
+    dataset = _dataset(root)
+    expression = _range_filter(start, end)
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+def opened_partitions(root, start=None, end=None):
+    """(month folders read_partitions() opens for the range, month folders in the dataset)"""
+    _require_pyarrow()
+    dataset = _dataset(root)
+    months = _range_filter(start, end)
+    total = sum(1 for _ in dataset.get_fragments())
+    opened = sum(1 for _ in dataset.get_fragments(filter=months)) if months is not None else total
+    return opened, total
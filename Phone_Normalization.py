@@ -0,0 +1,73 @@
+"""
+Phone Normalization for EG Retail Sales Case Study
+Reduces Egyptian mobile and landline numbers to canonical E.164 (+20XXXXXXXXXX)
+
+Handles:
+- Arabic-Indic digits (٠١٢...) and Excel float artefacts (1012345678.0)
+- +20 / 0020 / 20 country prefixes and the domestic trunk 0
+- Spaces, dashes, dots, slashes and parentheses
+
+Every regex runs once per UNIQUE raw value; results are mapped back to the rows
+through factorized codes, so the cost is O(unique) regex work + O(n) indexing.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+EGYPT_COUNTRY_CODE = '+20'
+
+# Arabic-Indic and Persian digits -> ASCII digits
+ARABIC_DIGIT_MAP = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+
+PHONE_SEPARATORS = re.compile(r'\.0$|[\s\-\.\(\)/]')
+# Optional international prefix, optional trunk 0, then the national significant number
+EGYPT_PHONE = re.compile(r'^(?:(?:\+|00)?20)?0?(?P<nsn>\d{8,10})$')
+# Mobile: 010 / 011 / 012 / 015 followed by 8 digits
+EGYPT_MOBILE = re.compile(r'^1[0125]\d{8}$')
+# Landline: Cairo/Giza (2) + 8 digits, Alexandria (3) + 7 digits, other area codes + 7 digits
+EGYPT_LANDLINE = re.compile(r'^(?:2\d{8}|3\d{7}|(?:13|4[0-8]|5[057]|6[2-9]|8[2-8]|9[2-7])\d{7})$')
+
+
+def normalize_phone_values(values):
+    """
+    Normalizes an array of unique raw phone values.
+    Returns a DataFrame (one row per value) with Phone_Clean, Phone_Type and Phone_IsValid.
+    """
+    raw = pd.Series(values, dtype=object).astype(str)
+    digits = (raw.str.strip()
+                 .str.translate(ARABIC_DIGIT_MAP)
+                 .str.replace(PHONE_SEPARATORS, '', regex=True))
+
+    nsn = digits.str.extract(EGYPT_PHONE)['nsn']
+    is_mobile = nsn.str.fullmatch(EGYPT_MOBILE).fillna(False).astype(bool)
+    is_landline = nsn.str.fullmatch(EGYPT_LANDLINE).fillna(False).astype(bool)
+    is_valid = is_mobile | is_landline
+
+    return pd.DataFrame({
+        'Phone_Clean': (EGYPT_COUNTRY_CODE + nsn).where(is_valid),
+        'Phone_Type': np.select([is_mobile, is_landline], ['Mobile', 'Landline'], default='Invalid'),
+        'Phone_IsValid': is_valid,
+    })
+
+
+def normalize_phones(phones):
+    """
+    Normalizes a phone column to E.164 with validity flags.
+
+    Returns a DataFrame aligned to `phones.index`:
+        Phone_Clean   - '+20...' canonical number, NaN when missing/invalid
+        Phone_Type    - 'Mobile', 'Landline', 'Invalid' or 'Missing'
+        Phone_IsValid - True only for a recognised Egyptian number
+    """
+    codes, uniques = pd.factorize(phones)
+    normalized = normalize_phone_values(uniques)
+
+    # Append one "Missing" row so that code -1 (null phone) lands on it
+    missing_row = pd.DataFrame({'Phone_Clean': [np.nan], 'Phone_Type': ['Missing'], 'Phone_IsValid': [False]})
+    normalized = pd.concat([normalized, missing_row], ignore_index=True)
+
+    result = normalized.take(codes)
+    result.index = phones.index
+    return result
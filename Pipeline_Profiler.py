@@ -0,0 +1,223 @@
+"""
+Per-Stage Resource Instrumentation for the EG Retail Sales cleaning pipeline
+Records wall time, CPU time, peak RSS, DataFrame memory delta and rows in/out per stage
+
+Usage inside a script:
+    profiler = StageProfiler()
+    profiler.stage("OrderID Handling", sales)     # closes the previous stage, opens this one
+    ...
+    profiler.finish(sales)                        # closes the last stage
+    profiler.record("Dates", wall, cpu, df_in, df_out)  # a stage timed elsewhere (Stage_Scheduler.py)
+    profiler.write_json("run_log.json")
+    profiler.append_csv("run_history.csv")        # one row per stage per run, for regressions
+    profiler.write_flame_report("run.folded")     # collapsed stacks for flamegraph.pl / speedscope
+
+Peak RSS per stage is sampled in a background thread when psutil is installed;
+without it the process high-water mark from the `resource` module is used instead.
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # optional: only needed for per-stage peak RSS sampling
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MB = 1024 * 1024
+RSS_SAMPLE_SECONDS = 0.01
+
+STAGE_FIELDS = [
+    'run_id', 'started_at', 'stage', 'wall_seconds', 'cpu_seconds',
+    'peak_rss_mb', 'rss_start_mb', 'rss_end_mb',
+    'df_memory_in_mb', 'df_memory_out_mb', 'df_memory_delta_mb',
+    'rows_in', 'rows_out', 'columns_in', 'columns_out',
+]
+
+
+def _current_rss():
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    if resource is not None:
+        # ru_maxrss is a high-water mark (not current RSS): bytes on macOS, KiB elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+    return 0
+
+
+class _PeakRSSSampler(threading.Thread):
+    """Polls the process RSS while a stage runs and keeps the maximum"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = _current_rss()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, _current_rss())
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.peak = max(self.peak, _current_rss())
+        return self.peak
+
+
+def _frame_stats(df, deep):
+    if df is None:
+        return None, None, None
+    return df.memory_usage(deep=deep).sum() / MB, len(df), df.shape[1]
+
+
+class StageProfiler:
+    """Collects one resource record per pipeline stage"""
+
+    def __init__(self, pipeline_name='Retail_Sales_Cleaned', deep=True, enabled=True):
+        self.pipeline_name = pipeline_name
+        self.deep = deep
+        self.enabled = enabled
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.records = []
+        self._open = None
+
+    def stage(self, name, df=None):
+        """Closes the currently open stage (with `df` as its output) and opens `name`"""
+        if not self.enabled:
+            return
+        self.finish(df)
+        memory_in, rows_in, columns_in = _frame_stats(df, self.deep)
+        sampler = _PeakRSSSampler() if psutil is not None else None
+        if sampler is not None:
+            sampler.start()
+        self._open = {
+            'stage': name,
+            'wall_start': time.perf_counter(),
+            'cpu_start': time.process_time(),
+            'rss_start': _current_rss(),
+            'sampler': sampler,
+            'df_memory_in_mb': memory_in,
+            'rows_in': rows_in,
+            'columns_in': columns_in,
+        }
+
+    def finish(self, df=None):
+        """Closes the open stage, if any, using `df` as its output frame"""
+        if not self.enabled or self._open is None:
+            return
+        opened, self._open = self._open, None
+        sampler = opened['sampler']
+        peak_rss = sampler.stop() if sampler is not None else _current_rss()
+        memory_out, rows_out, columns_out = _frame_stats(df, self.deep)
+        memory_in = opened['df_memory_in_mb']
+
+        self.records.append({
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'stage': opened['stage'],
+            'wall_seconds': time.perf_counter() - opened['wall_start'],
+            'cpu_seconds': time.process_time() - opened['cpu_start'],
+            'peak_rss_mb': peak_rss / MB,
+            'rss_start_mb': opened['rss_start'] / MB,
+            'rss_end_mb': _current_rss() / MB,
+            'df_memory_in_mb': memory_in,
+            'df_memory_out_mb': memory_out,
+            'df_memory_delta_mb': (memory_out - memory_in) if memory_in is not None and memory_out is not None else None,
+            'rows_in': opened['rows_in'],
+            'rows_out': rows_out,
+            'columns_in': opened['columns_in'],
+            'columns_out': columns_out,
+        })
+
+    def record(self, name, wall_seconds, cpu_seconds, df_in=None, df_out=None):
+        """
+        Adds the record of a stage timed elsewhere (e.g. one of several stages run at the same time by
+        Stage_Scheduler.py); RSS is the process RSS when it is recorded, since concurrent stages share it
+        """
+        if not self.enabled:
+            return
+        memory_in, rows_in, columns_in = _frame_stats(df_in, self.deep)
+        memory_out, rows_out, columns_out = _frame_stats(df_out, self.deep)
+        rss = _current_rss() / MB
+        self.records.append({
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'stage': name,
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': cpu_seconds,
+            'peak_rss_mb': rss,
+            'rss_start_mb': rss,
+            'rss_end_mb': rss,
+            'df_memory_in_mb': memory_in,
+            'df_memory_out_mb': memory_out,
+            'df_memory_delta_mb': (memory_out - memory_in) if memory_in is not None and memory_out is not None else None,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'columns_in': columns_in,
+            'columns_out': columns_out,
+        })
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=STAGE_FIELDS)
+
+    def write_json(self, path):
+        """Writes this run's stage records as one JSON document"""
+        with open(path, 'w', encoding='utf-8') as log_file:
+            json.dump({
+                'pipeline': self.pipeline_name,
+                'run_id': self.run_id,
+                'started_at': self.started_at,
+                'psutil_available': psutil is not None,
+                'stages': self.records,
+            }, log_file, indent=2)
+
+    def append_csv(self, path):
+        """Appends this run's stage records to a CSV history (header written once)"""
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='', encoding='utf-8') as log_file:
+            writer = csv.DictWriter(log_file, fieldnames=STAGE_FIELDS)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(self.records)
+
+    def write_flame_report(self, path, metric='wall_seconds'):
+        """
+        Writes collapsed stacks ("pipeline;stage value") that flamegraph.pl or
+        speedscope render as a flame graph. Time metrics are written in microseconds.
+        """
+        scale = 1_000_000 if metric.endswith('seconds') else 1
+        with open(path, 'w', encoding='utf-8') as report_file:
+            for record in self.records:
+                value = record[metric] or 0
+                report_file.write(f"{self.pipeline_name};{record['stage']} {int(round(value * scale))}\n")
+
+    def summary(self, width=40):
+        """Text report with one bar per stage proportional to its wall time"""
+        if not self.records:
+            return "No stages recorded."
+        total = sum(record['wall_seconds'] for record in self.records) or 1.0
+        name_width = max(len(record['stage']) for record in self.records)
+        lines = [f"Run {self.run_id} - total {total:.2f}s"]
+        for record in self.records:
+            share = record['wall_seconds'] / total
+            delta = record['df_memory_delta_mb']
+            lines.append(
+                f"{record['stage']:<{name_width}} {'█' * int(round(share * width)):<{width}} "
+                f"{record['wall_seconds']:8.3f}s  peak {record['peak_rss_mb']:8.1f} MB  "
+                f"df Δ {delta if delta is not None else 0:+8.2f} MB  rows {record['rows_in']}→{record['rows_out']}"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,51 @@
+"""
+Product Master Lookup for EG Retail Sales Case Study
+Hash index (ProductName -> SKU / Category) built once from the cleaned Products_Raw sheet
+
+Instead of merging the whole (wide) sales frame with the products table and dropping the
+helper columns afterwards, the index is used with a vectorized .map() on the NULL rows only,
+so imputation costs O(nulls) and the sales frame is never copied.
+"""
+
+import pandas as pd
+
+
+def build_product_index(products, name_col='ProductName', sku_col='SKU', category_col='Category'):
+    """
+    Returns (index, conflicts):
+        index     - DataFrame indexed by product name with 'SKU' and 'Category'
+                    (first occurrence wins, like drop_duplicates(keep='first'))
+        conflicts - DataFrame of names that map to more than one SKU in the master
+    """
+    master = products[[name_col, sku_col, category_col]].dropna(subset=[name_col])
+    index = (master.drop_duplicates(subset=[name_col], keep='first')
+                   .set_index(name_col)
+                   .rename(columns={sku_col: 'SKU', category_col: 'Category'}))
+
+    sku_counts = master.groupby(name_col)[sku_col].nunique()
+    conflicts = (master[master[name_col].isin(sku_counts[sku_counts > 1].index)]
+                 .drop_duplicates()
+                 .sort_values([name_col, sku_col]))
+    return index, conflicts
+
+
+def fill_from_product_index(sales, index, name_col='ProductName_Clean', sku_col='ProductSKU_Clean',
+                            category_col='Category_Clean'):
+    """
+    Fills missing SKU / Category values in place from the product index.
+    Returns the mask of rows whose SKU was imputed.
+    """
+    null_sku_mask = sales[sku_col].isnull()
+    sales.loc[null_sku_mask, sku_col] = sales.loc[null_sku_mask, name_col].map(index['SKU'])
+
+    null_category_mask = sales[category_col].isnull()
+    if null_category_mask.any():
+        sales.loc[null_category_mask, category_col] = sales.loc[null_category_mask, name_col].map(index['Category'])
+
+    return null_sku_mask & sales[sku_col].notna()
+
+
+def flag_sku_conflicts(sales, index, name_col='ProductName_Clean', sku_col='ProductSKU_Clean'):
+    """True where the order carries a SKU that differs from the master SKU of its product name"""
+    master_sku = sales[name_col].map(index['SKU'])
+    return sales[sku_col].notna() & master_sku.notna() & (sales[sku_col] != master_sku)
@@ -0,0 +1,139 @@
+"""
+Packed Data-Quality Flags for the EG Retail Sales cleaning pipeline
+Every issue found on a row is one bit of a single unsigned integer column (DQ_Flags)
+
+Approach:
+1. Every issue has a fixed bit number: the stage flags (OrderID duplication, the coordinate fixes,
+   product lookup, shipping-cost imputation, extreme totals) in STAGE_FLAG_BITS, bits 0-15, and
+   every rule of Validation_Rules.py in RULE_FLAG_BITS, in the reserved range 16-47
+2. Stages OR their masks into the column (set_flag / set_rule_flags), so a later issue never
+   overwrites an earlier one the way the single investigation_flag string did
+3. "Rows with issue X" is one bitwise AND (flag_mask); the counts of every flag come from one
+   np.unpackbits over the column (flag_counts)
+4. decode_flags() turns the integers back into readable names, once per DISTINCT value
+
+A new flag or validation rule gets the next free bit of its range here; the bit of an existing flag
+never moves, so DQ_Flags values in older BI exports keep their meaning (a rule missing from
+RULE_FLAG_BITS is an error at import). The column is always uint64; bits stay below 48 so the values
+are exact in Excel, which stores numbers as doubles.
+"""
+
+import numpy as np
+import pandas as pd
+
+from Validation_Rules import DATA_QUALITY_RULES
+
+FLAG_COLUMN = 'DQ_Flags'
+
+STAGE_FLAG_BITS = {
+    'orderid_duplicated': 0,
+    'orderid_customer_conflict': 1,
+    'orderid_content_conflict': 2,
+    'coords_initially_missing': 3,
+    'coords_manually_swapped': 4,
+    'coords_globally_invalid': 5,
+    'coords_out_of_egypt': 6,
+    'coords_imputed': 7,
+    'coords_unresolved': 8,
+    'sku_imputed_by_name': 9,
+    'sku_conflict': 10,
+    'shipping_cost_imputed': 11,
+    'totalamount_extreme': 12,
+}
+
+# One bit per rule of Validation_Rules.DATA_QUALITY_RULES
+RULE_FLAG_BITS = {
+    'orderdate_missing': 16,
+    'deliverydate_missing': 17,
+    'delivery_before_order': 18,
+    'return_before_order': 19,
+    'return_before_delivery': 20,
+    'subtotal_mismatch': 21,
+    'quantity_not_positive': 22,
+    'coords_outside_global_bounds': 23,
+    'coords_outside_egypt': 24,
+    'store_with_shipping': 25,
+    'no_return_with_returndate': 26,
+    'unpaid_delivered': 27,
+    'free_shipping_not_store': 28,
+}
+
+STAGE_FLAG_RANGE = range(0, 16)
+RULE_FLAG_RANGE = range(16, 48)
+
+
+def _check_bits():
+    """Every rule has a bit, every bit is used once and lies in its range"""
+    missing = [name for name, _, _, _ in DATA_QUALITY_RULES if name not in RULE_FLAG_BITS]
+    if missing:
+        raise ValueError(f"Validation rules without a DQ_Flags bit: {missing}; add them to RULE_FLAG_BITS "
+                         f"with the next free bit of {RULE_FLAG_RANGE}")
+    for bits, allowed in ((STAGE_FLAG_BITS, STAGE_FLAG_RANGE), (RULE_FLAG_BITS, RULE_FLAG_RANGE)):
+        outside = {name: bit for name, bit in bits.items() if bit not in allowed}
+        if outside:
+            raise ValueError(f"DQ_Flags bits outside {allowed}: {outside}")
+    used = list(STAGE_FLAG_BITS.values()) + list(RULE_FLAG_BITS.values())
+    if len(set(used)) != len(used):
+        raise ValueError("Two DQ_Flags flags share a bit")
+
+
+_check_bits()
+
+FLAG_BITS = dict(sorted({**STAGE_FLAG_BITS, **RULE_FLAG_BITS}.items(), key=lambda item: item[1]))
+QUALITY_FLAGS = list(FLAG_BITS)
+FLAG_DTYPE = np.uint64
+
+
+def _bits(*names):
+    """The OR of the bits of `names` as one FLAG_DTYPE value"""
+    value = 0
+    for name in names:
+        value |= 1 << FLAG_BITS[name]
+    return FLAG_DTYPE(value)
+
+
+def empty_flags(length):
+    return np.zeros(length, dtype=FLAG_DTYPE)
+
+
+def set_flag(df, name, mask, column=FLAG_COLUMN):
+    """Sets flag `name` on the rows where `mask` is True (missing values -> not set)"""
+    mask = pd.Series(mask, index=df.index).fillna(False).to_numpy(dtype=bool)
+    df[column] = df[column].to_numpy() | (mask.astype(FLAG_DTYPE) * _bits(name))
+
+
+def set_rule_flags(df, report, column=FLAG_COLUMN):
+    """Sets the flags of every rule of a Validation_Rules.ValidationReport in one pass"""
+    if report.masks.shape[1] == 0:
+        return
+    bits = np.array([_bits(name) for name in report.masks.columns], dtype=FLAG_DTYPE)
+    packed = np.bitwise_or.reduce(report.masks.to_numpy().astype(FLAG_DTYPE) * bits, axis=1)
+    df[column] = df[column].to_numpy() | packed
+
+
+def flag_mask(flags, *names, require_all=False):
+    """Boolean array of the rows carrying any (or, with require_all, every) flag of `names`"""
+    bits = _bits(*names)
+    flags = np.asarray(flags, dtype=FLAG_DTYPE)
+    return (flags & bits) == bits if require_all else (flags & bits) != 0
+
+
+def decode(value):
+    """Flag names set in one DQ_Flags value"""
+    return [name for name, bit in FLAG_BITS.items() if int(value) >> bit & 1]
+
+
+def decode_flags(flags, separator='|'):
+    """DQ_Flags as readable text ('' for a clean row); each distinct value is decoded once"""
+    codes, uniques = pd.factorize(np.asarray(flags, dtype=FLAG_DTYPE))
+    labels = np.array([separator.join(decode(value)) for value in uniques], dtype=object)
+    index = flags.index if isinstance(flags, pd.Series) else None
+    return pd.Series(labels[codes], index=index)
+
+
+def flag_counts(flags):
+    """Number of rows carrying each flag, counted over the unpacked bits in one pass"""
+    flags = np.ascontiguousarray(np.asarray(flags, dtype=FLAG_DTYPE))
+    bits = np.unpackbits(flags.astype(flags.dtype.newbyteorder('<')).view(np.uint8)
+                         .reshape(len(flags), flags.itemsize), axis=1, bitorder='little')
+    return pd.Series(bits.sum(axis=0, dtype=np.int64)[list(FLAG_BITS.values())], index=QUALITY_FLAGS)
@@ -0,0 +1,135 @@
+"""
+Quarantine Stream for the EG Retail Sales cleaning pipeline
+Rows whose data-quality flags reach a severity threshold are written to a separate Parquet dataset
+
+Approach:
+1. FLAG_SEVERITY gives every DQ_Flags flag (Quality_Flags.py) a severity: info < warning < critical;
+   flags that are not listed are 'info' (issues the cleaner fixes or that do not make a row wrong)
+2. The threshold (QUARANTINE_THRESHOLD, or RETAIL_QUARANTINE_SEVERITY; off by default) selects the
+   flags that quarantine a row; the routing mask is one bitwise AND of DQ_Flags with their combined bits
+3. Quarantined rows get their reason codes (the offending flag names) and highest severity, and
+   are appended to Quarantine_Records.parquet in row groups of QUARANTINE_CHUNK_ROWS rows, so
+   the quarantine is never materialized as one more copy of the frame
+4. The BI dataset and the KPI cube are built from the trusted rows only; Source_Row (the row of
+   Sales_Orders_Raw) lets a quarantined record be re-run on its own once it is fixed
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from Quality_Flags import FLAG_BITS, FLAG_COLUMN, FLAG_DTYPE, decode_flags
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed to write the quarantine dataset
+    pa = pq = None
+
+SEVERITY_LEVELS = ['info', 'warning', 'critical']
+
+FLAG_SEVERITY = {
+    'quantity_not_positive': 'critical',
+    'delivery_before_order': 'critical',
+    'return_before_order': 'critical',
+    'return_before_delivery': 'critical',
+    'coords_outside_global_bounds': 'critical',
+    'totalamount_extreme': 'warning',
+}
+
+# Lowest severity that sends a row to quarantine; None (the default) keeps every row in the BI dataset.
+# Quarantining changes the BI rows and every KPI built from them, so it is opt-in
+# (RETAIL_QUARANTINE_SEVERITY=critical drops only the rows that are wrong, =warning the suspicious ones too)
+QUARANTINE_THRESHOLD = None
+
+QUARANTINE_CHUNK_ROWS = 100_000
+
+
+def severity_of(name):
+    return FLAG_SEVERITY.get(name, 'info')
+
+
+def quarantine_bits(threshold=QUARANTINE_THRESHOLD):
+    """The OR of the bits of every flag at or above `threshold`"""
+    if threshold is None:
+        return FLAG_DTYPE(0)
+    if threshold not in SEVERITY_LEVELS:
+        raise ValueError(f"Unknown quarantine severity {threshold!r}: use one of {SEVERITY_LEVELS} or None")
+    minimum = SEVERITY_LEVELS.index(threshold)
+    value = 0
+    for name, bit in FLAG_BITS.items():
+        if SEVERITY_LEVELS.index(severity_of(name)) >= minimum:
+            value |= 1 << bit
+    return FLAG_DTYPE(value)
+
+
+def quarantine_mask(flags, threshold=QUARANTINE_THRESHOLD):
+    """Boolean array of the rows carrying at least one flag at or above `threshold`"""
+    return (np.asarray(flags, dtype=FLAG_DTYPE) & quarantine_bits(threshold)) != 0
+
+
+def reason_columns(flags, threshold=QUARANTINE_THRESHOLD):
+    """Quarantine_Reasons (offending flag names) and Quarantine_Severity (the highest one) per row"""
+    offending = pd.Series(np.asarray(flags, dtype=FLAG_DTYPE) & quarantine_bits(threshold), index=flags.index)
+    reasons = decode_flags(offending)
+    highest = {reason: max((severity_of(name) for name in reason.split('|')), key=SEVERITY_LEVELS.index)
+               for reason in reasons.unique() if reason}
+    return pd.DataFrame({'Quarantine_Reasons': reasons, 'Quarantine_Severity': reasons.map(highest)})
+
+
+class QuarantineWriter:
+    """Appends quarantined rows to one Parquet file, one row group per chunk"""
+
+    def __init__(self, path, chunk_rows=QUARANTINE_CHUNK_ROWS):
+        if pq is None:
+            raise ImportError("pyarrow is required to write the quarantine dataset")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.writer = None
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, df):
+        for start in range(0, len(df), self.chunk_rows):
+            table = pa.Table.from_pandas(df.iloc[start:start + self.chunk_rows], preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = table.cast(self.writer.schema)
+            self.writer.write_table(table)
+            self.rows += table.num_rows
+
+    def close(self):
+        if self.writer is None:
+            # No quarantined rows: still replace the file of the previous run with an empty one
+            pq.write_table(pa.table({'Source_Row': pa.array([], pa.int64())}), self.path)
+        else:
+            self.writer.close()
+
+
+def route_rows(df, columns, path, threshold=QUARANTINE_THRESHOLD, flag_column=FLAG_COLUMN):
+    """
+    Writes the quarantined rows of `df` (`columns` + Source_Row + reason codes) to `path`;
+    returns the boolean mask of the trusted rows. With the quarantine off (threshold None) no file
+    is written, and the file of an earlier run that had it on is removed.
+    """
+    if threshold is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return np.ones(len(df), dtype=bool)
+    quarantined = quarantine_mask(df[flag_column], threshold)
+    with QuarantineWriter(path) as writer:
+        positions = np.flatnonzero(quarantined)
+        for start in range(0, len(positions), writer.chunk_rows):
+            rows = df.iloc[positions[start:start + writer.chunk_rows]]
+            chunk = rows[columns].copy()
+            chunk.insert(0, 'Source_Row', rows.index.to_numpy())
+            chunk = pd.concat([chunk, reason_columns(rows[flag_column], threshold)], axis=1)
+            writer.write(chunk)
+    return ~quarantined
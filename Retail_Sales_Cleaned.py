@@ -2,20 +2,179 @@ import pandas as pd # A cleaning engine for data manipulation and analysis. It i
 import numpy as np # Helps you handle missing values; Scientific computing ; Used for working with multidimensional arrays and mathematical functions.
 from dateutil import parser # Converts messy date strings into proper dates and time formats
 import re # Regular Expression module, which allows us to search for complex patterns (like currency codes embedded in numbers) within a string.
+import os
 import seaborn as sns
 import matplotlib.pyplot as plt
+from Customer_Matching import resolve_customers
+from Phone_Normalization import normalize_phones
+from Order_Deduplication import analyze_order_duplicates, create_cleaned_ids
+from OrderID_Registry import OrderIDRegistry
+from Category_Mapping import CategoryMapper
+from Pipeline_Profiler import StageProfiler
+from Product_Lookup import build_product_index, fill_from_product_index, flag_sku_conflicts
+from Lean_Execution import ColumnReleaser
+from Column_Planner import DASHBOARD_COLUMNS, RAW_SALES_COLUMNS, check_consumer, plan_pipeline
+from Dashboard_KPIs import CUBE_SOURCE_COLUMNS, build_kpi_cube, write_kpi_cube
+from Validation_Rules import EGYPT_BOUNDS, RuleSet
+from Quality_Flags import FLAG_COLUMN, decode_flags, empty_flags, flag_counts, flag_mask, set_flag, set_rule_flags
+from Quarantine import QUARANTINE_THRESHOLD, SEVERITY_LEVELS, route_rows
+from Data_Profiler import APPROXIMATE_PROFILE_ROWS, DataProfiler, diff_profiles
+from Stage_Checkpoints import CHECKPOINT_BUDGET_MB, StageCheckpoints
+from Stage_Scheduler import SCHEDULER_WORKERS, run_stages
+from Partitioned_Dataset import write_partitions
+from Change_Data_Capture import ChangeDataCapture
+from Arrow_Strings import ARROW_STRING_DTYPE, ARROW_STRINGS_BY_DEFAULT, text_values, to_arrow_strings
+from Vectorized_Cleaning import standardize_texts
 
 # file_path is a string variable that holds the name of the Excel workbook.Prevent typing it out four times.It does not open or read the actual file.
-file_path = "/Users/salmaabdelkader/PycharmProjects/RetailCaseStudy/EG_Retail_Sales_Raw_CaseStudy 1.xlsx"
+# RETAIL_RAW_INPUT overrides it (Benchmark_Pipeline.py points it at a synthetic workbook or Parquet folder)
+file_path = os.environ.get("RETAIL_RAW_INPUT",
+                           "/Users/salmaabdelkader/PycharmProjects/RetailCaseStudy/EG_Retail_Sales_Raw_CaseStudy 1.xlsx")
+
+# Folder for everything the script writes (run logs, registry, BI dataset); RETAIL_OUTPUT_DIR overrides it
+output_dir = os.environ.get("RETAIL_OUTPUT_DIR", "/Users/salmaabdelkader/PycharmProjects/RetailCaseStudy")
+
+# JSON file with every categorical alias table (PaymentStatus, Gender, Governorate, ...); it ships next to
+# this script, RETAIL_MAPPING_CONFIG points at another one
+mapping_config_path = os.environ.get("RETAIL_MAPPING_CONFIG",
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), "Category_Mappings.json"))
+
+# Per-stage resource log (wall/CPU time, peak RSS, DataFrame memory, rows in/out)
+run_log_path = os.path.join(output_dir, "Pipeline_Run_Log.json")
+run_history_path = os.path.join(output_dir, "Pipeline_Run_History.csv")
+flame_report_path = os.path.join(output_dir, "Pipeline_Run.folded")  # set to None to skip
+
+# Customer dimension (one row per Customer_Key) written next to the BI dataset by the Customer Matching
+# stage; .parquet instead of .xlsx when it does not fit in one Excel sheet
+EXCEL_MAX_ROWS = 1_048_575  # one sheet, minus the header row
+dim_customer_path = os.path.join(output_dir, "Dim_Customer.xlsx")
+
+# Pre-aggregated KPI cube written next to the BI dataset
+kpi_cube_path = os.path.join(output_dir, "BI_KPI_Cube.xlsx")
+validation_report_path = os.path.join(output_dir, "Validation_Report.json")
+
+# Profile of the raw extract (JSON report + one-row-per-column CSV that can be diffed between runs)
+profile_json_path = os.path.join(output_dir, "Raw_Sales_Profile.json")
+profile_csv_path = os.path.join(output_dir, "Raw_Sales_Profile.csv")
+previous_profile_path = os.path.join(output_dir, "Raw_Sales_Profile_Previous.csv")
+
+# Rows with flags at or above the severity threshold go here instead of the BI dataset (see Quarantine.py).
+# Off by default (every row stays in the BI dataset); RETAIL_QUARANTINE_SEVERITY opts in with
+# info / warning / critical, or "off"
+quarantine_path = os.path.join(output_dir, "Quarantine_Records.parquet")
+quarantine_threshold = os.environ.get("RETAIL_QUARANTINE_SEVERITY", QUARANTINE_THRESHOLD)
+if quarantine_threshold == "off":
+    quarantine_threshold = None
+elif quarantine_threshold is not None and quarantine_threshold not in SEVERITY_LEVELS:
+    raise ValueError(f"RETAIL_QUARANTINE_SEVERITY={quarantine_threshold!r}: use one of {SEVERITY_LEVELS} or 'off'")
+
+# The frame after every stage, so a re-run resumes at the first stage whose input or code changed
+# (see Stage_Checkpoints.py). RETAIL_CHECKPOINTS=0 switches it off, RETAIL_CHECKPOINT_BUDGET_MB sets
+# the disk budget; delete the folder to start from scratch.
+checkpoint_dir = os.path.join(output_dir, "Stage_Checkpoints")
+checkpoints_enabled = os.environ.get("RETAIL_CHECKPOINTS", "1") == "1"
+checkpoint_budget_mb = float(os.environ.get("RETAIL_CHECKPOINT_BUDGET_MB", CHECKPOINT_BUDGET_MB))
+
+# Threads of the DAG scheduler that runs the column stages (see Stage_Scheduler.py); RETAIL_STAGE_WORKERS
+# overrides it, 1 runs the stages one after the other
+stage_workers = int(os.environ.get("RETAIL_STAGE_WORKERS", SCHEDULER_WORKERS))
+
+# BI dataset partitioned by order month for readers that only need a date range (see Partitioned_Dataset.py);
+# set to None to skip
+partitioned_output_path = os.path.join(output_dir, "BI_Sales_Partitioned")
+
+# Change-data-capture delta: the BI rows inserted/updated/deleted since the last run, diffed against the
+# hash snapshot of that run (see Change_Data_Capture.py); set cdc_delta_path to None to skip
+cdc_delta_path = os.path.join(output_dir, "BI_Sales_Delta.parquet")
+cdc_snapshot_dir = os.path.join(output_dir, "BI_Sales_Snapshot")
+
+# SQLite file that keeps the permanent replacement OrderIDs between runs
+order_id_registry_path = os.path.join(output_dir, "OrderID_Registry.sqlite")
+
+# Columns of the BI-ready dataset exported at the end of the script (the declared output schema)
+bi_columns = [
+    'OrderID_cleaned','Customer_Key','CustomerName_clean',
+    'OrderDate','Order_Year','Order_Month','Order_Quarter','Order_YearMonth',
+    'DeliveryDate','Delivery_Time_Days','Delivery_Delayed','Governorate_Clean','Status_Clean',
+    'ProductSKU_Clean','ProductName_Clean','Category_Clean','Quantity_Clean',
+    'Subtotal_Calc_Capped','Discount_Rate_Clean','ShippingCost_Filled','TotalAmount_Calc',
+    'PaymentStatus_Clean','PaymentMethod_Clean',
+    'DQ_Flags'
+]
+
+# Fail before any work is done if the dashboard reads a column the BI file will not contain
+check_consumer('Create_Dashboard.py', DASHBOARD_COLUMNS, bi_columns)
+check_consumer('KPI cube', CUBE_SOURCE_COLUMNS, bi_columns)
+
+# Lean mode: the stages and raw columns bi_columns does not need are skipped (see Column_Planner.py),
+# raw/helper columns are deleted in place once no later stage reads them and debugging columns
+# are skipped, so memory stays close to the size of the BI dataset.
+# Keep it False while exploring the data (every stage runs and every column stays inspectable).
+# RETAIL_LEAN_MODE=1 switches it on without editing the script (used by Benchmark_Pipeline.py --lean).
+LEAN_MODE = os.environ.get("RETAIL_LEAN_MODE", "0") == "1"
+
+# Arrow strings: text columns are kept as Arrow-backed strings from the load to the Parquet output and the
+# product text is standardized with string kernels instead of a Python call per row (see Arrow_Strings.py).
+# RETAIL_ARROW_STRINGS=1 switches it on. On pandas 3 text columns are Arrow strings anyway, so there
+# it only switches the product text to the string kernels (same result, see Golden_Equivalence.py).
+ARROW_STRINGS = os.environ.get("RETAIL_ARROW_STRINGS", "0") == "1"
+if ARROW_STRINGS and ARROW_STRINGS_BY_DEFAULT:
+    print(f"pandas {pd.__version__} already stores text as Arrow strings; RETAIL_ARROW_STRINGS=1 only "
+          f"switches the product text to string kernels")
+
+# Run settings that change what the stages write (part of every checkpoint key); the Arrow option only
+# changes the dtypes of the text columns where pandas does not use Arrow strings already
+run_settings = {'lean': LEAN_MODE}
+if ARROW_STRINGS and not ARROW_STRINGS_BY_DEFAULT:
+    run_settings['arrow_strings'] = True
+
+# Sections the plan may skip; every other stage always runs (unless restored from a checkpoint)
+SKIPPABLE_STAGES = ['Initial Inspection', 'Phone', 'Gender', 'Latitude/Longitude']
+
+plan = plan_pipeline(bi_columns, skippable=SKIPPABLE_STAGES, prune=LEAN_MODE)
+print(plan.describe())
+lean = ColumnReleaser(keep=bi_columns, schedule=plan.release_schedule(), enabled=LEAN_MODE)
+
+# Every stage section is wrapped in `if checkpoints.runs(...)`: it runs when the plan needs it and no
+# checkpoint of a later stage is valid; each section ends with checkpoints.save(...)
+checkpoints = StageCheckpoints(checkpoint_dir, plan.stage_names, script_path=os.path.abspath(__file__),
+                               inputs=[file_path], configs={'category_mapper': mapping_config_path},
+                               settings=run_settings, budget_mb=checkpoint_budget_mb,
+                               enabled=checkpoints_enabled)
+
+# Start the stage instrumentation before the workbook is read so the load is measured too
+profiler = StageProfiler()
+profiler.stage("Load Workbook")
+
+# Open the workbook once and parse only the sheets the script uses. You point to the Excel file you uploaded
+# Sales_Orders_Raw is read with the raw columns the plan needs (all of them outside lean mode),
+# unless a stage checkpoint of a previous run is restored instead
+sales = checkpoints.restore()
+if sales is not None:
+    print(f"Resuming after stage '{checkpoints.resume_stage}' from its checkpoint")
+if file_path.endswith(".xlsx"):
+    with pd.ExcelFile(file_path) as workbook:
+        # Now you have 4 datasets in memory
+        if sales is None:
+            sales = workbook.parse("Sales_Orders_Raw", usecols=plan.usecols)
+        products = workbook.parse("Products_Raw")
+        govs = workbook.parse("Governorates_Lookup_Noise")
+        customers = workbook.parse("Customers_Raw")
+else:
+    # A folder with one <sheet>.parquet per sheet (synthetic inputs larger than an Excel sheet)
+    if sales is None:
+        sales = pd.read_parquet(os.path.join(file_path, "Sales_Orders_Raw.parquet"),
+                                columns=[column for column in RAW_SALES_COLUMNS if plan.usecols(column)])
+    products = pd.read_parquet(os.path.join(file_path, "Products_Raw.parquet"))
+    govs = pd.read_parquet(os.path.join(file_path, "Governorates_Lookup_Noise.parquet"))
+    customers = pd.read_parquet(os.path.join(file_path, "Customers_Raw.parquet"))
 
-# Read all sheets into a dictionary. You point to the Excel file you uploaded
-all_sheets = pd.read_excel(file_path, sheet_name=None)
+if ARROW_STRINGS:
+    for frame in (sales, products, govs, customers):
+        to_arrow_strings(frame)
 
-# Now you can access/read each sheet (DataFrame) from the dictionary. Now you have 4 datasets in memory
-sales = all_sheets["Sales_Orders_Raw"]
-products = all_sheets["Products_Raw"]
-govs = all_sheets["Governorates_Lookup_Noise"]
-customers = all_sheets["Customers_Raw"]
+# Load all alias tables once; each column is then mapped over its unique values only
+category_mapper = CategoryMapper.from_json(mapping_config_path)
 
 
 # Set display options for easy inspection
@@ -27,96 +186,101 @@ pd.set_option('display.float_format', lambda x: '%.5f' % x)
 
 
 # --- 1. Initial Data Inspection ---
-print("\n----- Initial Sales Data Inspection -----")
-print("\nNumber of Rows and Columns:")
-print(sales.shape)
-print("\nNumber of Null Values per Column:")
-print(sales.isnull().sum())
-print("\nData types:")
-#print(sales.info()) # To display a brief summary of the DataFrame, including data types and non-null values:
-print(sales.dtypes)
-print("\nStatistical summary:")
-print(sales.describe()) #Looking at numeric info
-print("\nExample of data:")
-print(sales.head(5)) #Data Preview (first 5 rows)
-print("\nNumber of duplicated rows:")
-print(sales.duplicated().sum())
-print("----------------------------------------------------------")
-
-#print(sales.duplicated())
-#print("----------------------------------------------------------")
+if checkpoints.runs("Initial Inspection"):
+    profiler.stage("Initial Inspection", sales)
+    print("\n----- Initial Sales Data Inspection -----")
+    # One chunked pass computes nulls, distinct counts, min/max/mean/quantiles, top values
+    # and duplicate rows for every column (see Data_Profiler.py); very large extracts are
+    # profiled with bounded-memory sketches instead of exact value counts
+    raw_profile = DataProfiler(approximate=len(sales) >= APPROXIMATE_PROFILE_ROWS).profile_frame(sales)
+    print(f"\nRows: {raw_profile.rows}, Columns: {len(raw_profile.columns)}, "
+          f"Duplicated rows: {raw_profile.duplicate_rows}")
+    print(raw_profile.table().to_string(index=False))
+    print("\nExample of data:")
+    print(sales.head(5)) #Data Preview (first 5 rows)
+
+    # What changed since the previous run's profile
+    if os.path.exists(profile_csv_path):
+        os.replace(profile_csv_path, previous_profile_path)
+    raw_profile.write_json(profile_json_path)
+    raw_profile.write_csv(profile_csv_path)
+    if os.path.exists(previous_profile_path):
+        profile_changes = diff_profiles(previous_profile_path, profile_csv_path)
+        print(f"\nProfile changes since the previous run: {len(profile_changes)}")
+        if not profile_changes.empty:
+            print(profile_changes.head(20).to_string(index=False))
+    print("----------------------------------------------------------")
+
+    #print(sales.duplicated())
+    #print("----------------------------------------------------------")
+
+    lean.release(sales, "Initial Inspection")
+    checkpoints.save("Initial Inspection", sales)
 
 # -------------------------------------------------------------------------
 # OrderID Handling and Cleaning:
 # -------------------------------------------------------------------------
-# Check for inconsistencies within duplicated OrderIDs
-print("\n--- Checking for inconsistent customer data within duplicated OrderIDs ---")
-# Find order IDs that are duplicated and check how many unique customer IDs they have
-inconsistent_orders = sales.groupby('OrderID').filter(lambda x: x['CustomerID'].nunique() > 1)
-if not inconsistent_orders.empty:
-    print("Found OrderIDs with conflicting customer information:")
-    print(inconsistent_orders.sort_values('OrderID').head(10))
-else:
-    print("No conflicting customer information found for duplicated OrderIDs.")
-
-# Create a new, cleaned ID column for problematic records
-# This creates a new unique ID for each record with conflicting customer info
-def create_cleaned_id(df):
-    df_copy = df.copy()
-
-    # Find the indices of all rows with duplicated OrderIDs, regardless of customer conflict
-    # This is a more robust way to handle all duplicated IDs.
-    duplicated_mask = df_copy['OrderID'].duplicated(keep=False)
-
-    # Initialize the new cleaned column with original OrderIDs
-    df_copy['OrderID_cleaned'] = df_copy['OrderID']
-
-    # For the duplicated rows, generate a new unique ID
-    if duplicated_mask.any():
-        # Use cumcount to create a unique suffix for each duplicate group
-        cum_count = df_copy[duplicated_mask].groupby('OrderID').cumcount().astype(str)
-
-        # Format the suffix to match the desired pattern (e.g., NEW00001)
-        # We start a new counter based on the number of original duplicates
-        unique_suffix_mapping = (pd.Series(range(1, len(cum_count) + 1), index=cum_count.index)
-                                 .apply(lambda x: f"NEW{x:05d}"))
-
-        df_copy.loc[duplicated_mask, 'OrderID_cleaned'] = unique_suffix_mapping
-
-    return df_copy
-
-sales = create_cleaned_id(sales)
-
-# Create a flag for records that were originally duplicated
-# This flags ALL records that had a duplicated OrderID, not just the inconsistent ones
-sales['is_OrderID_duplicated_flag'] = sales['OrderID'].duplicated(keep=False)
-
-# Rename the original OrderID column
-sales.rename(columns={'OrderID': 'Original OrderID'}, inplace=True)
-
-# Reorder the columns to put 'OrderID_cleaned' at the beginning
-cols = list(sales.columns)
-cols.insert(1, cols.pop(cols.index('OrderID_cleaned')))
-sales = sales[cols]
-
-print("\n--- Validation of new OrderID_cleaned column ---")
-print(f"Number of unique OrderID_cleaned: {sales['OrderID_cleaned'].nunique()}")
-print(f"Total number of records: {len(sales)}")
-print("New 'is_OrderID_duplicated_flag' added:", 'is_OrderID_duplicated_flag' in sales.columns)
-
-# Show an example of the cleaned data with the new columns
-print("\nExample of data after cleaning:")
-print(sales.sort_values('Original OrderID').head(15))
-
-print("--------------------------")
+if checkpoints.runs("OrderID"):
+    profiler.stage("OrderID", sales)
+    # Check for inconsistencies within duplicated OrderIDs
+    print("\n--- Checking for inconsistent customer data within duplicated OrderIDs ---")
+    # Hash every row's content once, then compare fingerprints and CustomerIDs per OrderID
+    # with vectorized nunique transforms (see Order_Deduplication.py)
+    order_analysis = analyze_order_duplicates(sales, id_col='OrderID', customer_col='CustomerID')
+    inconsistent_orders = sales[order_analysis['has_customer_conflict']]
+    if not inconsistent_orders.empty:
+        print("Found OrderIDs with conflicting customer information:")
+        print(inconsistent_orders.sort_values('OrderID').head(10))
+    else:
+        print("No conflicting customer information found for duplicated OrderIDs.")
+
+    print(f"Exact duplicate rows (same OrderID and content): {order_analysis['is_exact_duplicate'].sum()}")
+    print(f"Rows in OrderIDs with conflicting content: {order_analysis['has_content_conflict'].sum()}")
+
+    # Create a new, cleaned ID column for problematic records
+    # Every row of a duplicated OrderID is keyed by (OrderID, row content) and looked up in the
+    # persistent registry: known records reuse their NEWxxxxx ID, new ones get the next number
+    with OrderIDRegistry(order_id_registry_path) as order_id_registry:
+        sales['OrderID_cleaned'] = create_cleaned_ids(sales, order_analysis, id_col='OrderID',
+                                                      registry=order_id_registry)
+
+    # Every data-quality issue of a row is one bit of DQ_Flags (see Quality_Flags.py)
+    sales[FLAG_COLUMN] = empty_flags(len(sales))
+
+    # Flag records that were originally duplicated
+    # This flags ALL records that had a duplicated OrderID, not just the inconsistent ones
+    set_flag(sales, 'orderid_duplicated', order_analysis['is_OrderID_duplicated_flag'])
+    set_flag(sales, 'orderid_customer_conflict', order_analysis['has_customer_conflict'])
+    set_flag(sales, 'orderid_content_conflict', order_analysis['has_content_conflict'])
+
+    # Rename the original OrderID column
+    sales.rename(columns={'OrderID': 'Original OrderID'}, inplace=True)
+
+    # Reorder the columns to put 'OrderID_cleaned' at the beginning
+    # (moved in place with pop/insert instead of rebuilding the whole frame with sales[cols])
+    sales.insert(1, 'OrderID_cleaned', sales.pop('OrderID_cleaned'))
+
+    print("\n--- Validation of new OrderID_cleaned column ---")
+    print(f"Number of unique OrderID_cleaned: {sales['OrderID_cleaned'].nunique()}")
+    print(f"Total number of records: {len(sales)}")
+    print(f"Rows flagged orderid_duplicated: {flag_mask(sales[FLAG_COLUMN], 'orderid_duplicated').sum()}")
+
+    # Show an example of the cleaned data with the new columns
+    print("\nExample of data after cleaning:")
+    print(sales.sort_values('Original OrderID').head(15))
+
+    print("--------------------------")
+
+    # Lean mode: drop the columns no later stage reads
+    lean.release(sales, "OrderID")
+    checkpoints.save("OrderID", sales)
 
 # -------------------------------------------------------------------------
 #  OrderDate, DeliveryDate, ReturnDate Handling and Cleaning:
 # -------------------------------------------------------------------------
-print("--- OrderDate Format Preview ---")
-print(sales['OrderDate'].value_counts().head(20))
-
-
+# From here to the product lookup every section is a stage function: it cleans the frame it is given
+# (only the columns the stage declares in Column_Planner.STAGES) and the DAG scheduler below runs it.
+# Row functions stay at the top level too: Golden_Equivalence.py compiles them from this file.
 def clean_date_robust(x):
     try:
         # Pass locale='ar' to dateparser or set default locale for dateutil if needed,
@@ -125,137 +289,123 @@ def clean_date_robust(x):
     except (ValueError, TypeError):
         return pd.NaT
 
-# Apply the function to your date columns
-sales["OrderDate"] = sales["OrderDate"].apply(clean_date_robust)
-sales["DeliveryDate"] = sales["DeliveryDate"].apply(clean_date_robust)
-sales["ReturnDate"] = sales["ReturnDate"].apply(clean_date_robust)
-
-#Checking that the fn is working and data type changed
-# print(sales[['OrderDate', 'DeliveryDate', 'ReturnDate']].dtypes)
 
-print("\n--- Value counts for original ReturnFlag ---")
-print(sales['ReturnFlag'].value_counts())
+def clean_dates(sales):
+    print("--- OrderDate Format Preview ---")
+    print(sales['OrderDate'].value_counts().head(20))
 
-# Map to standardized values
-return_flag_map = {'نعم': 'Yes','Y' : 'Yes', '1' : 'Yes', 'لا': 'No', '0': 'No' , 'N' : 'No' }
-sales['ReturnFlag_Clean'] = sales['ReturnFlag'].replace(return_flag_map)
-# mesh ayza aamel new column ayza aadel aal adem
+    # Apply the function to your date columns
+    sales["OrderDate"] = sales["OrderDate"].apply(clean_date_robust)
+    sales["DeliveryDate"] = sales["DeliveryDate"].apply(clean_date_robust)
+    sales["ReturnDate"] = sales["ReturnDate"].apply(clean_date_robust)
 
-#Checking that the map is working and values changed
-print(sales['ReturnFlag_Clean'].value_counts())
+    #Checking that the fn is working and data type changed
+    # print(sales[['OrderDate', 'DeliveryDate', 'ReturnDate']].dtypes)
 
-#print(sales.head())
+    print("\n--- Value counts for original ReturnFlag ---")
+    print(sales['ReturnFlag'].value_counts())
 
-# For rows where ReturnFlag is 'No', and ReturnDate is NaT, fill with a descriptive string.
-#sales.loc[(sales['ReturnFlag_Clean'] == 'No') & sales['ReturnDate'].isna(), 'ReturnDate'] = 'No Return'
-#moshkelet el data type okay
-#print(sales.head())
+    # Map to standardized values (alias table: ReturnFlag_Clean in Category_Mappings.json)
+    category_mapper.apply(sales, 'ReturnFlag_Clean')
+    # mesh ayza aamel new column ayza aadel aal adem
 
-#Check order date against delivery
-sales['delivery_is_before_order'] = sales['DeliveryDate'] < sales['OrderDate']
-print("\n--- Orders with impossible delivery dates ---")
-print(sales[sales['delivery_is_before_order']].head())
+    #Checking that the map is working and values changed
+    print(sales['ReturnFlag_Clean'].value_counts())
 
-#Check return date against order and delivery
-# Assuming ReturnDate is still of type datetime64[ns]
-sales['return_is_before_order'] = sales['ReturnDate'] < sales['OrderDate']
-sales['return_is_before_delivery'] = sales['ReturnDate'] < sales['DeliveryDate']
+    #print(sales.head())
 
-print("\n--- Orders with impossible return dates (before order) ---")
-print(sales[sales['return_is_before_order']].head())
-print("\n--- Orders with impossible return dates (before delivery) ---")
-print(sales[sales['return_is_before_delivery']].head())
+    # For rows where ReturnFlag is 'No', and ReturnDate is NaT, fill with a descriptive string.
+    #sales.loc[(sales['ReturnFlag_Clean'] == 'No') & sales['ReturnDate'].isna(), 'ReturnDate'] = 'No Return'
+    #moshkelet el data type okay
+    #print(sales.head())
 
-print(sales[['OrderDate', 'DeliveryDate', 'ReturnDate']].isnull().sum())
+    # Date logic (delivery/return before order, missing dates) is checked with the other
+    # Data_Quality_Report.md rules in the "Validation Rules" stage (Validation_Rules.py)
 
-sales['orderdate_is_null'] = sales['OrderDate'].isnull()
-sales['deliverydate_is_null'] = sales['DeliveryDate'].isnull()
+    #✔ DeliveryTime = DeliveryDate – OrderDate
+    #sales['Delivery_Time_days'] = (sales['DeliveryDate'] - sales['OrderDate']).dt.days
+    #sales['Delivery_Time_Invalid'] = sales['Delivery_Time_days'] < 0
 
-print("New flags added to the DataFrame.")
-print(sales.head())
+    #print(sales[['OrderDate', 'DeliveryDate', 'ReturnDate']].dtypes)
 
-#✔ DeliveryTime = DeliveryDate – OrderDate
-#sales['Delivery_Time_days'] = (sales['DeliveryDate'] - sales['OrderDate']).dt.days
-#sales['Delivery_Time_Invalid'] = sales['Delivery_Time_days'] < 0
-
-#print(sales[['OrderDate', 'DeliveryDate', 'ReturnDate']].dtypes)
 
 # ------------------------------------------------------------
 # BI-READY DATE COLUMNS (no imputation, no altering raw dates)
 # ------------------------------------------------------------
+def add_bi_date_columns(sales):
+    # Extract safe features
+    sales['Order_Year'] = sales['OrderDate'].dt.year
+    sales['Order_Month'] = sales['OrderDate'].dt.month
+    sales['Order_Quarter'] = sales['OrderDate'].dt.quarter
 
-# Extract safe features
-sales['Order_Year'] = sales['OrderDate'].dt.year
-sales['Order_Month'] = sales['OrderDate'].dt.month
-sales['Order_Quarter'] = sales['OrderDate'].dt.quarter
-
-sales['Delivery_Year'] = sales['DeliveryDate'].dt.year
-sales['Delivery_Month'] = sales['DeliveryDate'].dt.month
-sales['Delivery_Quarter'] = sales['DeliveryDate'].dt.quarter
-
-sales['Return_Year'] = sales['ReturnDate'].dt.year
-sales['Return_Month'] = sales['ReturnDate'].dt.month
-sales['Return_Quarter'] = sales['ReturnDate'].dt.quarter
+    sales['Delivery_Year'] = sales['DeliveryDate'].dt.year
+    sales['Delivery_Month'] = sales['DeliveryDate'].dt.month
+    sales['Delivery_Quarter'] = sales['DeliveryDate'].dt.quarter
 
-# Year-Month labels (better for pivot tables)
-sales['Order_YearMonth'] = sales['OrderDate'].dt.to_period('M').astype(str)
-sales['Delivery_YearMonth'] = sales['DeliveryDate'].dt.to_period('M').astype(str)
-sales['Return_YearMonth'] = sales['ReturnDate'].dt.to_period('M').astype(str)
+    sales['Return_Year'] = sales['ReturnDate'].dt.year
+    sales['Return_Month'] = sales['ReturnDate'].dt.month
+    sales['Return_Quarter'] = sales['ReturnDate'].dt.quarter
 
-# Delivery time in days (NaN if missing or invalid)
-sales['Delivery_Time_Days'] = (sales['DeliveryDate'] - sales['OrderDate']).dt.days
-sales['Delivery_Delayed'] = sales['Delivery_Time_Days'] > 5
+    # Year-Month labels (better for pivot tables)
+    sales['Order_YearMonth'] = sales['OrderDate'].dt.to_period('M').astype(str)
+    sales['Delivery_YearMonth'] = sales['DeliveryDate'].dt.to_period('M').astype(str)
+    sales['Return_YearMonth'] = sales['ReturnDate'].dt.to_period('M').astype(str)
 
-# Return time in days (NaN if missing or invalid)
-sales['Return_Time_Days'] = (sales['ReturnDate'] - sales['DeliveryDate']).dt.days
+    # Delivery time in days (NaN if missing or invalid)
+    sales['Delivery_Time_Days'] = (sales['DeliveryDate'] - sales['OrderDate']).dt.days
+    sales['Delivery_Delayed'] = sales['Delivery_Time_Days'] > 5
 
-# Validity flags
-sales['Valid_Delivery'] = np.where(
-    (sales['DeliveryDate'].notna()) & (sales['OrderDate'].notna()) &
-    (sales['DeliveryDate'] >= sales['OrderDate']),
-    True, False
-)
+    # Return time in days (NaN if missing or invalid)
+    sales['Return_Time_Days'] = (sales['ReturnDate'] - sales['DeliveryDate']).dt.days
 
-sales['Valid_Return'] = np.where(
-    (sales['ReturnDate'].notna()) & (sales['DeliveryDate'].notna()) &
-    (sales['ReturnDate'] >= sales['DeliveryDate']),
-    True, False
-)
+    print("\n--- BI Date Columns Added ---")
+    print([
+        'Order_Year','Order_Month','Order_Quarter','Order_YearMonth',
+        'Delivery_Year','Delivery_Month','Delivery_Quarter','Delivery_YearMonth',
+        'Return_Year','Return_Month','Return_Quarter','Return_YearMonth',
+        'Delivery_Time_Days','Return_Time_Days'
+    ])
 
-print("\n--- BI Date Columns Added ---")
-print([
-    'Order_Year','Order_Month','Order_Quarter','Order_YearMonth',
-    'Delivery_Year','Delivery_Month','Delivery_Quarter','Delivery_YearMonth',
-    'Return_Year','Return_Month','Return_Quarter','Return_YearMonth',
-    'Delivery_Time_Days','Return_Time_Days',
-    'Valid_Delivery','Valid_Return'
-])
 
+    print("--------------------------")
 
-print("--------------------------")
 
 # -------------------------------------------------------------------------
 #  CustomerName Handling and Cleaning:
 # -------------------------------------------------------------------------
-print("--- CustomerName Value Counts (Initial) ---")
-print(sales['CustomerName'].value_counts(dropna=False).head(20))
-#print(f"\nMissing CustomerName values: {sales['CustomerName'].isnull().sum()}") no nulls
+def clean_customer_names(sales):
+    print("--- CustomerName Value Counts (Initial) ---")
+    print(sales['CustomerName'].value_counts(dropna=False).head(20))
+    #print(f"\nMissing CustomerName values: {sales['CustomerName'].isnull().sum()}") no nulls
 
-# --- 2. Standardize and Clean ---
-# Create a new column for the cleaned name
-sales['CustomerName_clean'] = sales['CustomerName'].astype(str).str.strip().str.lower()
+    # --- 2. Standardize and Clean ---
+    # Create a new column for the cleaned name
+    sales['CustomerName_clean'] = text_values(sales['CustomerName'], ARROW_STRINGS).str.strip().str.lower()
+
+    #print(sales.head())
 
-#print(sales.head())
 
 # -------------------------------------------------------------------------
 #  Phone Handling and Cleaning:
 # -------------------------------------------------------------------------
-# Check for nulls and preview the formats
-print("--- Phone Column Preview ---")
-print(sales['Phone'].value_counts(dropna=False).head(20))
+def clean_phones(sales):
+    # Check for nulls and preview the formats
+    print("--- Phone Column Preview ---")
+    print(sales['Phone'].value_counts(dropna=False).head(20))
+
+    # Get a count of the null values
+    #print(f"\nNumber of null Phone values: {sales['Phone'].isnull().sum()}")
+
+    # Normalize to E.164 (+20...) with validity flags; regex runs once per unique raw value
+    # Handles Arabic-Indic digits, +20/0020/0 prefixes, spaces and dashes (see Phone_Normalization.py)
+    phone_clean = normalize_phones(sales['Phone'])
+    sales['Phone_Clean'] = phone_clean['Phone_Clean']
+    sales['Phone_Type'] = phone_clean['Phone_Type']
+    sales['Phone_IsValid'] = phone_clean['Phone_IsValid']
+
+    print("\n--- Phone Type Distribution (after normalization) ---")
+    print(sales['Phone_Type'].value_counts(dropna=False))
 
-# Get a count of the null values
-#print(f"\nNumber of null Phone values: {sales['Phone'].isnull().sum()}")
 
 
 # -------------------------------------------------------------------------
@@ -265,454 +415,377 @@ print(sales['Phone'].value_counts(dropna=False).head(20))
 # -------------------------------------------------------------------------
 #  CustomerId Handling and Cleaning:
 # -------------------------------------------------------------------------
-# Get a preview of existing CustomerID formats
-#print("--- CustomerID Value Counts (Initial) ---")
-#print(sales['CustomerID'].value_counts(dropna=False).head(10))
+def match_customers(sales):
+    # Get a preview of existing CustomerID formats
+    #print("--- CustomerID Value Counts (Initial) ---")
+    #print(sales['CustomerID'].value_counts(dropna=False).head(10))
+
+    #sales['CustomerID_clean'] = sales['CustomerID'].astype(str).str.replace('CUS-', 'C', regex=False)
 
-#sales['CustomerID_clean'] = sales['CustomerID'].astype(str).str.replace('CUS-', 'C', regex=False)
+    # Get a preview of standardized CustomerID formats
+    # For this case, we will focus on standardizing the whole ID
+    #checking mashya sah wala eh
+    #print("\n--- CustomerID Value Counts (Standardized) ---")
+    #print(sales['CustomerID_clean'].value_counts(dropna=False).head(20))
+
+    # --- Customer entity resolution against the Customers_Raw sheet ---
+    # Names/phones are normalized, candidates are blocked by phone suffix, CustomerID
+    # and name tokens, and only pairs inside a block are scored (see Customer_Matching.py)
+    customer_keys, dim_customer = resolve_customers(sales, customers)
+    sales['Customer_Key'] = customer_keys['Customer_Key']
+    sales['Customer_Match'] = customer_keys['Customer_Match']
+
+    print("\n--- Customer Matching Summary ---")
+    print(sales['Customer_Match'].value_counts(dropna=False))
+    print(f"Distinct customers in Dim_Customer: {len(dim_customer)}")
+
+    # Written here, where it is built: a run restored from a later checkpoint keeps the file of the
+    # run that made the checkpoint (same inputs, same dimension)
+    if len(dim_customer) < EXCEL_MAX_ROWS:
+        dim_customer.to_excel(dim_customer_path, index=False)
+    else:
+        dim_customer.to_parquet(os.path.splitext(dim_customer_path)[0] + ".parquet", index=False)
 
-# Get a preview of standardized CustomerID formats
-# For this case, we will focus on standardizing the whole ID
-#checking mashya sah wala eh
-#print("\n--- CustomerID Value Counts (Standardized) ---")
-#print(sales['CustomerID_clean'].value_counts(dropna=False).head(20))
 
 
 # -------------------------------------------------------------------------
 #  Gender Handling and Cleaning:
 # -------------------------------------------------------------------------
-print("--- Gender Column Preview ---")
-print(sales['Gender'].value_counts(dropna=False))
+def clean_gender(sales):
+    print("--- Gender Column Preview ---")
+    print(sales['Gender'].value_counts(dropna=False))
 
-# Create a mapping dictionary based on your observed values
-gender_map = { "M": "Male", "F": "Female", "ذكر": "Male", "أنثى": "Female" }
+    # Create a new, clean column using the alias table (Gender_Clean in Category_Mappings.json)
+    # Unmapped values and nulls are filled with 'Not Specified'
+    category_mapper.apply(sales, 'Gender_Clean')
 
-# Create a new, clean column using the map and handle nulls
-sales['Gender_Clean'] = sales['Gender'].map(gender_map)
+    #checking eno shaghal
+    #print("\n--- Gender Column Preview (after cleaning) ---")
+    #print(sales['Gender_Clean'].value_counts(dropna=False))
 
-# Fill any remaining NaN values with 'Unknown'
-sales['Gender_Clean'] = sales['Gender_Clean'].fillna('Not Specified')
-
-#checking eno shaghal
-#print("\n--- Gender Column Preview (after cleaning) ---")
-#print(sales['Gender_Clean'].value_counts(dropna=False))
 
 # -------------------------------------------------------------------------
 #  Governorate Handling and Cleaning:
 # -------------------------------------------------------------------------
+def clean_governorates(sales):
+    print("--- Governorates Value Counts (Initial) ---")
+    print(sales['Governorate'].value_counts(dropna=False))
 
-print("--- Governorates Value Counts (Initial) ---")
-print(sales['Governorate'].value_counts(dropna=False))
-
-# --- 1. Standardize and Clean the column ---
-# Create a new, clean column
-sales['Governorate_Clean'] = sales['Governorate'].astype(str).str.strip()
-
-# Based on your inspection, define the mapping dictionary.
-governorate_map = {
-    # Luxor Variations
-    'luxor': 'Luxor',
-    'Luxor': 'Luxor',
-    'LUXOR': 'Luxor',
-    'الأقصر': 'Luxor',
-    'Al Luxor': 'Luxor',
-
-    # Dakahlia Variations
-    'dakahlia': 'Dakahlia',
-    'Dakahlia': 'Dakahlia',
-    'الدقهلية': 'Dakahlia',
-    'DAKAHLIA': 'Dakahlia',
-
-    # South Sinai Variations
-    'south sinai': 'South Sinai',
-    'South Sinai': 'South Sinai',
-    'جنوب سيناء': 'South Sinai',
-    'al south sinai': 'South Sinai',
-    'SOUTH SINAI': 'South Sinai',
-    'Al South Sinai': 'South Sinai',
-
-    # Alexandria Variations
-    'alexandria': 'Alexandria',
-    'Alexandria': 'Alexandria',
-    'الإسكندرية': 'Alexandria',
-    'Al Alexandria': 'Alexandria',
-
-    # Red Sea Variations
-    'red sea': 'Red Sea',
-    'البحر الأحمر': 'Red Sea',
-    'RED SEA': 'Red Sea',
-    'Al Red Sea': 'Red Sea',
-    'Red Sea': 'Red Sea',
-
-    # Gharbia Variations
-    'gharbia': 'Gharbia',
-    'الغربية': 'Gharbia',
-    'GHARBIA': 'Gharbia',
-    'Al Gharbia': 'Gharbia',
-    'Gharbia': 'Gharbia',
-
-    # Qalyubia Variations
-    'qalyubia': 'Qalyubia',
-    'Qalyubia': 'Qalyubia',
-    'القليوبية': 'Qalyubia',
-    'QALYUBIA': 'Qalyubia',
-
-    # Aswan Variations
-    'aswan': 'Aswan',
-    'Aswan': 'Aswan',
-    'اسوان': 'Aswan',
-    'أسوان': 'Aswan',
-    'Al Aswan': 'Aswan',
-
-    # Asyut Variations
-    'asyut': 'Asyut',
-    'Asyut': 'Asyut',
-    'ASYUT': 'Asyut',
-    'أسيوط': 'Asyut',
-    'Al Asyut': 'Asyut',
-
-    # Sharqia Variations
-    'sharqia': 'Sharqia',
-    'Sharqia': 'Sharqia',
-    'الشرقية': 'Sharqia',
-    'SHARQIA': 'Sharqia',
-
-    # Giza Variations
-    'giza': 'Giza',
-    'الجيزة': 'Giza',
-    'gizah': 'Giza',
-    'Al Giza': 'Giza',
-    'GIZA': 'Giza',
-    'Giza': 'Giza',
-    'Gizah': 'Giza',
-
-    # Cairo Variations
-    'cairo': 'Cairo',
-    'Cairo': 'Cairo',
-    'القاهرة': 'Cairo',
-    'القاهره': 'Cairo',
-
-    # Add all other mappings you find during your preview
-}
-
-# Apply the map to a new, clean column.
-sales['Governorate_Clean'] = sales['Governorate'].map(governorate_map)
+    # --- 1. Standardize and Clean the column ---
+    # The spelling variations (Arabic, upper/lower case, 'Al ' prefix) live in the
+    # Governorate_Clean alias table of Category_Mappings.json.
+    # Values not in the table (typos, nulls) become 'Unknown'.
+    category_mapper.apply(sales, 'Governorate_Clean')
 
-# Handle cases that were not in your map (if any)
-# This will catch typos or other missing values.
-sales['Governorate_Clean'] = sales['Governorate_Clean'].fillna('Unknown')
+    # --- 5. Verify results --- checking sah
+    #print("\n--- Governorate Value Counts (Standardized) ---")
+    #print(sales['Governorate_Clean'].value_counts(dropna=False))
 
-# --- 5. Verify results --- checking sah
-#print("\n--- Governorate Value Counts (Standardized) ---")
-#print(sales['Governorate_Clean'].value_counts(dropna=False))
+    #print("\nComparison of original and standardized data:")
+    #print(sales[['Governorate', 'Governorate_Clean']].head(10))
 
-#print("\nComparison of original and standardized data:")
-#print(sales[['Governorate', 'Governorate_Clean']].head(10))
+    # -------------------------------------------------------------------------
+    #  City Handling and Cleaning:
+    # -------------------------------------------------------------------------
 
-# -------------------------------------------------------------------------
-#  City Handling and Cleaning:
-# -------------------------------------------------------------------------
+    #checking the values seeing if haga metkarara be spelling mokhtalef
+    print("--- City Value Counts (Initial) ---")
+    print(sales['City'].value_counts(dropna=False))
 
-#checking the values seeing if haga metkarara be spelling mokhtalef
-print("--- City Value Counts (Initial) ---")
-print(sales['City'].value_counts(dropna=False))
 
 # -------------------------------------------------------------------------
 #  PaymentStatus Handling and Cleaning:
 # -------------------------------------------------------------------------
+def clean_payment_status(sales):
+    print("--- PaymentStatus Value Counts (Initial) ---")
+    print(sales['PaymentStatus'].value_counts(dropna=False))
 
-print("--- PaymentStatus Value Counts (Initial) ---")
-print(sales['PaymentStatus'].value_counts(dropna=False))
+    # Change only the aliased values; the rest of the values in the column remain unchanged
+    category_mapper.apply(sales, 'PaymentStatus_Clean')
 
-# Use .replace() to change only the specific values
-# The rest of the values in the column remain unchanged
-sales['PaymentStatus_Clean'] = sales['PaymentStatus'].replace({
-    'غير مدفوع': 'Unpaid',
-    'مدفوع': 'Paid',
-})
+    #checking
+    #print(sales['PaymentStatus_Clean'].value_counts(dropna=False))
 
-#checking
-#print(sales['PaymentStatus_Clean'].value_counts(dropna=False))
 
 # -------------------------------------------------------------------------
 #  PaymentMethod Handling and Cleaning:
 # -------------------------------------------------------------------------
-print("--- PaymentMethod Value Counts (Initial) ---")
-print(sales['PaymentMethod'].value_counts(dropna=False))
+def clean_payment_methods(sales):
+    print("--- PaymentMethod Value Counts (Initial) ---")
+    print(sales['PaymentMethod'].value_counts(dropna=False))
 
-# Use .replace() to change only the specific values
-# The rest of the values in the column remain unchanged
-sales['PaymentMethod_Clean'] = sales['PaymentMethod'].replace({
-    'COD': 'Cash on Delivery',
-    'Cash': 'Cash on Delivery',
-    'فوري': 'Fawry',
-})
+    # Change only the aliased values; the rest of the values in the column remain unchanged
+    category_mapper.apply(sales, 'PaymentMethod_Clean')
 
-#checking
-#print(sales['PaymentMethod_Clean'].value_counts(dropna=False))
+    #checking
+    #print(sales['PaymentMethod_Clean'].value_counts(dropna=False))
+
+    # -------------------------------------------------------------------------
+    #  ShippingCost Handling and Cleaning:
+    # -------------------------------------------------------------------------
 
-# -------------------------------------------------------------------------
-#  ShippingCost Handling and Cleaning:
-# -------------------------------------------------------------------------
 
 # -------------------------------------------------------------------------
 #  Status Handling and Cleaning:
 # -------------------------------------------------------------------------
+def clean_status(sales):
+    print("--- Status Value Counts (Initial) ---")
+    print(sales['Status'].value_counts(dropna=False))
 
-print("--- Status Value Counts (Initial) ---")
-print(sales['Status'].value_counts(dropna=False))
+    # Change only the aliased values; NaN values become 'Unknown' (fill_missing in the config)
+    category_mapper.apply(sales, 'Status_Clean')
 
-# Use .replace() to change only the specific values
-# The rest of the values in the column remain unchanged
-sales['Status_Clean'] = sales['Status'].replace({
-    'ملغي': 'Cancelled',
-})
-# Handle NaN values explicitly
-sales['Status_Clean'] = sales['Status_Clean'].fillna('Unknown') # mesh arfa da sah wala ehhhh
+    #checking
+    print(sales['Status_Clean'].value_counts(dropna=False))
 
-#checking
-print(sales['Status_Clean'].value_counts(dropna=False))
+    #--------
 
-#--------
+    missing_status_mask = sales['Status'].isnull()
+    missing_status_orders = sales[missing_status_mask]
+    print(missing_status_orders)
 
-missing_status_mask = sales['Status'].isnull()
-missing_status_orders = sales[missing_status_mask]
-print(missing_status_orders)
+    print("\n--- Channel Distribution for Orders with Missing Status ---")
+    print(missing_status_orders['Channel'].value_counts(dropna=False))
 
-print("\n--- Channel Distribution for Orders with Missing Status ---")
-print(missing_status_orders['Channel'].value_counts(dropna=False))
+    #Channel Distribution:
+    #The missing statuses are not evenly distributed across all channels.
+    #WhatsApp (7) and Tel-Sales (5) have a higher count of missing statuses compared to E-com and Store.
+    #Insight: This suggests that the data collection process might be less robust for the WhatsApp and Tel-Sales channels.
+    # It's possible that the order status is not automatically updated in the same way as it is for the E-commerce channel.
 
-#Channel Distribution:
-#The missing statuses are not evenly distributed across all channels.
-#WhatsApp (7) and Tel-Sales (5) have a higher count of missing statuses compared to E-com and Store.
-#Insight: This suggests that the data collection process might be less robust for the WhatsApp and Tel-Sales channels.
-# It's possible that the order status is not automatically updated in the same way as it is for the E-commerce channel.
 
+    print("\n--- PaymentStatus Distribution for Orders with Missing Status ---")
+    print(missing_status_orders['PaymentStatus'].value_counts(dropna=False))
 
-print("\n--- PaymentStatus Distribution for Orders with Missing Status ---")
-print(missing_status_orders['PaymentStatus'].value_counts(dropna=False))
+    #PaymentStatus Distribution:
+    #Most of the missing statuses are associated with orders that have an 'Unpaid' (7) or 'Pending' (5) payment status.
+    #Insight: This is a very strong indicator that the order status is not updated until payment is confirmed.
+    # For orders where payment is not yet complete, the status remains blank.
+    # The one order with a 'Paid' status could be an anomaly or a data entry error.
 
-#PaymentStatus Distribution:
-#Most of the missing statuses are associated with orders that have an 'Unpaid' (7) or 'Pending' (5) payment status.
-#Insight: This is a very strong indicator that the order status is not updated until payment is confirmed.
-# For orders where payment is not yet complete, the status remains blank.
-# The one order with a 'Paid' status could be an anomaly or a data entry error.
+    print("\n--- OrderDate Range for Orders with Missing Status ---")
+    if not missing_status_orders.empty:
+        earliest_date = missing_status_orders['OrderDate'].min()
+        latest_date = missing_status_orders['OrderDate'].max()
+        print(f"Earliest OrderDate: {earliest_date}")
+        print(f"Latest OrderDate: {latest_date}")
+    else:
+        print("No orders with missing status to analyze.")
 
-print("\n--- OrderDate Range for Orders with Missing Status ---")
-if not missing_status_orders.empty:
-    earliest_date = missing_status_orders['OrderDate'].min()
-    latest_date = missing_status_orders['OrderDate'].max()
-    print(f"Earliest OrderDate: {earliest_date}")
-    print(f"Latest OrderDate: {latest_date}")
-else:
-    print("No orders with missing status to analyze.")
+    #OrderDate Range:
+    #The range of dates (2024-01-06 to 2024-12-02) is quite broad, spanning nearly the entire year.
+    #Insight: This suggests that the issue is not related to a single, isolated incident (like a data migration problem that happened on a specific date).
+    #Instead, it appears to be a systemic issue that has been ongoing for some time, which aligns with the hypothesis about payment status.
 
-#OrderDate Range:
-#The range of dates (2024-01-06 to 2024-12-02) is quite broad, spanning nearly the entire year.
-#Insight: This suggests that the issue is not related to a single, isolated incident (like a data migration problem that happened on a specific date).
-#Instead, it appears to be a systemic issue that has been ongoing for some time, which aligns with the hypothesis about payment status.
 
 # -------------------------------------------------------------------------
 #  ShipperName Handling and Cleaning:
 # -------------------------------------------------------------------------
-print("--- ShipperName Value Counts (Initial) ---")
-print(sales['ShipperName'].value_counts(dropna=False))
+def clean_shipper_names(sales):
+    print("--- ShipperName Value Counts (Initial) ---")
+    print(sales['ShipperName'].value_counts(dropna=False))
+
+    # Change only the aliased values; the rest of the values in the column remain unchanged
+    category_mapper.apply(sales, 'ShipperName_Clean')
 
-# Use .replace() to change only the specific values
-# The rest of the values in the column remain unchanged
-sales['ShipperName_Clean'] = sales['ShipperName'].replace({
-    'بريد مصر': 'Egypt Post',
-})
+    #checking
+    print(sales['ShipperName_Clean'].value_counts(dropna=False))
 
-#checking
-print(sales['ShipperName_Clean'].value_counts(dropna=False))
 
 
 # -------------------------------------------------------------------------
 #  Channel Handling and Cleaning:
 # -------------------------------------------------------------------------
-print("--- Channel Value Counts (Initial) ---")
-print(sales['Channel'].value_counts(dropna=False))
+def clean_channels(sales):
+    print("--- Channel Value Counts (Initial) ---")
+    print(sales['Channel'].value_counts(dropna=False))
 
-# Use .replace() to change only the specific values
-# The rest of the values in the column remain unchanged
-sales['Channel_Clean'] = sales['Channel'].replace({
-    'تجارة إلكترونية': 'E-com',
-})
+    # Change only the aliased values; the rest of the values in the column remain unchanged
+    category_mapper.apply(sales, 'Channel_Clean')
+
+    #checking
+    print(sales['Channel_Clean'].value_counts(dropna=False))
 
-#checking
-print(sales['Channel_Clean'].value_counts(dropna=False))
 
 # -------------------------------------------------------------------------
-#  Latitude and Longitude Handling and Cleaning:
+#  Validation Rules (Data_Quality_Report.md), checked in one pass:
 # -------------------------------------------------------------------------
-# 1. Fix the decimal separator (comma to period)
-# This step corrects a common formatting issue where commas are used as decimal points.
-# By converting to a string first, we can use .str.replace() safely.
-#sales['Latitude_Corrected'] = sales['Latitude'].astype(str).str.replace(',', '.', regex=False)
-#sales['Longitude_Corrected'] = sales['Longitude'].astype(str).str.replace(',', '.', regex=False)
-#.astype(str): This is a crucial first step. It ensures that all values in the column, including numbers, are treated as strings so that .str.replace() can be used without errors.
-#.str.replace(',', '.', regex=False): This is the key line that directly addresses your issue. It replaces all commas (,) with periods (.) in the string. regex=False is slightly faster as it's a simple string replacement.
-#pd.to_numeric(..., errors='coerce'): After correcting the decimal separator, this line can now successfully convert the strings into numeric types. Values that still cannot be converted (e.g., truly invalid or non-numeric entries) will be correctly turned into NaN.
-
-# 1. Fix the decimal separator (comma  to period) and convert to numeric in one step
-# Any non-numeric values will become NaN due to errors='coerce'.
-sales['Latitude_Clean'] = pd.to_numeric(sales['Latitude'].astype(str).str.replace(',', '.', regex=False), errors='coerce')
-sales['Longitude_Clean'] = pd.to_numeric(sales['Longitude'].astype(str).str.replace(',', '.', regex=False), errors='coerce')
-
-# 2. Convert to numeric, coercing errors to become NaN
-# This step converts the corrected string values into a numeric type (float).
-# Any values that still can't be converted to a number (e.g., 'invalid') will become NaN.
-#sales['Latitude_Clean'] = pd.to_numeric(sales['Latitude_Corrected'], errors='coerce')
-#sales['Longitude_Clean'] = pd.to_numeric(sales['Longitude_Corrected'], errors='coerce')
-
-#mesh hassa leha lazma awyyy
-#print("\n--- Lat/Long Cleaning: Initial Conversion ---")
-#print(f"Missing Latitude values after conversion: {sales['Latitude_Clean'].isnull().sum()}")
-#print(f"Missing Longitude values after conversion: {sales['Longitude_Clean'].isnull().sum()}")
-
-# 2. Check for invalid or potentially swapped coordinate values
-# Create a mask for rows where the latitude is outside the valid range
-
-#Latitude must be between -90 and +90.
-#Longitude must be between -180 and +180.
-
-# Record the rows that were missing data initially (Crucial for tracking imputation success)
-sales['coords_initially_missing'] = sales['Latitude_Clean'].isnull() | sales['Longitude_Clean'].isnull()
-
-# Initialize the main audit flag
-sales['investigation_flag'] = 'Valid/Unknown'
-
-# --- 2. Bounds Check and Manual Swapping ---
-
-print("\n--- 2. Global Bounds Check and Manual Swapping ---")
-
-# Identify potential swaps (Invalid NOW, Valid LATER) - Keep this 'if' for information
-global_invalid_mask = (sales['Latitude_Clean'].abs() > 90) | (sales['Longitude_Clean'].abs() > 180)
-swapped_is_valid_mask = (sales['Longitude_Clean'].abs() <= 90) & (sales['Latitude_Clean'].abs() <= 180)
-potential_swap_mask = global_invalid_mask & swapped_is_valid_mask
-
-if potential_swap_mask.any():
-    print(f"⚠️ **Found {potential_swap_mask.sum()} rows that COULD be valid if SWAPPED.**")
-    print(sales.loc[potential_swap_mask, ['Latitude', 'Longitude', 'Latitude_Clean', 'Longitude_Clean']].head(3))
-else:
-    print("✅ No potential swaps found to meet global bounds (90/180).")
-
-
-# Explicit Manual Swap for Index 95 (Direct operation - No IF/ELSE needed)
-manual_swap_index = 95
-
-# Use direct assignment to swap the values
-temp_lat = sales.loc[manual_swap_index, 'Latitude_Clean']
-sales.loc[manual_swap_index, 'Latitude_Clean'] = sales.loc[manual_swap_index, 'Longitude_Clean']
-sales.loc[manual_swap_index, 'Longitude_Clean'] = temp_lat
-
-# Flag the row immediately
-sales.loc[manual_swap_index, 'investigation_flag'] = 'Manually Swapped'
-
-# Discard remaining globally invalid coordinates AFTER the manual swap
-remaining_global_invalid_mask = (sales['Latitude_Clean'].abs() > 90) | (sales['Longitude_Clean'].abs() > 180)
+def check_validation_rules(sales):
+    # Every rule is declared once in Validation_Rules.py; add new rules there, not here
+    validation_rules = RuleSet()
+    validation = validation_rules.evaluate(sales)
 
-if remaining_global_invalid_mask.any():  # Keep this 'if' for informative printing
-    print(f"**Discarding {remaining_global_invalid_mask.sum()} truly globally invalid coordinates.**")
-    # Set coordinates to NaN and flag them
-    sales.loc[remaining_global_invalid_mask, ['Latitude_Clean', 'Longitude_Clean']] = np.nan
-    sales.loc[remaining_global_invalid_mask, 'investigation_flag'] = 'Globally_Invalid_Discarded'
+    print("\n--- Validation Rule Violations ---")
+    print(validation.summary().to_string(index=False))
+    for rule, missing in validation.skipped:
+        print(f"Skipped rule '{rule.name}' (columns not loaded: {missing})")
+    validation.write_json(validation_report_path)
+    set_rule_flags(sales, validation)
 
-# --- 3. Egypt Geographical Range Check and Discarding ---
+    # Validity flags, from the date rules
+    sales['Valid_Delivery'] = ~(validation.mask('orderdate_missing') | validation.mask('deliverydate_missing')
+                                | validation.mask('delivery_before_order'))
+    sales['Valid_Return'] = sales['ReturnDate'].notna() & ~(validation.mask('deliverydate_missing')
+                                                            | validation.mask('return_before_delivery'))
 
-# Define Egypt's approximate valid range.
-egypt_lat_min, egypt_lat_max = 22, 32
-egypt_long_min, egypt_long_max = 25, 35
 
-print("\n--- 3. Egypt Range Check and Discarding ---")
-
-# Mask for coordinates that are valid numbers but outside Egypt's box
-invalid_egypt_coords_mask = (
-    (sales['Latitude_Clean'].notna()) & (sales['Longitude_Clean'].notna()) & # <-- ADDED THIS LINE
-    (
-        (sales['Latitude_Clean'] < egypt_lat_min) | (sales['Latitude_Clean'] > egypt_lat_max) |
-        (sales['Longitude_Clean'] < egypt_long_min) | (sales['Longitude_Clean'] > egypt_long_max)
+# -------------------------------------------------------------------------
+#  Latitude and Longitude Handling and Cleaning:
+# -------------------------------------------------------------------------
+def clean_coordinates(sales):
+    # 1. Fix the decimal separator (comma to period)
+    # This step corrects a common formatting issue where commas are used as decimal points.
+    # By converting to a string first, we can use .str.replace() safely.
+    #sales['Latitude_Corrected'] = sales['Latitude'].astype(str).str.replace(',', '.', regex=False)
+    #sales['Longitude_Corrected'] = sales['Longitude'].astype(str).str.replace(',', '.', regex=False)
+    #.astype(str): This is a crucial first step. It ensures that all values in the column, including numbers, are treated as strings so that .str.replace() can be used without errors.
+    #.str.replace(',', '.', regex=False): This is the key line that directly addresses your issue. It replaces all commas (,) with periods (.) in the string. regex=False is slightly faster as it's a simple string replacement.
+    #pd.to_numeric(..., errors='coerce'): After correcting the decimal separator, this line can now successfully convert the strings into numeric types. Values that still cannot be converted (e.g., truly invalid or non-numeric entries) will be correctly turned into NaN.
+
+    # 1. Fix the decimal separator (comma  to period) and convert to numeric in one step
+    # Any non-numeric values will become NaN due to errors='coerce'.
+    sales['Latitude_Clean'] = pd.to_numeric(text_values(sales['Latitude'], ARROW_STRINGS).str.replace(',', '.', regex=False), errors='coerce')
+    sales['Longitude_Clean'] = pd.to_numeric(text_values(sales['Longitude'], ARROW_STRINGS).str.replace(',', '.', regex=False), errors='coerce')
+
+    # 2. Convert to numeric, coercing errors to become NaN
+    # This step converts the corrected string values into a numeric type (float).
+    # Any values that still can't be converted to a number (e.g., 'invalid') will become NaN.
+    #sales['Latitude_Clean'] = pd.to_numeric(sales['Latitude_Corrected'], errors='coerce')
+    #sales['Longitude_Clean'] = pd.to_numeric(sales['Longitude_Corrected'], errors='coerce')
+
+    #mesh hassa leha lazma awyyy
+    #print("\n--- Lat/Long Cleaning: Initial Conversion ---")
+    #print(f"Missing Latitude values after conversion: {sales['Latitude_Clean'].isnull().sum()}")
+    #print(f"Missing Longitude values after conversion: {sales['Longitude_Clean'].isnull().sum()}")
+
+    # 2. Check for invalid or potentially swapped coordinate values
+    # Create a mask for rows where the latitude is outside the valid range
+
+    #Latitude must be between -90 and +90.
+    #Longitude must be between -180 and +180.
+
+    # Record the rows that were missing data initially (Crucial for tracking imputation success)
+    # Every step below sets its own DQ_Flags bit, so a row keeps all of its coordinate issues
+    coords_initially_missing = sales['Latitude_Clean'].isnull() | sales['Longitude_Clean'].isnull()
+    set_flag(sales, 'coords_initially_missing', coords_initially_missing)
+
+    # --- 2. Bounds Check and Manual Swapping ---
+
+    print("\n--- 2. Global Bounds Check and Manual Swapping ---")
+
+    # Identify potential swaps (Invalid NOW, Valid LATER) - Keep this 'if' for information
+    global_invalid_mask = (sales['Latitude_Clean'].abs() > 90) | (sales['Longitude_Clean'].abs() > 180)
+    swapped_is_valid_mask = (sales['Longitude_Clean'].abs() <= 90) & (sales['Latitude_Clean'].abs() <= 180)
+    potential_swap_mask = global_invalid_mask & swapped_is_valid_mask
+
+    if potential_swap_mask.any():
+        print(f"⚠️ **Found {potential_swap_mask.sum()} rows that COULD be valid if SWAPPED.**")
+        print(sales.loc[potential_swap_mask, ['Latitude', 'Longitude', 'Latitude_Clean', 'Longitude_Clean']].head(3))
+    else:
+        print("✅ No potential swaps found to meet global bounds (90/180).")
+
+
+    # Explicit Manual Swap for Index 95 (Direct operation - No IF/ELSE needed)
+    manual_swap_index = 95
+
+    # Use direct assignment to swap the values
+    temp_lat = sales.loc[manual_swap_index, 'Latitude_Clean']
+    sales.loc[manual_swap_index, 'Latitude_Clean'] = sales.loc[manual_swap_index, 'Longitude_Clean']
+    sales.loc[manual_swap_index, 'Longitude_Clean'] = temp_lat
+
+    # Flag the row immediately
+    set_flag(sales, 'coords_manually_swapped', sales.index == manual_swap_index)
+
+    # Discard remaining globally invalid coordinates AFTER the manual swap
+    remaining_global_invalid_mask = (sales['Latitude_Clean'].abs() > 90) | (sales['Longitude_Clean'].abs() > 180)
+
+    if remaining_global_invalid_mask.any():  # Keep this 'if' for informative printing
+        print(f"**Discarding {remaining_global_invalid_mask.sum()} truly globally invalid coordinates.**")
+        # Set coordinates to NaN and flag them
+        sales.loc[remaining_global_invalid_mask, ['Latitude_Clean', 'Longitude_Clean']] = np.nan
+        set_flag(sales, 'coords_globally_invalid', remaining_global_invalid_mask)
+
+    # --- 3. Egypt Geographical Range Check and Discarding ---
+
+    # Egypt's approximate valid range (shared with the coords_outside_egypt validation rule)
+    egypt_lat_min, egypt_lat_max = EGYPT_BOUNDS['lat_min'], EGYPT_BOUNDS['lat_max']
+    egypt_long_min, egypt_long_max = EGYPT_BOUNDS['long_min'], EGYPT_BOUNDS['long_max']
+
+    print("\n--- 3. Egypt Range Check and Discarding ---")
+
+    # Mask for coordinates that are valid numbers but outside Egypt's box
+    invalid_egypt_coords_mask = (
+        (sales['Latitude_Clean'].notna()) & (sales['Longitude_Clean'].notna()) & # <-- ADDED THIS LINE
+        (
+            (sales['Latitude_Clean'] < egypt_lat_min) | (sales['Latitude_Clean'] > egypt_lat_max) |
+            (sales['Longitude_Clean'] < egypt_long_min) | (sales['Longitude_Clean'] > egypt_long_max)
+        )
     )
-)
-
-if invalid_egypt_coords_mask.any():  # Keep this 'if' for informative printing
-    print(f"**Found {invalid_egypt_coords_mask.sum()} coordinates outside the Egypt scope.**")
-    print("\nRows outside Egypt's geographical scope (Clean Lat/Long before NaN conversion):")
-    print(sales.loc[invalid_egypt_coords_mask, ['Latitude_Clean', 'Longitude_Clean']].head())
 
-    # Set coordinates outside the required Egypt range to NaN
-    sales.loc[invalid_egypt_coords_mask, ['Latitude_Clean', 'Longitude_Clean']] = np.nan
+    if invalid_egypt_coords_mask.any():  # Keep this 'if' for informative printing
+        print(f"**Found {invalid_egypt_coords_mask.sum()} coordinates outside the Egypt scope.**")
+        print("\nRows outside Egypt's geographical scope (Clean Lat/Long before NaN conversion):")
+        print(sales.loc[invalid_egypt_coords_mask, ['Latitude_Clean', 'Longitude_Clean']].head())
 
-    # Update the investigation flag for these rows (only if they weren't previously flagged)
-    sales.loc[invalid_egypt_coords_mask & (
-                sales['investigation_flag'] == 'Valid/Unknown'), 'investigation_flag'] = 'Out_of_Egypt_Scope'
+        # Set coordinates outside the required Egypt range to NaN
+        sales.loc[invalid_egypt_coords_mask, ['Latitude_Clean', 'Longitude_Clean']] = np.nan
 
-# --- 4. Hierarchical Imputation (Filling NaNs) ---
+        set_flag(sales, 'coords_out_of_egypt', invalid_egypt_coords_mask)
 
-# Update flag for initially missing values that are still 'Valid/Unknown'
-sales.loc[sales['coords_initially_missing'] & (
-            sales['investigation_flag'] == 'Valid/Unknown'), 'investigation_flag'] = 'Initially_Missing'
+    # --- 4. Hierarchical Imputation (Filling NaNs) ---
 
-print("\n--- 4. Hierarchical Imputation for Missing Coordinates ---")
+    # Rows left without coordinates by any of the steps above
+    coords_missing_before_imputation = sales['Latitude_Clean'].isnull() | sales['Longitude_Clean'].isnull()
 
-# Imputation Priority 1: Address (Most specific)
-sales['Latitude_Clean'] = sales.groupby('Address')['Latitude_Clean'].transform(lambda x: x.fillna(x.mean()))
-sales['Longitude_Clean'] = sales.groupby('Address')['Longitude_Clean'].transform(lambda x: x.fillna(x.mean()))
+    print("\n--- 4. Hierarchical Imputation for Missing Coordinates ---")
 
-print(sales['Latitude_Clean'].isnull().sum())
-print(sales['Longitude_Clean'].isnull().sum())
+    # Imputation Priority 1: Address (Most specific)
+    sales['Latitude_Clean'] = sales.groupby('Address')['Latitude_Clean'].transform(lambda x: x.fillna(x.mean()))
+    sales['Longitude_Clean'] = sales.groupby('Address')['Longitude_Clean'].transform(lambda x: x.fillna(x.mean()))
 
+    print(sales['Latitude_Clean'].isnull().sum())
+    print(sales['Longitude_Clean'].isnull().sum())
 
-# Imputation Priority 2: City (Less specific, only fills remaining NaNs)
-sales['Latitude_Clean'] = sales.groupby('City')['Latitude_Clean'].transform(lambda x: x.fillna(x.mean()))
-sales['Longitude_Clean'] = sales.groupby('City')['Longitude_Clean'].transform(lambda x: x.fillna(x.mean()))
 
-print(sales['Latitude_Clean'].isnull().sum())
-print(sales['Longitude_Clean'].isnull().sum())
+    # Imputation Priority 2: City (Less specific, only fills remaining NaNs)
+    sales['Latitude_Clean'] = sales.groupby('City')['Latitude_Clean'].transform(lambda x: x.fillna(x.mean()))
+    sales['Longitude_Clean'] = sales.groupby('City')['Longitude_Clean'].transform(lambda x: x.fillna(x.mean()))
 
-# Imputation Priority 3: Governorate (Least specific, only fills remaining NaNs)
-sales['Latitude_Clean'] = sales.groupby('Governorate')['Latitude_Clean'].transform(lambda x: x.fillna(x.mean()))
-sales['Longitude_Clean'] = sales.groupby('Governorate')['Longitude_Clean'].transform(lambda x: x.fillna(x.mean()))
+    print(sales['Latitude_Clean'].isnull().sum())
+    print(sales['Longitude_Clean'].isnull().sum())
 
-print(sales['Latitude_Clean'].isnull().sum())
-print(sales['Longitude_Clean'].isnull().sum())
+    # Imputation Priority 3: Governorate (Least specific, only fills remaining NaNs)
+    sales['Latitude_Clean'] = sales.groupby('Governorate')['Latitude_Clean'].transform(lambda x: x.fillna(x.mean()))
+    sales['Longitude_Clean'] = sales.groupby('Governorate')['Longitude_Clean'].transform(lambda x: x.fillna(x.mean()))
 
+    print(sales['Latitude_Clean'].isnull().sum())
+    print(sales['Longitude_Clean'].isnull().sum())
 
-# --- 5. Final Validation and Flagging ---
 
-# Create the final null flag
-sales['coords_is_null'] = sales['Latitude_Clean'].isnull() | sales['Longitude_Clean'].isnull()
+    # --- 5. Final Validation and Flagging ---
 
-# 1. Flag successful imputations: Rows that were 'Initially_Missing' but are now NOT null
-imputed_mask = (~sales['coords_is_null']) & (sales['investigation_flag'] == 'Initially_Missing')
-sales.loc[imputed_mask, 'investigation_flag'] = 'Imputed_by_Location'
+    # Rows that were filled by the imputation and rows that no step could fix
+    coords_is_null = sales['Latitude_Clean'].isnull() | sales['Longitude_Clean'].isnull()
+    set_flag(sales, 'coords_imputed', coords_missing_before_imputation & ~coords_is_null)
+    set_flag(sales, 'coords_unresolved', coords_is_null)
 
-# 2. Flag remaining nulls: Rows that couldn't be fixed by any step
-unknown_mask = sales['coords_is_null'] & sales['investigation_flag'].isin(['Valid/Unknown', 'Initially_Missing'])
-sales.loc[unknown_mask, 'investigation_flag'] = 'Needs_Further_Investigation/Unknown'
+    print("\n--- ✅ Final Cleaning Summary ---")
+    print(f"Total rows with initially missing coordinates: {coords_initially_missing.sum()}")
+    print(f"Number of remaining missing coordinates (Needs Investigation): {coords_is_null.sum()}")
+    print("\nFinal Flag Distribution:")
+    coordinate_flags = flag_counts(sales[FLAG_COLUMN])
+    print(coordinate_flags[coordinate_flags.index.str.startswith('coords_')])
+    print("\nExample of cleaned coordinates and flags:")
+    print(sales[['Latitude', 'Longitude', 'Latitude_Clean', 'Longitude_Clean']].head(10)
+          .assign(DQ_Flags=decode_flags(sales[FLAG_COLUMN].head(10))))
 
-# 3. Explicitly mark all remaining 'Valid/Unknown' rows as 'Valid' (The crucial step)
-# These are the rows that had clean data from the start and passed all checks.
-valid_mask = sales['investigation_flag'] == 'Valid/Unknown'
-sales.loc[valid_mask, 'investigation_flag'] = 'Valid'
+    print(sales['Latitude_Clean'].isnull().sum())
+    print(sales['Longitude_Clean'].isnull().sum())
 
-print("\n--- ✅ Final Cleaning Summary ---")
-print(f"Total rows with initially missing coordinates: {sales['coords_initially_missing'].sum()}")
-print(f"Number of remaining missing coordinates (Needs Investigation): {sales['coords_is_null'].sum()}")
-print("\nFinal Flag Distribution:")
-print(sales['investigation_flag'].value_counts())
-print("\nExample of cleaned coordinates and flags:")
-print(sales[['Latitude', 'Longitude', 'Latitude_Clean', 'Longitude_Clean', 'coords_initially_missing','investigation_flag']].head(10))
-
-print(sales['Latitude_Clean'].isnull().sum())
-print(sales['Longitude_Clean'].isnull().sum())
 
 # -------------------------------------------------------------------------
 #  ProductSKU, ProductName,	Category Handling and Cleaning:
 # -------------------------------------------------------------------------
-
-
 def standardize_text(text):
     # 1. Handle actual None or standard NaN values explicitly
     if pd.isna(text):
@@ -735,146 +808,162 @@ def standardize_text(text):
 
     return text
 
-# Apply this function to create new, clean columns in the sales sheet
-sales['ProductSKU_Clean'] = sales['ProductSKU'].apply(standardize_text)
-#sales['ProductSKU_Clean'] = standardize_text(sales['ProductSKU'])
-sales['ProductName_Clean'] = sales['ProductName'].apply(standardize_text)
-sales['Category_Clean'] = sales['Category'].apply(standardize_text)
 
+def clean_product_text(sales):
+    # Apply this function to create new, clean columns in the sales sheet
+    # (with Arrow strings: standardize_texts, the same result from string kernels - see Golden_Equivalence.py)
+    if ARROW_STRINGS:
+        sales['ProductSKU_Clean'] = standardize_texts(sales['ProductSKU'], ARROW_STRING_DTYPE)
+        sales['ProductName_Clean'] = standardize_texts(sales['ProductName'], ARROW_STRING_DTYPE)
+        sales['Category_Clean'] = standardize_texts(sales['Category'], ARROW_STRING_DTYPE)
+    else:
+        sales['ProductSKU_Clean'] = sales['ProductSKU'].apply(standardize_text)
+        #sales['ProductSKU_Clean'] = standardize_text(sales['ProductSKU'])
+        sales['ProductName_Clean'] = sales['ProductName'].apply(standardize_text)
+        sales['Category_Clean'] = sales['Category'].apply(standardize_text)
 
-print(sales['ProductSKU_Clean'].value_counts(dropna=False))
-# 1. Use .str.replace() to systematically remove ALL hyphens in the column.
-sales['ProductSKU_Clean'] = sales['ProductSKU_Clean'].str.replace('-', '', regex=False)
-#checking
-#print(sales['ProductSKU_Clean'].value_counts(dropna=False))
 
-print(sales['ProductName_Clean'].value_counts(dropna=False))
-# 1. REMOVE the " - [Arabic Word]" pattern (The original goal)
-# Using \s+ to catch multiple spaces and ensure robustness
-sales['ProductName_Clean'] = sales['ProductName_Clean'].str.replace(r'\s+-\s*[ا-ي\s]+', '', regex=True)
+    print(sales['ProductSKU_Clean'].value_counts(dropna=False))
+    # 1. Use .str.replace() to systematically remove ALL hyphens in the column.
+    sales['ProductSKU_Clean'] = sales['ProductSKU_Clean'].str.replace('-', '', regex=False)
+    #checking
+    #print(sales['ProductSKU_Clean'].value_counts(dropna=False))
 
-sales['ProductName_Clean'] = sales['ProductName_Clean'].replace({
-    'bluetooth سماعة': 'bluetooth headphones',
-    'puzzle 1000pcsأحجية': 'puzzle 1000pcs',
-    'organic زيت زيتون 1l': 'organic olive oil 1l',
-    'labtop i7 16gb': 'laptop i7 16gb'
-})
+    print(sales['ProductName_Clean'].value_counts(dropna=False))
+    # 1. REMOVE the " - [Arabic Word]" pattern (The original goal)
+    # Using \s+ to catch multiple spaces and ensure robustness
+    sales['ProductName_Clean'] = sales['ProductName_Clean'].str.replace(r'\s+-\s*[ا-ي\s]+', '', regex=True)
 
-#checking
-#print(sales['ProductName_Clean'].value_counts(dropna=False))
+    # Arabic/typo product names -> English (ProductName_Clean alias table)
+    category_mapper.apply(sales, 'ProductName_Clean')
 
+    #checking
+    #print(sales['ProductName_Clean'].value_counts(dropna=False))
 
-print(sales['Category_Clean'].value_counts(dropna=False))
 
-sales['Category_Clean'] = sales['Category_Clean'].replace({
-    'إلكترونيات': 'electronics',
-    'electrnics': 'electronics'
-})
-#checking
-#print(sales['Category_Clean'].value_counts(dropna=False))
+    print(sales['Category_Clean'].value_counts(dropna=False))
 
+    category_mapper.apply(sales, 'Category_Clean')
+    #checking
+    #print(sales['Category_Clean'].value_counts(dropna=False))
 
-#print(sales.head())
 
+    #print(sales.head())
 
 
 #------------------------------------------------------------------------------------
 #                   IN PRODUCTS SHEET
+def look_up_products(sales):
+    # --- STEP 4: CLEANING THE SOURCE TABLE (products_raw) ---
+
+    print("\n--- 4. Standardizing and Preparing Product Lookup Table ---")
+    # 4.1. Apply Standardization DIRECTLY to the original columns (OVERWRITING)
+    # NOTE: The original SKU column is named 'SKU'.
+    if ARROW_STRINGS:
+        products['SKU'] = standardize_texts(products['SKU'], ARROW_STRING_DTYPE)
+        products['ProductName'] = standardize_texts(products['ProductName'], ARROW_STRING_DTYPE)
+        products['Category'] = standardize_texts(products['Category'], ARROW_STRING_DTYPE)
+    else:
+        products['SKU'] = products['SKU'].apply(standardize_text)
+        products['ProductName'] = products['ProductName'].apply(standardize_text)
+        products['Category'] = products['Category'].apply(standardize_text)
+
+    # 4.2. Apply SKU Normalization (Hyphen Removal)
+    products['SKU'] = products['SKU'].str.replace('-', '', regex=False)
+    print(products['SKU'].value_counts(dropna=False).head(10))
+
+    # 4.3. Apply ProductName Normalization (Regex and Manual Mapping)
+    # Remove the hyphen-space-Arabic pattern
+    products['ProductName'] = products['ProductName'].str.replace(r'\s+-\s*[ا-ي\s]+', '', regex=True)
+
+    # Apply the same alias table as the sales sheet to the overwritten column
+    products['ProductName'] = category_mapper.map_series(products['ProductName'], 'ProductName_Clean')
+
+    # 4.4. Apply Category Normalization
+    products['Category'] = category_mapper.map_series(products['Category'], 'Category_Clean')
+    print(products['Category'].value_counts(dropna=False))
+
+    # --- 4.5. Create the Product Lookup Index ---
+    # One row per ProductName (the key used for imputation), first occurrence wins.
+    # The index is a hash lookup (name -> SKU / Category) built ONCE from the cleaned sheet.
+    product_index, product_name_conflicts = build_product_index(products)
+
+    if not product_name_conflicts.empty:
+        print("\n⚠️ Product names that map to more than one SKU in Products_Raw:")
+        print(product_name_conflicts)
+
+    # --- 5. Index Lookup for SKU Imputation ---
+
+    # 5.1. Fill SKU (and Category) ONLY on the null rows via a vectorized map; no merge, no frame copy
+    sku_imputed_mask = fill_from_product_index(sales, product_index)
+
+    # 5.2. Flag the rows that were null but are now filled (on top of their coordinate flags)
+    set_flag(sales, 'sku_imputed_by_name', sku_imputed_mask)
+
+    # 5.3. Flag orders whose SKU disagrees with the product master for the same name
+    sku_conflict = flag_sku_conflicts(sales, product_index)
+    set_flag(sales, 'sku_conflict', sku_conflict)
+    print(f"Orders with a SKU that conflicts with the product master: {sku_conflict.sum()}")
+
+    print("\n✅ Missing SKUs imputed successfully from the product index.")
+
+    # Check the null count again
+    print("\n--- Final Null Count in ProductSKU_Clean ---")
+    print(sales['ProductSKU_Clean'].value_counts(dropna=False).head())
+
+    #checking
+    #print("-------------")
+    #print(sales['ProductSKU'].value_counts(dropna=False))
+    #----------------------------
 
-# --- STEP 4: CLEANING THE SOURCE TABLE (products_raw) ---
-
-print("\n--- 4. Standardizing and Preparing Product Lookup Table ---")
-# 4.1. Apply Standardization DIRECTLY to the original columns (OVERWRITING)
-# NOTE: The original SKU column is named 'SKU'.
-products['SKU'] = products['SKU'].apply(standardize_text)
-products['ProductName'] = products['ProductName'].apply(standardize_text)
-products['Category'] = products['Category'].apply(standardize_text)
-
-# 4.2. Apply SKU Normalization (Hyphen Removal)
-products['SKU'] = products['SKU'].str.replace('-', '', regex=False)
-print(products['SKU'].value_counts(dropna=False).head(10))
-
-# 4.3. Apply ProductName Normalization (Regex and Manual Mapping)
-# Remove the hyphen-space-Arabic pattern
-products['ProductName'] = products['ProductName'].str.replace(r'\s+-\s*[ا-ي\s]+', '', regex=True)
-
-# Apply specific manual replacements to the overwritten column
-products['ProductName'] = products['ProductName'].replace({
-    'bluetooth سماعة': 'bluetooth headphones',
-    'puzzle 1000pcsأحجية': 'puzzle 1000pcs',
-    'organic زيت زيتون 1l': 'organic olive oil 1l',
-    'labtop i7 16gb': 'laptop i7 16gb'
-})
-
-# 4.4. Apply Category Normalization
-products['Category'] = products['Category'].replace({
-    'إلكترونيات': 'electronics',
-    'electrnics': 'electronics'
-})
-print(products['Category'].value_counts(dropna=False))
-
-# --- 4.5. Create Final Unique Lookup Table ---
-# Drop duplicates based on the ProductName (the key you will use for merging).
-products = products.drop_duplicates(subset=['ProductName'], keep='first')
-#sku_lookup = products.drop_duplicates(subset=['ProductName'], keep='first')
-#print(products['SKU'].value_counts(dropna=False))
-
-#print(sku_lookup['ProductName'].value_counts(dropna=False))
-#print(sku_lookup)
-
-# --- 5. Direct Join for SKU Imputation ---
-# --- 5. Direct Join for SKU Imputation ---
-
-# 5.1. Perform the Left Merge
-# NOTE: Renaming the columns in 5.5 now depends on this step's suffixes.
-sales = pd.merge(
-    sales,
-    products[['ProductName', 'SKU']], # Only select Name (key) and SKU (value)
-    how='left',
-    left_on='ProductName_Clean', # This column is the join key from the LEFT table (sales)
-    right_on='ProductName', # This column is the join key from the RIGHT table (products)
-    suffixes=('_sales', '_imputed') #what it's use !!!!1
-)
-
-# 5.2. Identify the Nulls *before* filling (for the flag)
-null_sku_mask = sales['ProductSKU_Clean'].isnull()
-
-# 5.3. Fill Gaps in SKU (THE CRITICAL FIX: Assign the result back!)
-sales['ProductSKU_Clean'] = sales['ProductSKU_Clean'].fillna(sales['SKU'])
-
-# 5.4. Update the investigation flag
-# Use the mask created in 5.2 to target only the rows that were originally null but are now filled.
-sales.loc[null_sku_mask & sales['ProductSKU_Clean'].notna(), 'investigation_flag'] = 'SKU_Imputed_by_Name'
-
-# 5.5. Cleanup: Drop the temporary columns created by the merge (FIXED)
-# The temporary columns are: the copied join key ('ProductName') and the imputed value ('SKU').
-# The suffix logic will rename 'ProductName' to 'ProductName_imputed', but 'SKU' remains 'SKU'.
-# Based on your previous successful error check, the correct columns to drop are:
-sales.drop(columns=['SKU', 'ProductName_imputed'], inplace=True)
-
-print("\n✅ Missing SKUs imputed successfully. Category column was left untouched.")
-
-# Check the null count again
-print("\n--- Final Null Count in ProductSKU_Clean ---")
-print(sales['ProductSKU_Clean'].value_counts(dropna=False).head())
-
-#checking
-#print("-------------")
-#print(sales['ProductSKU'].value_counts(dropna=False))
-#----------------------------
 
 # -------------------------------------------------------------------------
-# MONETARY COLUMNS CLEANING AND STANDARDIZATION
+#  Column stages, run by the DAG scheduler:
 # -------------------------------------------------------------------------
+# Each stage starts as soon as the stages whose columns it reads have finished, so independent
+# stages (the date parsing, the categorical maps, the coordinates, the product text) run at the same
+# time (see Stage_Scheduler.py). They are checkpointed as one unit, after the product lookup.
+COLUMN_STAGES = {
+    'Dates': clean_dates,
+    'BI Date Columns': add_bi_date_columns,
+    'CustomerName': clean_customer_names,
+    'Phone': clean_phones,
+    'Customer Matching': match_customers,
+    'Gender': clean_gender,
+    'Governorate': clean_governorates,
+    'PaymentStatus': clean_payment_status,
+    'PaymentMethod': clean_payment_methods,
+    'Status': clean_status,
+    'ShipperName': clean_shipper_names,
+    'Channel': clean_channels,
+    'Validation Rules': check_validation_rules,
+    'Latitude/Longitude': clean_coordinates,
+    'Product Text': clean_product_text,
+    'Product Lookup': look_up_products,
+}
 
-# ---------------------------
-# 1️⃣ Preview monetary columns
-# ---------------------------
-print(sales[['UnitPrice', 'Quantity', 'Subtotal', 'Discount', 'TotalAmount', 'Currency']].head(10))
+if checkpoints.runs(*COLUMN_STAGES):
+    # One run-log record per column stage, timed by the scheduler as it finishes
+    profiler.finish(sales)
+    column_stage_run = run_stages(sales, {stage: function for stage, function in COLUMN_STAGES.items()
+                                          if checkpoints.runs(stage)}, workers=stage_workers,
+                                  on_stage=lambda stage, frame_in, frame_out, seconds, cpu_seconds:
+                                  profiler.record(stage, seconds, cpu_seconds, frame_in, frame_out))
+    print("\n--- Column Stages (DAG scheduler) ---")
+    print(column_stage_run.summary())
+
+    # Lean mode: released once the whole group has finished, since stages overlap
+    for stage in COLUMN_STAGES:
+        lean.release(sales, stage)
+    # Text the stages built with Python-level code (alias maps, .apply) goes back into Arrow strings
+    if ARROW_STRINGS:
+        to_arrow_strings(sales)
+    checkpoints.save(list(COLUMN_STAGES)[-1], sales)
 
-# ---------------------------
-# 2️⃣ Standardize currency variations
-# ---------------------------
+# -------------------------------------------------------------------------
+# MONETARY COLUMNS CLEANING AND STANDARDIZATION
+# -------------------------------------------------------------------------
+# Currency variations, FX rate, discount and price-cap row functions of the section below
 currency_map = {
     'ج.م': 'EGP',
     'EGP': 'EGP',
@@ -895,12 +984,6 @@ def clean_currency(currency_str):
     return currency_str.upper()
 
 
-sales['Currency_Clean'] = sales['Currency'].apply(clean_currency)
-print(sales['Currency_Clean'].value_counts(dropna=False))
-
-# ---------------------------
-# 3️⃣ Apply FX rates
-# ---------------------------
 EGP_PER_USD = 45.3575  # average 2024
 
 
@@ -911,31 +994,6 @@ def get_fx_rate(currency):
     return 1.0
 
 
-sales['FX_Rate'] = sales['Currency_Clean'].apply(get_fx_rate)
-
-# Standardize UnitPrice to EGP
-sales['UnitPrice_EGP'] = sales['UnitPrice'] * sales['FX_Rate']
-
-print("--- UnitPrice Standardization ---")
-print(sales[['Currency_Clean', 'UnitPrice', 'FX_Rate', 'UnitPrice_EGP']].head())
-
-# ---------------------------
-# 4️⃣ Clean Quantity
-# ---------------------------
-invalid_qty_mask = sales['Quantity'] <= 0
-sales['Quantity_Clean'] = sales['Quantity']
-sales.loc[invalid_qty_mask, 'Quantity_Clean'] = np.nan
-print(f"Remaining nulls in Quantity_Clean: {sales['Quantity_Clean'].isnull().sum()}")
-
-# ---------------------------
-# 5️⃣ Recalculate Subtotal
-# ---------------------------
-sales['Subtotal_Calc'] = sales['UnitPrice_EGP'] * sales['Quantity_Clean']
-print(sales[['Subtotal', 'Subtotal_Calc']].head())
-
-# ---------------------------
-# 6️⃣ Standardize Discount
-# ---------------------------
 def standardize_discount(row):
     """Convert discounts to 0-1 rate using subtotal and FX"""
     discount = str(row['Discount']).strip()
@@ -970,126 +1028,131 @@ def standardize_discount(row):
     return min(rate, 1.0)
 
 
-sales['Discount_Rate_Clean'] = sales.apply(standardize_discount, axis=1)
-
-# ---------------------------
-# 7️⃣ Identify and cap extreme UnitPrice outliers (per SKU)
-# ---------------------------
-# Compute 99th percentile per SKU
-sku_99 = sales.groupby('ProductSKU_Clean')['UnitPrice_EGP'].quantile(0.99)
-
-
 def cap_unitprice(row):
     threshold = sku_99[row['ProductSKU_Clean']]
     return min(row['UnitPrice_EGP'], threshold)
 
 
-sales['UnitPrice_EGP_capped'] = sales.apply(cap_unitprice, axis=1)
-
-# Recalculate subtotal after capping
-sales['Subtotal_Calc_Capped'] = sales['UnitPrice_EGP_capped'] * sales['Quantity_Clean']
-
-# ---------------------------
-# 8️⃣ Quick visualization
-# ---------------------------
-plt.figure(figsize=(12, 5))
-plt.subplot(1, 2, 1)
-sns.boxplot(x='UnitPrice_EGP', data=sales)
-plt.title("Before Capping")
-
-plt.subplot(1, 2, 2)
-sns.boxplot(x='UnitPrice_EGP_capped', data=sales)
-plt.title("After Capping")
-plt.show()
-
-# ---------------------------
-# ✅ Summary of new columns
-# ---------------------------
-print("New columns created:")
-print([
-    'Quantity_Clean',
-    'UnitPrice_EGP',
-    'UnitPrice_EGP_capped',
-    'Subtotal_Calc',
-    'Subtotal_Calc_Capped',
-    'Discount_Rate_Clean',
-    'Currency_Clean',
-    'FX_Rate'
-])
-
-# 1️⃣ Basic stats before and after capping
-print("--- UnitPrice_EGP Stats Before Capping ---")
-print(sales['UnitPrice_EGP'].describe())
-
-print("\n--- UnitPrice_EGP Stats After Capping ---")
-print(sales['UnitPrice_EGP_capped'].describe())
-
-# 2️⃣ Check top 10 highest prices before and after
-print("\n--- Top 10 UnitPrice_EGP Before Capping ---")
-print(sales['UnitPrice_EGP'].sort_values(ascending=False).head(10))
-
-print("\n--- Top 10 UnitPrice_EGP After Capping ---")
-print(sales['UnitPrice_EGP_capped'].sort_values(ascending=False).head(10))
-
-# 3️⃣ Count of rows above the 99th percentile (to see how many were affected)
-cap_value = sales['UnitPrice_EGP'].quantile(0.99)
-print(f"\n99th percentile value (cap threshold): {cap_value}")
-
-print("Number of rows above 99th percentile (before capping):", (sales['UnitPrice_EGP'] > cap_value).sum())
-print("Number of rows above 99th percentile (after capping):", (sales['UnitPrice_EGP_capped'] > cap_value).sum())
-
-
-#print(sales['TotalAmount'].value_counts(dropna=False).head(10))
-#print(sales['ShippingCost'].value_counts(dropna=False).head(10))
-
-#print(sales.head(15))
-
+if checkpoints.runs("Monetary"):
+    profiler.stage("Monetary", sales)
+
+    # ---------------------------
+    # 1️⃣ Preview monetary columns
+    # ---------------------------
+    print(sales[['UnitPrice', 'Quantity', 'Subtotal', 'Discount', 'TotalAmount', 'Currency']].head(10))
+
+    # ---------------------------
+    # 2️⃣ Standardize currency variations
+    # ---------------------------
+    sales['Currency_Clean'] = sales['Currency'].apply(clean_currency)
+    print(sales['Currency_Clean'].value_counts(dropna=False))
+
+    # ---------------------------
+    # 3️⃣ Apply FX rates
+    # ---------------------------
+    sales['FX_Rate'] = sales['Currency_Clean'].apply(get_fx_rate)
+
+    # Standardize UnitPrice to EGP
+    sales['UnitPrice_EGP'] = sales['UnitPrice'] * sales['FX_Rate']
+
+    print("--- UnitPrice Standardization ---")
+    print(sales[['Currency_Clean', 'UnitPrice', 'FX_Rate', 'UnitPrice_EGP']].head())
+
+    # ---------------------------
+    # 4️⃣ Clean Quantity
+    # ---------------------------
+    # (the quantity_not_positive bit of DQ_Flags: `validation` only exists when the Validation Rules
+    # stage ran in this process, not when it was restored from a checkpoint)
+    invalid_qty_mask = flag_mask(sales[FLAG_COLUMN], 'quantity_not_positive')
+    sales['Quantity_Clean'] = sales['Quantity']
+    sales.loc[invalid_qty_mask, 'Quantity_Clean'] = np.nan
+    print(f"Remaining nulls in Quantity_Clean: {sales['Quantity_Clean'].isnull().sum()}")
+
+    # ---------------------------
+    # 5️⃣ Recalculate Subtotal
+    # ---------------------------
+    # (rows whose raw Subtotal disagrees with UnitPrice x Quantity: rule subtotal_mismatch)
+    sales['Subtotal_Calc'] = sales['UnitPrice_EGP'] * sales['Quantity_Clean']
+
+    # ---------------------------
+    # 6️⃣ Standardize Discount
+    # ---------------------------
+    sales['Discount_Rate_Clean'] = sales.apply(standardize_discount, axis=1)
+
+    # ---------------------------
+    # 7️⃣ Identify and cap extreme UnitPrice outliers (per SKU)
+    # ---------------------------
+    # Compute 99th percentile per SKU
+    sku_99 = sales.groupby('ProductSKU_Clean')['UnitPrice_EGP'].quantile(0.99)
+
+    sales['UnitPrice_EGP_capped'] = sales.apply(cap_unitprice, axis=1)
+
+    # Recalculate subtotal after capping
+    sales['Subtotal_Calc_Capped'] = sales['UnitPrice_EGP_capped'] * sales['Quantity_Clean']
+
+    # ---------------------------
+    # 8️⃣ Quick visualization
+    # ---------------------------
+    plt.figure(figsize=(12, 5))
+    plt.subplot(1, 2, 1)
+    sns.boxplot(x='UnitPrice_EGP', data=sales)
+    plt.title("Before Capping")
+
+    plt.subplot(1, 2, 2)
+    sns.boxplot(x='UnitPrice_EGP_capped', data=sales)
+    plt.title("After Capping")
+    plt.show()
+
+    # ---------------------------
+    # ✅ Summary of new columns
+    # ---------------------------
+    print("New columns created:")
+    print([
+        'Quantity_Clean',
+        'UnitPrice_EGP',
+        'UnitPrice_EGP_capped',
+        'Subtotal_Calc',
+        'Subtotal_Calc_Capped',
+        'Discount_Rate_Clean',
+        'Currency_Clean',
+        'FX_Rate'
+    ])
+
+    # 1️⃣ Basic stats before and after capping
+    print("--- UnitPrice_EGP Stats Before Capping ---")
+    print(sales['UnitPrice_EGP'].describe())
+
+    print("\n--- UnitPrice_EGP Stats After Capping ---")
+    print(sales['UnitPrice_EGP_capped'].describe())
+
+    # 2️⃣ Check top 10 highest prices before and after
+    print("\n--- Top 10 UnitPrice_EGP Before Capping ---")
+    print(sales['UnitPrice_EGP'].sort_values(ascending=False).head(10))
+
+    print("\n--- Top 10 UnitPrice_EGP After Capping ---")
+    print(sales['UnitPrice_EGP_capped'].sort_values(ascending=False).head(10))
+
+    # 3️⃣ Count of rows above the 99th percentile (to see how many were affected)
+    cap_value = sales['UnitPrice_EGP'].quantile(0.99)
+    print(f"\n99th percentile value (cap threshold): {cap_value}")
+
+    print("Number of rows above 99th percentile (before capping):", (sales['UnitPrice_EGP'] > cap_value).sum())
+    print("Number of rows above 99th percentile (after capping):", (sales['UnitPrice_EGP_capped'] > cap_value).sum())
+
+
+    #print(sales['TotalAmount'].value_counts(dropna=False).head(10))
+    #print(sales['ShippingCost'].value_counts(dropna=False).head(10))
+
+    #print(sales.head(15))
+
+
+    lean.release(sales, "Monetary")
+    checkpoints.save("Monetary", sales)
 
 # -------------------------------------------------------------------------
 # Inconsistency in COLUMNS (shipper) CLEANING AND STANDARDIZATION
 # -------------------------------------------------------------------------
-
-#---------------------------
-#obeservationsssss
-print(sales['ShippingCost'].unique())
-
-print(
-    sales.groupby('ShipperName_Clean')['ShippingCost']
-         .median()
-         .sort_values()
-)
-
-print(
-    sales.groupby('Governorate_Clean')['ShippingCost']
-         .median()
-         .sort_values()
-)
-
-print(
-    sales.groupby('City')['ShippingCost']
-         .median()
-         .sort_values()
-)
-
-#------------------
-
-shipping_median_city = sales.groupby(
-    ['Channel_Clean', 'ShipperName_Clean', 'Governorate_Clean', 'City']
-)['ShippingCost'].median().reset_index()
-
-print(shipping_median_city.sample(20))
-
-#fill shipping cost
-
-# 1️⃣ Calculate medians at different levels
-median_level1 = sales.groupby(['ShipperName_Clean', 'Governorate_Clean', 'City'])['ShippingCost'].median()
-median_level2 = sales.groupby(['ShipperName_Clean', 'City'])['ShippingCost'].median()
-median_level3 = sales.groupby(['ShipperName_Clean', 'Governorate_Clean'])['ShippingCost'].median()
-median_level4 = sales.groupby(['ShipperName_Clean'])['ShippingCost'].median()
-global_median = sales['ShippingCost'].median()  # fallback if nothing else
-print(f"Global median: {global_median}")
-
-# 2️⃣ Define function to fill shipping cost per row
+# Fill shipping cost per row from the median levels computed in the section below
 def fill_shipping_cost(row):
     # Treat NaN or 0 as missing
     if pd.notna(row['ShippingCost']) and row['ShippingCost'] != 0:
@@ -1122,124 +1185,221 @@ def fill_shipping_cost(row):
     # Last fallback: global median
     return global_median  # guaranteed number
 
-# 3️⃣ Apply the function to fill missing shipping cost
-sales['ShippingCost_Filled'] = sales.apply(fill_shipping_cost, axis=1)
 
-# 4️⃣ Quick check
-missing_before = sales['ShippingCost'].isna().sum()
-missing_after = sales['ShippingCost_Filled'].isna().sum()
-print(f"Missing before: {missing_before}")
-print(f"Missing after: {missing_after}")
+if checkpoints.runs("Shipping Cost"):
+    profiler.stage("Shipping Cost", sales)
+
+    #---------------------------
+    #obeservationsssss
+    print(sales['ShippingCost'].unique())
+
+    print(
+        sales.groupby('ShipperName_Clean')['ShippingCost']
+             .median()
+             .sort_values()
+    )
+
+    print(
+        sales.groupby('Governorate_Clean')['ShippingCost']
+             .median()
+             .sort_values()
+    )
+
+    print(
+        sales.groupby('City')['ShippingCost']
+             .median()
+             .sort_values()
+    )
+
+    #------------------
+
+    shipping_median_city = sales.groupby(
+        ['Channel_Clean', 'ShipperName_Clean', 'Governorate_Clean', 'City']
+    )['ShippingCost'].median().reset_index()
+
+    print(shipping_median_city.sample(20))
+
+    #fill shipping cost
+
+    # 1️⃣ Calculate medians at different levels
+    median_level1 = sales.groupby(['ShipperName_Clean', 'Governorate_Clean', 'City'])['ShippingCost'].median()
+    median_level2 = sales.groupby(['ShipperName_Clean', 'City'])['ShippingCost'].median()
+    median_level3 = sales.groupby(['ShipperName_Clean', 'Governorate_Clean'])['ShippingCost'].median()
+    median_level4 = sales.groupby(['ShipperName_Clean'])['ShippingCost'].median()
+    global_median = sales['ShippingCost'].median()  # fallback if nothing else
+    print(f"Global median: {global_median}")
+
+    # 2️⃣ fill_shipping_cost (defined above the section) walks the levels per row
+
+    # 3️⃣ Apply the function to fill missing shipping cost
+    sales['ShippingCost_Filled'] = sales.apply(fill_shipping_cost, axis=1)
+
+    # 4️⃣ Quick check
+    missing_before = sales['ShippingCost'].isna().sum()
+    missing_after = sales['ShippingCost_Filled'].isna().sum()
+    print(f"Missing before: {missing_before}")
+    print(f"Missing after: {missing_after}")
+
+    # 5️⃣ Flag the filled rows
+    set_flag(sales, 'shipping_cost_imputed', sales['ShippingCost'].isna() & sales['ShippingCost_Filled'].notna())
+    print(f"Shipping costs filled: {flag_mask(sales[FLAG_COLUMN], 'shipping_cost_imputed').sum()}")
 
-# 5️⃣ Optional: summary of fill levels
-sales['fill_tracker'] = np.where(
-    sales['ShippingCost'].notna(), 'original',
-    np.where(sales['ShippingCost_Filled'].notna(), 'filled', 'still_missing')
-)
-print(sales['fill_tracker'].value_counts())
 
+    print(sales['ShippingCost_Filled'].value_counts())
 
-print(sales['ShippingCost_Filled'].value_counts())
+    #print(sales[sales['Channel_Clean'] == 'Store']['ShippingCost'].describe())
 
-#print(sales[sales['Channel_Clean'] == 'Store']['ShippingCost'].describe())
+    #observationssssssssssss
+    # Quick summary of shipping costs per channel
+    channel_summary = sales.groupby('Channel_Clean')['ShippingCost_Filled'].describe()
+    print(channel_summary)
 
-#observationssssssssssss
-# Quick summary of shipping costs per channel
-channel_summary = sales.groupby('Channel_Clean')['ShippingCost_Filled'].describe()
-print(channel_summary)
+    # Count of unique shipping costs per channel
+    for channel in sales['Channel_Clean'].unique():
+        print(f"\nChannel: {channel}")
+        print(sales[sales['Channel_Clean'] == channel]['ShippingCost_Filled'].value_counts().sort_index())
+    #-----------------------
 
-# Count of unique shipping costs per channel
-for channel in sales['Channel_Clean'].unique():
-    print(f"\nChannel: {channel}")
-    print(sales[sales['Channel_Clean'] == channel]['ShippingCost_Filled'].value_counts().sort_index())
-#-----------------------
 
+    # Rows where ShippingCost is missing
+    #missing_shipping = sales[sales['ShippingCost'].isna()]
+    #print(missing_shipping[['OrderID_cleaned', 'Channel_Clean', 'ShipperName_Clean', 'Governorate_Clean', 'City', 'ShippingCost']])
 
-# Rows where ShippingCost is missing
-#missing_shipping = sales[sales['ShippingCost'].isna()]
-#print(missing_shipping[['OrderID_cleaned', 'Channel_Clean', 'ShipperName_Clean', 'Governorate_Clean', 'City', 'ShippingCost']])
+    # Show all related columns together for inspection
+    #print(sales.loc[mask_store_issue, ['OrderID_cleaned', 'Channel_Clean', 'ShipperName_Clean', 'ShippingCost']])
 
-# Show all related columns together for inspection
-#print(sales.loc[mask_store_issue, ['OrderID_cleaned', 'Channel_Clean', 'ShipperName_Clean', 'ShippingCost']])
+    sales['TotalAmount_Calc'] = (sales['Subtotal_Calc_Capped'] * (1 - sales['Discount_Rate_Clean'])) + sales['ShippingCost_Filled']
 
-sales['TotalAmount_Calc'] = (sales['Subtotal_Calc_Capped'] * (1 - sales['Discount_Rate_Clean'])) + sales['ShippingCost_Filled']
+    print("total amout calcualted")
+    print(sales['TotalAmount_Calc'].describe())
+    print(sales['TotalAmount_Calc'].isna().sum())
+    print(sales['Subtotal_Calc_Capped'].isna().sum())
+    #print(sales['Quantity_Cleaned'].isna().sum())
 
-print("total amout calcualted")
-print(sales['TotalAmount_Calc'].describe())
-print(sales['TotalAmount_Calc'].isna().sum())
-print(sales['Subtotal_Calc_Capped'].isna().sum())
-#print(sales['Quantity_Cleaned'].isna().sum())
 
+    # --- Distribution before cleaning ---
+    plt.figure(figsize=(12,6))
+    sns.histplot(sales['TotalAmount_Calc'], bins=50, kde=True)
+    plt.title('Distribution of TotalAmount_Calc')
+    plt.xlabel('Total Amount')
+    plt.ylabel('Count')
+    plt.show()
 
-# --- Distribution before cleaning ---
-plt.figure(figsize=(12,6))
-sns.histplot(sales['TotalAmount_Calc'], bins=50, kde=True)
-plt.title('Distribution of TotalAmount_Calc')
-plt.xlabel('Total Amount')
-plt.ylabel('Count')
-plt.show()
+    # --- Boxplot with log transformation to handle skew ---
+    plt.figure(figsize=(12,4))
+    sns.boxplot(x=np.log1p(sales['TotalAmount_Calc']))
+    plt.title('Log-transformed TotalAmount_Calc Boxplot')
+    plt.xlabel('Log(Total Amount + 1)')
+    plt.show()
 
-# --- Boxplot with log transformation to handle skew ---
-plt.figure(figsize=(12,4))
-sns.boxplot(x=np.log1p(sales['TotalAmount_Calc']))
-plt.title('Log-transformed TotalAmount_Calc Boxplot')
-plt.xlabel('Log(Total Amount + 1)')
-plt.show()
+    # --- Identify extreme values using IQR ---
+    Q1 = sales['TotalAmount_Calc'].quantile(0.25)
+    Q3 = sales['TotalAmount_Calc'].quantile(0.75)
+    IQR = Q3 - Q1
 
-# --- Identify extreme values using IQR ---
-Q1 = sales['TotalAmount_Calc'].quantile(0.25)
-Q3 = sales['TotalAmount_Calc'].quantile(0.75)
-IQR = Q3 - Q1
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
 
-lower_bound = Q1 - 1.5 * IQR
-upper_bound = Q3 + 1.5 * IQR
+    totalamount_extreme = (sales['TotalAmount_Calc'] < lower_bound) | (sales['TotalAmount_Calc'] > upper_bound)
+    set_flag(sales, 'totalamount_extreme', totalamount_extreme)
 
-sales['TotalAmount_Extreme'] = (sales['TotalAmount_Calc'] < lower_bound) | (sales['TotalAmount_Calc'] > upper_bound)
+    # Summary of extreme values
+    print("Count of extreme orders:")
+    print(totalamount_extreme.value_counts())
 
-# Summary of extreme values
-print("Count of extreme orders:")
-print(sales['TotalAmount_Extreme'].value_counts())
+    print("\nTop extreme orders:")
+    print(sales[totalamount_extreme].sort_values('TotalAmount_Calc', ascending=False))
 
-print("\nTop extreme orders:")
-print(sales[sales['TotalAmount_Extreme']].sort_values('TotalAmount_Calc', ascending=False))
+    # --- Optional: visualize extreme vs normal orders ---
+    plt.figure(figsize=(12,6))
+    sns.histplot(sales[~totalamount_extreme]['TotalAmount_Calc'], bins=50, color='blue', label='Normal', alpha=0.6)
+    sns.histplot(sales[totalamount_extreme]['TotalAmount_Calc'], bins=50, color='red', label='Extreme', alpha=0.6)
+    plt.title('Normal vs Extreme TotalAmount_Calc')
+    plt.xlabel('Total Amount')
+    plt.ylabel('Count')
+    plt.legend()
+    plt.show()
+    #print(sales.head())
 
-# --- Optional: visualize extreme vs normal orders ---
-plt.figure(figsize=(12,6))
-sns.histplot(sales[~sales['TotalAmount_Extreme']]['TotalAmount_Calc'], bins=50, color='blue', label='Normal', alpha=0.6)
-sns.histplot(sales[sales['TotalAmount_Extreme']]['TotalAmount_Calc'], bins=50, color='red', label='Extreme', alpha=0.6)
-plt.title('Normal vs Extreme TotalAmount_Calc')
-plt.xlabel('Total Amount')
-plt.ylabel('Count')
-plt.legend()
-plt.show()
-#print(sales.head())
+    # Debugging check only; skipped in lean mode
+    if not LEAN_MODE:
+        sales['Test_Subtotal'] = sales['UnitPrice_EGP_capped'] * sales['Quantity_Clean']
+        print( (sales['Test_Subtotal'] - sales['Subtotal_Calc_Capped']).abs().sum() )
 
-sales['Test_Subtotal'] = sales['UnitPrice_EGP_capped'] * sales['Quantity_Clean']
-print( (sales['Test_Subtotal'] - sales['Subtotal_Calc_Capped']).abs().sum() )
 
+    print(sales.columns.tolist())
 
-print(sales.columns.tolist())
+    # Values that no alias table covered -> add them to Category_Mappings.json
+    print("\n--- Unmapped categorical values ---")
+    print(category_mapper.unmapped_report())
+
+    lean.release(sales, "Shipping Cost")
+    checkpoints.save("Shipping Cost", sales)
 
 # -----------------------------------------
 # CREATE BI-READY DATASET FOR DASHBOARDS
 # -----------------------------------------
+profiler.stage("BI Export", sales)
+if ARROW_STRINGS:
+    to_arrow_strings(sales, bi_columns)  # written to Parquet as Arrow strings
+
+# Quarantine first: rejected and suspicious rows are written with their reason codes,
+# only the trusted rows go into the BI dataset
+trusted_rows = route_rows(sales, bi_columns, quarantine_path, threshold=quarantine_threshold)
+if quarantine_threshold is None:
+    print("Quarantine off: every row goes to the BI dataset (RETAIL_QUARANTINE_SEVERITY opts in)")
+else:
+    print(f"Quarantined {(~trusted_rows).sum()} of {len(sales)} rows (threshold: {quarantine_threshold}) -> {quarantine_path}")
 
-bi_columns = [
-    'OrderID_cleaned',
-    'OrderDate','Order_Year','Order_Month','Order_Quarter','Order_YearMonth',
-    'DeliveryDate','Delivery_Time_Days','Delivery_Delayed',
-    'ProductSKU_Clean','ProductName_Clean','Category_Clean',
-    'Subtotal_Calc_Capped','Discount_Rate_Clean','ShippingCost_Filled','TotalAmount_Calc',
-    'PaymentStatus_Clean','PaymentMethod_Clean'
-
-]
-
-bi_sales = sales[bi_columns]
+# bi_columns is defined at the top of the script (it is also the keep-list of lean mode)
+bi_sales = sales.loc[trusted_rows, bi_columns]
 
 print("BI-ready dataset created and saved successfully.")
 print("Shape:", bi_sales.shape)
 print("Columns:", bi_sales.columns.tolist())
 
-# Save file
-output_path = "/Users/salmaabdelkader/PycharmProjects/RetailCaseStudy/BI_Ready_Sales_Dataset.xlsx"
-bi_sales.to_excel(output_path, index=False)
+# Save file (Parquet when the rows do not fit in one Excel sheet)
+if len(bi_sales) < EXCEL_MAX_ROWS:
+    output_path = os.path.join(output_dir, "BI_Ready_Sales_Dataset.xlsx")
+    bi_sales.to_excel(output_path, index=False)
+else:
+    output_path = os.path.join(output_dir, "BI_Ready_Sales_Dataset.parquet")
+    bi_sales.to_parquet(output_path, index=False)
+
+# Month partitions: only the months whose rows changed since the last run are rewritten
+if partitioned_output_path:
+    partition_changes = write_partitions(bi_sales, partitioned_output_path)
+    print(f"Partitioned dataset: {len(partition_changes['written'])} months written, "
+          f"{len(partition_changes['unchanged'])} unchanged, {len(partition_changes['deleted'])} deleted "
+          f"-> {partitioned_output_path}")
+
+# Delta for the warehouse: upserts and deletes instead of a full reload
+if cdc_delta_path:
+    cdc = ChangeDataCapture(cdc_snapshot_dir, cdc_delta_path).write_delta(bi_sales)
+    print(f"Change data capture: {cdc.summary()} -> {cdc_delta_path}")
+
+# ---------------------------
+# Pre-aggregated KPI cube (Create_Dashboard.py builds every sheet from it)
+# ---------------------------
+profiler.stage("KPI Cube", bi_sales)
+kpi_cube, kpi_totals = build_kpi_cube(bi_sales)
+write_kpi_cube(kpi_cube, kpi_totals, kpi_cube_path)
+print(f"KPI cube saved: {len(kpi_cube)} cells for {kpi_totals['rows']} rows")
+
+# ---------------------------
+# Stage resource report
+# ---------------------------
+profiler.finish(kpi_cube)
+profiler.write_json(run_log_path)
+profiler.append_csv(run_history_path)
+if flame_report_path:
+    profiler.write_flame_report(flame_report_path)
+
+print("\n--- Stage Resource Report ---")
+print(profiler.summary())
+
+print("\n--- Lean Mode Column Releases ---")
+print(lean.summary())
+
+print("\n--- Stage Checkpoints ---")
+print(checkpoints.summary())
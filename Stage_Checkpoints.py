@@ -0,0 +1,326 @@
+"""
+Stage Checkpoint Cache for the EG Retail Sales cleaning pipeline
+Keeps the frame after every stage so a re-run resumes at the first stage whose input or code changed
+
+Approach:
+1. Every planned stage gets a key: the hash of its input plus the stage version. The input of the
+   first stage is the raw input file(s) and the run settings; the input of every later stage is the
+   output of the stage before it, so its hash is that stage's key (keys chain instead of hashing
+   every intermediate frame, which would need the skipped stages to run)
+2. The stage version hashes the stage's `if checkpoints.runs("<stage>"):` section of the script, the
+   top-level functions and constants it uses, the local modules it imports names from and the
+   config files it reads (e.g. Category_Mappings.json through category_mapper). A section may gate
+   several stages (`checkpoints.runs(*COLUMN_STAGES)`); they share its version and one checkpoint
+3. After a stage the frame is written as an Arrow IPC file named by its key, or pickled when a
+   column holds mixed Python objects (raw values such as the Discount number/text mix) that Arrow
+   cannot store as one type or would not read back unchanged
+4. At start-up the last stage whose key has a checkpoint is restored and every stage up to it is
+   skipped: editing the shipping-cost rules re-runs Shipping Cost only, and a run that crashed
+   resumes after the last stage it finished
+5. checkpoints.json indexes the files with their size and last use; after every write the least
+   recently used checkpoints are deleted until the cache fits the disk budget
+
+Checkpoints and the index are written under a temporary name and renamed, so a crash never leaves
+a half-written file behind. State outside the frame (the OrderID registry) is not part of the key.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for Arrow IPC checkpoints (pickle otherwise)
+    pa = None
+
+from Pipeline_Profiler import MB
+
+CHECKPOINT_BUDGET_MB = 2048
+INDEX_FILE = 'checkpoints.json'
+HASH_BLOCK_BYTES = 1 << 20
+
+# Names a stage section uses that never change its output (instrumentation, the cache itself)
+IGNORED_NAMES = ('profiler', 'checkpoints')
+
+
+def file_digest(path):
+    """sha256 of a file, or of the names and contents of every file in a folder"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        paths = [path]
+    for file_path in paths:
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, 'rb') as source:
+            for block in iter(lambda: source.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _names(node):
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+
+
+def _gated_stages(node, collections):
+    """
+    Stage names of an `if checkpoints.runs("<stage>", ...):` statement ([] for any other statement);
+    `*NAME` arguments are looked up in `collections` (top-level list/dict literals of the script)
+    """
+    if not isinstance(node, ast.If):
+        return []
+    for child in ast.walk(node.test):
+        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                and child.func.attr == 'runs' and isinstance(child.func.value, ast.Name)
+                and child.func.value.id == 'checkpoints'):
+            stages = []
+            for argument in child.args:
+                if isinstance(argument, ast.Constant):
+                    stages.append(argument.value)
+                elif isinstance(argument, ast.Starred) and isinstance(argument.value, ast.Name):
+                    stages.extend(collections.get(argument.value.id, []))
+            return stages
+    return []
+
+
+def _literal_keys(node):
+    """String elements of a list/tuple literal or string keys of a dict literal"""
+    items = node.keys if isinstance(node, ast.Dict) else getattr(node, 'elts', [])
+    return [item.value for item in items if isinstance(item, ast.Constant) and isinstance(item.value, str)]
+
+
+def _local_modules(modules, directory):
+    """`modules` that are files in `directory`, plus the local modules they import (recursively)"""
+    found, pending = {}, list(modules)
+    while pending:
+        module = pending.pop()
+        path = os.path.join(directory, f"{module}.py")
+        if module in found or not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as module_file:
+            found[module] = module_file.read()
+        for node in ast.walk(ast.parse(found[module])):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                pending.append(node.module)
+            elif isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+    return found
+
+
+def stage_versions(script_path, configs=None, ignore=IGNORED_NAMES):
+    """
+    {stage: version hash} of every `if checkpoints.runs("<stage>"):` section of the script; the stages
+    of a section gating several of them share its version.
+    configs - {name used in the script: config file} whose contents are part of the version
+    """
+    configs = configs or {}
+    with open(script_path, encoding='utf-8') as script_file:
+        source = script_file.read()
+    tree = ast.parse(source, filename=script_path)
+
+    definitions, imported, collections = {}, {}, {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            definitions.setdefault(node.name, []).append(node)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                for name in _names(target):
+                    definitions.setdefault(name, []).append(node)
+                if isinstance(target, ast.Name) and isinstance(node.value, (ast.Dict, ast.List, ast.Tuple)):
+                    collections[target.id] = _literal_keys(node.value)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            imported.update((alias.asname or alias.name, node.module) for alias in node.names)
+        elif isinstance(node, ast.Import):
+            imported.update((alias.asname or alias.name, alias.name) for alias in node.names)
+
+    versions = {}
+    for node in tree.body:
+        stages = _gated_stages(node, collections)
+        if not stages:
+            continue
+        # Everything the section depends on: top-level definitions (followed recursively),
+        # imported names and config files
+        used, pending = set(), sorted(_names(node) - set(ignore))
+        while pending:
+            name = pending.pop()
+            if name in used:
+                continue
+            used.add(name)
+            for definition in definitions.get(name, []):
+                pending.extend(_names(definition) - set(ignore) - used)
+
+        digest = hashlib.sha256(ast.get_source_segment(source, node).encode())
+        segments = {ast.get_source_segment(source, definition)
+                    for name in used for definition in definitions.get(name, [])}
+        for segment in sorted(segments):
+            digest.update(segment.encode())
+        modules = _local_modules({imported[name] for name in used if name in imported},
+                                 os.path.dirname(os.path.abspath(script_path)))
+        for module in sorted(modules):
+            digest.update(module.encode())
+            digest.update(modules[module].encode())
+        for name in sorted(used & set(configs)):
+            digest.update(file_digest(configs[name]).encode())
+        versions.update(dict.fromkeys(stages, digest.hexdigest()))
+    return versions
+
+
+def _text_column(values):
+    """True for an object column of strings whose missing values are NaN (stored as Arrow strings)"""
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return False
+    return pa.types.is_string(array.type) and not (values.to_numpy() == None).any()
+
+
+def write_frame(df, path):
+    """Writes `df` to `path` + '.arrow' (Arrow IPC) or '.pkl'; returns the file name"""
+    table = None
+    object_columns = [column for column in df.columns if df[column].dtype == object]
+    if pa is not None and all(_text_column(df[column]) for column in object_columns):
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            table = None
+    if table is not None:
+        # Text columns come back as pandas strings; the metadata turns them back into object columns
+        metadata = dict(table.schema.metadata or {}, object_columns=json.dumps(object_columns))
+        table = table.replace_schema_metadata(metadata)
+    file_path = path + ('.arrow' if table is not None else '.pkl')
+    temporary = file_path + '.tmp'
+    if table is not None:
+        with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        with open(temporary, 'wb') as sink:
+            pickle.dump(df, sink, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, file_path)
+    return os.path.basename(file_path)
+
+
+def read_frame(file_path):
+    if file_path.endswith('.arrow'):
+        with pa.OSFile(file_path, 'rb') as source:
+            table = pa.ipc.open_file(source).read_all()
+        df = table.to_pandas()
+        for column in json.loads(table.schema.metadata.get(b'object_columns', b'[]')):
+            df[column] = df[column].astype(object)
+        return df
+    with open(file_path, 'rb') as source:
+        return pickle.load(source)
+
+
+class StageCheckpoints:
+    """
+    Checkpoints of the planned stages of one run.
+    stages   - planned stage names in run order (PipelinePlan.stage_names)
+    inputs   - raw input files or folders; settings - run options that change stage outputs
+    configs  - {name used in the script: config file} (see stage_versions)
+    """
+
+    def __init__(self, cache_dir, stages, script_path, inputs, configs=None, settings=None,
+                 budget_mb=CHECKPOINT_BUDGET_MB, enabled=True):
+        self.cache_dir = cache_dir
+        self.stages = list(stages)
+        self.budget = budget_mb * MB
+        self.enabled = enabled
+        self.keys = {}
+        self.index = {}
+        self.resume_stage = None
+        self.saved = []
+        if not enabled:
+            return
+
+        versions = stage_versions(script_path, configs)
+        ungated = [stage for stage in self.stages if stage not in versions]
+        if ungated:
+            raise ValueError(f"{os.path.basename(script_path)} has no `if checkpoints.runs(...)` "
+                             f"section for the planned stages {ungated}")
+
+        key = hashlib.sha256(json.dumps({
+            'inputs': [file_digest(path) for path in inputs],
+            'settings': settings or {},
+            'libraries': [pd.__version__, np.__version__],
+        }, sort_keys=True, default=str).encode()).hexdigest()
+        for stage in self.stages:
+            key = hashlib.sha256(f"{key}|{stage}|{versions[stage]}".encode()).hexdigest()
+            self.keys[stage] = key
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._read_index()
+        self._evict()
+        self._write_index()
+        for stage in reversed(self.stages):
+            if self.keys[stage] in self.index:
+                self.resume_stage = stage
+                break
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _read_index(self):
+        """Entries of checkpoints.json whose files still exist"""
+        if not os.path.exists(self._index_path()):
+            return {}
+        with open(self._index_path(), encoding='utf-8') as index_file:
+            index = json.load(index_file)
+        return {key: entry for key, entry in index.items()
+                if os.path.exists(os.path.join(self.cache_dir, entry['file']))}
+
+    def _write_index(self):
+        temporary = self._index_path() + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as index_file:
+            json.dump(self.index, index_file, indent=2)
+        os.replace(temporary, self._index_path())
+
+    def runs(self, *stages):
+        """True when any of `stages` is planned and comes after the restored checkpoint"""
+        resumed = -1 if self.resume_stage is None else self.stages.index(self.resume_stage)
+        return any(stage in self.stages and self.stages.index(stage) > resumed for stage in stages)
+
+    def restore(self):
+        """The frame after resume_stage (None when every planned stage has to run)"""
+        if self.resume_stage is None:
+            return None
+        entry = self.index[self.keys[self.resume_stage]]
+        df = read_frame(os.path.join(self.cache_dir, entry['file']))
+        entry['last_used'] = time.time()
+        self._write_index()
+        return df
+
+    def save(self, stage, df):
+        """Writes the frame after `stage`, then evicts down to the disk budget"""
+        if not self.enabled or stage not in self.keys:
+            return
+        key = self.keys[stage]
+        file_name = write_frame(df, os.path.join(self.cache_dir, key))
+        self.index[key] = {'stage': stage, 'file': file_name, 'created': time.time(), 'last_used': time.time(),
+                           'bytes': os.path.getsize(os.path.join(self.cache_dir, file_name))}
+        self.saved.append(stage)
+        self._evict()
+        self._write_index()
+
+    def _evict(self):
+        """Deletes the least recently used checkpoints until the cache fits the budget"""
+        total = sum(entry['bytes'] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.budget:
+                break
+            os.remove(os.path.join(self.cache_dir, entry['file']))
+            del self.index[key]
+            total -= entry['bytes']
+
+    def summary(self):
+        if not self.enabled:
+            return "Stage checkpoints disabled."
+        resumed = f"resumed after '{self.resume_stage}'" if self.resume_stage else "no checkpoint to resume from"
+        cached = sum(entry['bytes'] for entry in self.index.values()) / MB
+        return (f"{resumed}; {len(self.saved)} stages checkpointed; "
+                f"cache: {len(self.index)} files, {cached:.2f} MB of {self.budget / MB:g} MB")
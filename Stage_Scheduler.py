@@ -0,0 +1,213 @@
+"""
+Stage DAG Scheduler for the EG Retail Sales cleaning pipeline
+Runs the stages that touch disjoint columns at the same time, from the columns they declare
+
+Approach:
+1. The (stage, reads, writes) declarations of Column_Planner.STAGES give the dependency DAG: a stage
+   waits for the earlier stages that write a column it reads (read after write), that read a column
+   it writes (write after read) or that write the same column (write after write)
+2. Accumulated columns (DQ_Flags) are the exception: flag bits are ORed, so two stages that set flags
+   do not wait for each other; a stage that reads the flags still waits for the earlier writers
+3. A stage function gets its own frame with the columns it reads (plus the accumulated columns it
+   writes) and cleans it in place, like the script sections do; when it finishes its declared writes
+   are handed to the stages that depend on them. A declared read that is not in the frame, a column
+   it reads without declaring it (KeyError) and a new column it did not declare are errors
+4. Ready stages go to a thread pool (or a process pool) as soon as their dependencies finish, so the
+   critical path of the DAG, not the sum of the stages, sets the wall time
+5. The outputs are written into the frame in declaration order at the end, and what a stage prints
+   is replayed in one block when it finishes, so the output reads like a sequential run
+
+Threads share the GIL: vectorized pandas/numpy work overlaps, Python-level apply() loops mostly do not.
+A process pool sidesteps the GIL but pickles every stage's frame both ways and needs importable
+module-level stage functions. workers=1 runs the stages one at a time in declaration order.
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from Column_Planner import ACCUMULATED_COLUMNS, STAGES, expand_columns
+
+SCHEDULER_WORKERS = min(4, os.cpu_count() or 1)
+
+# How a finished stage's value of an accumulated column is combined with the current one
+ACCUMULATE = {column: np.bitwise_or for column in ACCUMULATED_COLUMNS}
+
+
+class StageGraph:
+    """Dependencies between the stages of `stages` ((stage, reads, writes), in run order)"""
+
+    def __init__(self, stages, accumulated=ACCUMULATED_COLUMNS):
+        self.order = [name for name, _, _ in stages]
+        self.reads = {name: expand_columns(reads) for name, reads, _ in stages}
+        self.writes = {name: list(writes) for name, _, writes in stages}
+        self.dependencies = {name: set() for name in self.order}
+        for position, later in enumerate(self.order):
+            for earlier in self.order[:position]:
+                read_after_write = set(self.reads[later]) & set(self.writes[earlier])
+                write_after_read = set(self.writes[later]) & set(self.reads[earlier])
+                write_after_write = (set(self.writes[later]) & set(self.writes[earlier])) - set(accumulated)
+                if read_after_write or write_after_read or write_after_write:
+                    self.dependencies[later].add(earlier)
+
+    def critical_path(self, durations):
+        """(seconds, stages) of the longest chain of dependent stages"""
+        finish, previous = {}, {}
+        for name in self.order:
+            before = max(self.dependencies[name], key=lambda stage: finish[stage], default=None)
+            finish[name] = durations.get(name, 0.0) + (finish[before] if before else 0.0)
+            previous[name] = before
+        if not finish:
+            return 0.0, []
+        stage = max(finish, key=finish.get)
+        seconds, path = finish[stage], []
+        while stage:
+            path.append(stage)
+            stage = previous[stage]
+        return seconds, path[::-1]
+
+    def describe(self):
+        return '\n'.join(f"{name:<20} after {sorted(self.dependencies[name], key=self.order.index) or '-'}"
+                         for name in self.order)
+
+
+class _StageOutput(io.TextIOBase):
+    """sys.stdout replacement: each worker thread prints into its own buffer"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _run_stage(stage, function, frame):
+    """Runs one stage on its frame; returns the frame, what it printed, its wall time and its CPU time"""
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    buffer = io.StringIO()
+    output = sys.stdout if isinstance(sys.stdout, _StageOutput) else None
+    if output is not None:
+        output.local.buffer = buffer
+    else:
+        # A worker process: its own stdout can simply be swapped
+        sys.stdout, original = buffer, sys.stdout
+    try:
+        function(frame)
+    except KeyError as error:
+        raise KeyError(f"Stage '{stage}' read {error} from a frame of only its declared columns; "
+                       f"declare the column in Column_Planner.STAGES") from error
+    finally:
+        if output is not None:
+            output.local.buffer = None
+        else:
+            sys.stdout = original
+    return frame, buffer.getvalue(), time.perf_counter() - started, time.thread_time() - cpu_started
+
+
+class StageRun:
+    """Wall time per stage and the critical path of one run_stages() call"""
+
+    def __init__(self, graph, durations, cpu_durations, wall_seconds, workers):
+        self.graph = graph
+        self.durations = durations
+        self.cpu_durations = cpu_durations
+        self.wall_seconds = wall_seconds
+        self.workers = workers
+
+    def summary(self):
+        path_seconds, path = self.graph.critical_path(self.durations)
+        lines = [f"{name:<20} {self.durations[name]:8.3f}s  after {sorted(self.graph.dependencies[name], key=self.graph.order.index) or '-'}"
+                 for name in self.graph.order]
+        lines.append(f"Wall time {self.wall_seconds:.3f}s with {self.workers} workers; "
+                     f"sum of stages {sum(self.durations.values()):.3f}s; "
+                     f"critical path {path_seconds:.3f}s: {' -> '.join(path)}")
+        return '\n'.join(lines)
+
+
+def run_stages(df, functions, stages=STAGES, workers=SCHEDULER_WORKERS, processes=False,
+               accumulate=ACCUMULATE, on_stage=None):
+    """
+    Runs `functions` ({stage: function(frame)}) over `df` in dependency order, `workers` at a time,
+    and writes their declared output columns into `df`; returns a StageRun.
+    Only the stages in `functions` are scheduled; the outputs of the others must already be in `df`.
+    on_stage - called as on_stage(stage, frame_in, frame_out, wall_seconds, cpu_seconds) in the
+               calling thread as each stage finishes (e.g. StageProfiler.record)
+    """
+    graph = StageGraph([stage for stage in stages if stage[0] in functions], accumulated=list(accumulate))
+    missing = [stage for stage in functions if stage not in graph.order]
+    if missing:
+        raise ValueError(f"No (stage, reads, writes) declaration for {missing}")
+
+    produced = {}
+
+    def frame_for(stage):
+        columns = graph.reads[stage] + [column for column in graph.writes[stage] if column in accumulate]
+        missing = [column for column in dict.fromkeys(graph.reads[stage])
+                   if column not in produced and column not in df.columns]
+        if missing:
+            raise ValueError(f"Stage '{stage}' reads columns that are not in the frame: {missing}")
+        data = {column: produced[column] if column in produced else df[column]
+                for column in dict.fromkeys(columns) if column in produced or column in df.columns}
+        return pd.DataFrame(data, index=df.index, copy=False)
+
+    def collect(stage, frame, given):
+        undeclared = [column for column in frame.columns if column not in given and column not in graph.writes[stage]]
+        if undeclared:
+            raise ValueError(f"Stage '{stage}' wrote columns it does not declare: {undeclared}")
+        for column in graph.writes[stage]:
+            if column not in frame.columns:
+                continue
+            if column in accumulate:
+                current = produced[column] if column in produced else df[column]
+                produced[column] = pd.Series(accumulate[column](current.to_numpy(), frame[column].to_numpy()),
+                                             index=df.index, name=column)
+            else:
+                produced[column] = frame[column]
+
+    durations, cpu_durations = {}, {}
+    pending = {stage: set(graph.dependencies[stage]) for stage in graph.order}
+    started = time.perf_counter()
+    original_stdout = sys.stdout
+    if not processes:
+        sys.stdout = _StageOutput(original_stdout)
+    try:
+        pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            running = {}
+            while pending or running:
+                for stage in [stage for stage in graph.order if stage in pending and not pending[stage]]:
+                    del pending[stage]
+                    frame = frame_for(stage)
+                    running[pool.submit(_run_stage, stage, functions[stage], frame)] = (stage, list(frame.columns))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda item: graph.order.index(running[item][0])):
+                    stage, given = running.pop(future)
+                    frame, printed, seconds, cpu_seconds = future.result()
+                    original_stdout.write(printed)
+                    durations[stage], cpu_durations[stage] = seconds, cpu_seconds
+                    if on_stage is not None:
+                        on_stage(stage, frame[given], frame, seconds, cpu_seconds)
+                    collect(stage, frame, given)
+                    for dependencies in pending.values():
+                        dependencies.discard(stage)
+    finally:
+        sys.stdout = original_stdout
+
+    # Declaration order, so the frame gets the same column order as a sequential run
+    for stage in graph.order:
+        for column in graph.writes[stage]:
+            if column in produced:
+                df[column] = produced.pop(column)
+    return StageRun(graph, durations, cpu_durations, time.perf_counter() - started, workers)
@@ -0,0 +1,395 @@
+"""
+Synthetic Input Generator for EG Retail Sales Case Study
+Builds Sales_Orders_Raw (plus the lookup sheets) at any scale with the quirks listed in Data_Quality_Report.md
+
+Approach:
+1. Spelling pools (PaymentStatus, Channel, Gender, ...), product rows and located addresses are
+   sampled from the case-study workbook, so every generated spelling is one the cleaner already handles
+2. Orders are generated in vectorized chunks from a seeded numpy Generator: the same
+   (rows, seed, chunk_size) always produces the same data, so benchmark runs are comparable
+3. Each documented quirk is injected at the rate given in QUIRK_RATES
+4. Up to EXCEL_MAX_ROWS the output is an .xlsx workbook like the original; larger inputs are written
+   as a folder with one Parquet file per sheet, chunk by chunk (requires pyarrow)
+
+Usage:
+    python Synthetic_Data_Generator.py --rows 100000 --seed 42 --out Synthetic_100k.xlsx
+    python Synthetic_Data_Generator.py --rows 10000000 --out Synthetic_10M      # Parquet folder
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for inputs larger than one Excel sheet
+    pa = pq = None
+
+from Column_Planner import RAW_SALES_COLUMNS
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "EG_Retail_Sales_Raw_CaseStudy 1.xlsx")
+
+EXCEL_MAX_ROWS = 1_048_575  # one sheet, minus the header row
+DEFAULT_CHUNK_SIZE = 500_000
+ORDERS_PER_CUSTOMER = 4
+MASTER_CUSTOMER_SHARE = 0.4
+MAX_CUSTOMERS = 2_000_000
+
+# Share of rows affected by each quirk (defaults follow Data_Quality_Report.md)
+QUIRK_RATES = {
+    'missing_order_date': 0.08,
+    'missing_delivery_date': 0.167,
+    'delivery_before_order': 0.08,
+    'returned': 0.2,
+    'return_before_delivery': 0.05,
+    'missing_phone': 0.12,
+    'missing_email': 0.147,
+    'broken_email': 0.15,          # no '@' or no top-level domain
+    'missing_customer_id': 0.053,
+    'name_case_variant': 0.3,      # 'AHMED ALI' / 'ahmed ali'
+    'missing_coords': 0.233,
+    'comma_decimal_coords': 0.3,
+    'swapped_coords': 0.007,
+    'out_of_egypt_coords': 0.1,
+    'globally_invalid_coords': 0.007,
+    'bad_quantity': 0.053,         # zero or negative
+    'unit_price_outlier': 0.08,
+    'subtotal_mismatch': 0.3,
+    'missing_subtotal': 0.03,
+    'total_mismatch': 0.253,
+    'currency_with_amount': 0.08,  # 'EGP 1500.0'
+    'missing_shipping_cost': 0.187,
+    'zero_shipping_cost': 0.12,
+    'duplicate_order_id': 0.18,    # OrderID reused by a different order (~30% of rows share an ID)
+    'exact_duplicate_row': 0.02,   # the same order entered twice
+}
+
+# Date string formats and their share of the non-missing dates; 'arabic' = '15 يناير 2024'
+DATE_FORMATS = {'%Y-%m-%d': 0.3, '%d/%m/%Y': 0.2, '%m-%d-%y': 0.2, '%d %b %Y': 0.2, 'arabic': 0.1}
+ARABIC_MONTHS = ['يناير', 'فبراير', 'مارس', 'أبريل', 'مايو', 'يونيو',
+                 'يوليو', 'أغسطس', 'سبتمبر', 'أكتوبر', 'نوفمبر', 'ديسمبر']
+
+# Discount representations: '10%' (percent), '0.1' (rate), '50' (fixed EGP amount), '0'
+DISCOUNT_KINDS = {
+    'zero': (0.15, ['0']),
+    'percent': (0.25, ['5%', '10%', '15%']),
+    'rate': (0.25, ['0.05', '0.1', '0.2']),
+    'fixed': (0.35, ['5', '10', '15', '20']),
+}
+
+CURRENCY_SPELLINGS = {'EGP': 0.12, 'E£': 0.15, 'ج.م': 0.2, 'USD': 0.23}
+SHIPPING_COSTS = [25.0, 50.0, 75.0, 100.0]
+EGP_PER_USD = 45.3575
+DATE_RANGE = (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-12-31'))
+
+CATEGORICAL_POOLS = ['PaymentMethod', 'PaymentStatus', 'ShipperName', 'SalesRep', 'Channel',
+                     'ReturnFlag', 'Status', 'Notes']
+
+
+def _to_number(values):
+    """Float from case-study coordinates ('30,0444' and 30.0444 alike)"""
+    return pd.to_numeric(pd.Series(values, dtype=object).astype(str).str.replace(',', '.', regex=False),
+                         errors='coerce')
+
+
+class SyntheticSalesGenerator:
+    """Holds the pools taken from the template workbook and generates seeded order chunks"""
+
+    def __init__(self, template_path=TEMPLATE_PATH, quirk_rates=None):
+        with pd.ExcelFile(template_path) as workbook:
+            self.template = {name: workbook.parse(name) for name in workbook.sheet_names}
+        self.rates = {**QUIRK_RATES, **(quirk_rates or {})}
+
+        sales = self.template['Sales_Orders_Raw']
+        self.pools = {column: sales[column].to_numpy(dtype=object) for column in CATEGORICAL_POOLS}
+        self.products = sales[['ProductSKU', 'ProductName', 'Category', 'UnitPrice']].reset_index(drop=True)
+
+        # Located addresses: rows whose coordinates parse and fall inside Egypt
+        latitude, longitude = _to_number(sales['Latitude']), _to_number(sales['Longitude'])
+        inside = latitude.between(22, 32) & longitude.between(25, 35)
+        self.places = sales.loc[inside.to_numpy(), ['Governorate', 'City', 'Address']].reset_index(drop=True)
+        self.places['lat'] = latitude[inside].to_numpy()
+        self.places['lon'] = longitude[inside].to_numpy()
+
+        names = pd.concat([sales['CustomerName'], self.template['Customers_Raw']['CustomerName']]).dropna()
+        self.names = names.unique()
+        self.genders = sales['Gender'].to_numpy(dtype=object)
+
+    # ------------------------------------------------------------------
+    # Customers
+    # ------------------------------------------------------------------
+    def customers(self, rows, seed):
+        """Distinct synthetic customers (CustomerID, name, gender, phone, email) for `rows` orders"""
+        rng = np.random.default_rng([seed, 0])
+        n = int(min(max(60, rows // ORDERS_PER_CUSTOMER), MAX_CUSTOMERS))
+        number = np.arange(n)
+
+        customer_id = np.where(rng.random(n) < 0.5,
+                               'C' + pd.Series(number + 1000).astype(str).to_numpy(dtype=object),
+                               'CUS-' + pd.Series(number + 500).astype(str).to_numpy(dtype=object))
+
+        name = pd.Series(rng.choice(self.names, n), dtype=object)
+        variant = rng.random(n) / max(self.rates['name_case_variant'], 1e-9)  # < 0.5 upper, 0.5-1 lower, rest as is
+        name = pd.Series(np.select([variant < 0.5, variant < 1], [name.str.upper(), name.str.lower()], name),
+                         dtype=object)
+
+        # Egyptian mobiles (010/011/012/015 + 8 digits) in the spellings seen in the raw data
+        mobile = ('01' + pd.Series(rng.choice(['0', '1', '2', '5'], n)) +
+                  pd.Series(rng.integers(0, 10 ** 8, n)).astype(str).str.zfill(8))
+        phone_format = rng.integers(0, 4, n)
+        phone = np.select(
+            [phone_format == 0, phone_format == 1, phone_format == 2],
+            ['+20 ' + mobile, '+20' + mobile, mobile.str[:4] + ' ' + mobile.str[4:7] + ' ' + mobile.str[7:]],
+            mobile,
+        )
+
+        local_part = name.str.lower().str.replace(r'\s+', '.', regex=True)
+        domain = rng.choice(['@example.com', '@gmail.com'], n)
+        broken = rng.random(n) < self.rates['broken_email']
+        domain = np.where(broken, rng.choice(['example.com', '@gmail'], n), domain)
+
+        return pd.DataFrame({
+            'CustomerID': customer_id,
+            'CustomerName': name.to_numpy(dtype=object),
+            'Gender': rng.choice(self.genders, n),
+            'Phone': phone.astype(object),
+            'Email': (local_part + domain).to_numpy(dtype=object),
+        })
+
+    def customers_sheet(self, customers, seed):
+        """Customers_Raw: the master subset of the synthetic customers"""
+        rng = np.random.default_rng([seed, 1])
+        master = customers[rng.random(len(customers)) < MASTER_CUSTOMER_SHARE].reset_index(drop=True)
+        place = self.places.iloc[rng.integers(0, len(self.places), len(master))].reset_index(drop=True)
+        return master.assign(Gov=place['Governorate'], City=place['City'], Address=place['Address'])
+
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+    def _format_dates(self, dates, rng):
+        formats = list(DATE_FORMATS)
+        choice = rng.choice(len(formats), len(dates), p=list(DATE_FORMATS.values()))
+        text = pd.Series(None, index=dates.index, dtype=object)
+        for code, fmt in enumerate(formats):
+            mask = (choice == code) & dates.notna().to_numpy()
+            if not mask.any():
+                continue
+            selected = dates[mask]
+            if fmt == 'arabic':
+                text[mask] = (selected.dt.day.astype(str).str.zfill(2) + ' ' +
+                              np.asarray(ARABIC_MONTHS, dtype=object)[selected.dt.month.to_numpy() - 1] + ' ' +
+                              selected.dt.year.astype(str))
+            else:
+                text[mask] = selected.dt.strftime(fmt)
+        return text
+
+    def _coordinates(self, place, rng, n):
+        lat = place['lat'].to_numpy() + rng.normal(0, 0.05, n)
+        lon = place['lon'].to_numpy() + rng.normal(0, 0.05, n)
+
+        out_of_egypt = rng.random(n) < self.rates['out_of_egypt_coords']
+        lat = np.where(out_of_egypt, lat + rng.choice([-12.0, 9.0], n), lat)
+        swapped = rng.random(n) < self.rates['swapped_coords']
+        lat, lon = np.where(swapped, lon, lat), np.where(swapped, lat, lon)
+        invalid = rng.random(n) < self.rates['globally_invalid_coords']
+        lon = np.where(invalid, lon * 10, lon)
+
+        latitude = pd.Series(np.round(lat, 6), dtype=object)
+        longitude = pd.Series(np.round(lon, 6), dtype=object)
+        comma = rng.random(n) < self.rates['comma_decimal_coords']
+        latitude[comma] = pd.Series(np.round(lat[comma], 4)).astype(str).str.replace('.', ',', regex=False).to_numpy()
+        longitude[comma] = pd.Series(np.round(lon[comma], 4)).astype(str).str.replace('.', ',', regex=False).to_numpy()
+
+        missing = rng.random(n) < self.rates['missing_coords']
+        latitude[missing] = np.nan
+        longitude[missing] = np.nan
+        return latitude, longitude
+
+    def orders(self, start, n, seed, customers):
+        """Orders start .. start + n - 1 of the run with `seed` (one chunk)"""
+        rng = np.random.default_rng([seed, 2, start])
+        rates = self.rates
+        index = pd.RangeIndex(start, start + n)
+
+        # --- dates ---
+        span_days = (DATE_RANGE[1] - DATE_RANGE[0]).days
+        order_date = pd.Series(DATE_RANGE[0] + pd.to_timedelta(rng.integers(0, span_days, n), unit='D'), index=index)
+        delivery_days = rng.integers(1, 10, n)
+        delivery_days = np.where(rng.random(n) < rates['delivery_before_order'], -rng.integers(1, 6, n), delivery_days)
+        delivery_date = order_date + pd.to_timedelta(delivery_days, unit='D')
+        return_days = np.where(rng.random(n) < rates['return_before_delivery'], -rng.integers(1, 4, n),
+                               rng.integers(1, 20, n))
+        return_date = (delivery_date + pd.to_timedelta(return_days, unit='D')).where(rng.random(n) < rates['returned'])
+        order_date = order_date.where(rng.random(n) >= rates['missing_order_date'])
+        delivery_date = delivery_date.where(rng.random(n) >= rates['missing_delivery_date'])
+
+        # --- customer, place, product ---
+        customer = customers.iloc[rng.integers(0, len(customers), n)].reset_index(drop=True)
+        customer_id = customer['CustomerID'].where(rng.random(n) >= rates['missing_customer_id'])
+        phone = customer['Phone'].where(rng.random(n) >= rates['missing_phone'])
+        email = customer['Email'].where(rng.random(n) >= rates['missing_email'])
+        place = self.places.iloc[rng.integers(0, len(self.places), n)].reset_index(drop=True)
+        latitude, longitude = self._coordinates(place, rng, n)
+        product = self.products.iloc[rng.integers(0, len(self.products), n)].reset_index(drop=True)
+
+        # --- money ---
+        currency = rng.choice(list(CURRENCY_SPELLINGS), n, p=np.array(list(CURRENCY_SPELLINGS.values())) /
+                              sum(CURRENCY_SPELLINGS.values()))
+        unit_price = product['UnitPrice'].to_numpy() * rng.uniform(0.9, 1.1, n)
+        unit_price = np.where(currency == 'USD', unit_price / EGP_PER_USD, unit_price)
+        unit_price = np.where(rng.random(n) < rates['unit_price_outlier'], unit_price * rng.uniform(10, 100, n), unit_price)
+        unit_price = np.round(unit_price, 2)
+
+        quantity = rng.integers(1, 6, n)
+        quantity = np.where(rng.random(n) < rates['bad_quantity'], rng.integers(-1, 1, n), quantity)
+
+        subtotal = unit_price * quantity
+        subtotal = np.where(rng.random(n) < rates['subtotal_mismatch'], subtotal * rng.uniform(0.5, 1.5, n), subtotal)
+        subtotal = np.where(rng.random(n) < rates['missing_subtotal'], np.nan, np.round(subtotal, 2))
+
+        kinds = list(DISCOUNT_KINDS.values())
+        kind = rng.choice(len(kinds), n, p=[share for share, _ in kinds])
+        discount = np.empty(n, dtype=object)
+        for code, (_, values) in enumerate(kinds):
+            mask = kind == code
+            discount[mask] = rng.choice(values, mask.sum())
+
+        shipping = rng.choice(SHIPPING_COSTS, n)
+        shipping = np.where(rng.random(n) < rates['zero_shipping_cost'], 0.0, shipping)
+        shipping = np.where(rng.random(n) < rates['missing_shipping_cost'], np.nan, shipping)
+
+        total = np.nan_to_num(subtotal) + np.nan_to_num(shipping)
+        total = np.where(rng.random(n) < rates['total_mismatch'], total * rng.uniform(0.8, 1.2, n), total)
+        total = np.round(total, 3)
+        currency_text = pd.Series(currency, dtype=object)
+        with_amount = rng.random(n) < rates['currency_with_amount']
+        currency_text[with_amount] = currency_text[with_amount] + ' ' + pd.Series(total[with_amount]).astype(str).to_numpy()
+
+        chunk = pd.DataFrame({
+            'OrderID': 'SO' + pd.Series(index + 10000, index=index).astype(str),
+            'OrderDate': self._format_dates(order_date, rng),
+            'DeliveryDate': self._format_dates(delivery_date, rng),
+            'CustomerID': customer_id.to_numpy(dtype=object),
+            'CustomerName': customer['CustomerName'].to_numpy(dtype=object),
+            'Gender': customer['Gender'].to_numpy(dtype=object),
+            'Phone': phone.to_numpy(dtype=object),
+            'Email': email.to_numpy(dtype=object),
+            'Governorate': place['Governorate'].to_numpy(dtype=object),
+            'City': place['City'].to_numpy(dtype=object),
+            'Address': place['Address'].to_numpy(dtype=object),
+            'Latitude': latitude.to_numpy(),
+            'Longitude': longitude.to_numpy(),
+            'ProductSKU': product['ProductSKU'].to_numpy(dtype=object),
+            'ProductName': product['ProductName'].to_numpy(dtype=object),
+            'Category': product['Category'].to_numpy(dtype=object),
+            'UnitPrice': unit_price,
+            'Quantity': quantity,
+            'Subtotal': subtotal,
+            'Discount': discount,
+            'TotalAmount': total,
+            'Currency': currency_text.to_numpy(),
+            'PaymentMethod': rng.choice(self.pools['PaymentMethod'], n),
+            'PaymentStatus': rng.choice(self.pools['PaymentStatus'], n),
+            'ShipperName': rng.choice(self.pools['ShipperName'], n),
+            'ShippingCost': shipping,
+            'SalesRep': rng.choice(self.pools['SalesRep'], n),
+            'Channel': rng.choice(self.pools['Channel'], n),
+            'ReturnFlag': rng.choice(self.pools['ReturnFlag'], n),
+            'ReturnDate': self._format_dates(return_date, rng),
+            'Status': rng.choice(self.pools['Status'], n),
+            'Notes': rng.choice(self.pools['Notes'], n),
+        }, index=index)[RAW_SALES_COLUMNS]
+
+        # OrderID reuse: a different order gets the ID of an earlier order of the chunk
+        reused = np.flatnonzero(rng.random(n) < rates['duplicate_order_id'])
+        reused = reused[reused > 0]
+        chunk.iloc[reused, 0] = chunk['OrderID'].to_numpy()[rng.integers(0, reused)]
+
+        # Exact duplicates: the whole earlier row is entered again
+        copied = np.flatnonzero(rng.random(n) < rates['exact_duplicate_row'])
+        copied = copied[copied > 0]
+        positions = np.arange(n)
+        positions[copied] = rng.integers(0, copied)
+        chunk = chunk.iloc[positions]
+        chunk.index = index
+        return chunk
+
+    def generate(self, rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yields (sheet name, DataFrame) for the lookup sheets, then ('Sales_Orders_Raw', chunk) per chunk"""
+        customers = self.customers(rows, seed)
+        yield 'Products_Raw', self.template['Products_Raw']
+        yield 'Governorates_Lookup_Noise', self.template['Governorates_Lookup_Noise']
+        yield 'Customers_Raw', self.customers_sheet(customers, seed)
+        for start in range(0, rows, chunk_size):
+            yield 'Sales_Orders_Raw', self.orders(start, min(chunk_size, rows - start), seed, customers)
+
+
+def _arrow_table(df):
+    """Object columns are written as strings (mixed '30,1' / 30.1 cells cannot share an Arrow type)"""
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    schema = pa.schema([pa.field(f.name, pa.string()) if f.type == pa.null() else f for f in schema])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_synthetic_input(path, rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, template_path=TEMPLATE_PATH,
+                          quirk_rates=None):
+    """
+    Writes a synthetic raw input and returns its path.
+    `path` ending in .xlsx -> one workbook (up to EXCEL_MAX_ROWS orders);
+    anything else       -> a folder with <sheet>.parquet files, written chunk by chunk.
+    """
+    generator = SyntheticSalesGenerator(template_path, quirk_rates)
+    sheets = generator.generate(rows, seed, chunk_size)
+
+    if path.endswith('.xlsx'):
+        if rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"{rows} rows do not fit in one Excel sheet; write a Parquet folder instead")
+        frames = {}
+        for name, frame in sheets:
+            frames.setdefault(name, []).append(frame)
+        with pd.ExcelWriter(path) as writer:
+            for name in ['Sales_Orders_Raw', 'Products_Raw', 'Governorates_Lookup_Noise', 'Customers_Raw']:
+                pd.concat(frames[name]).to_excel(writer, sheet_name=name, index=False)
+        return path
+
+    if pq is None:
+        raise ImportError("pyarrow is required to write Parquet inputs")
+    os.makedirs(path, exist_ok=True)
+    sales_writer = None
+    try:
+        for name, frame in sheets:
+            table = _arrow_table(frame)
+            if name != 'Sales_Orders_Raw':
+                pq.write_table(table, os.path.join(path, f"{name}.parquet"))
+                continue
+            if sales_writer is None:
+                sales_schema = table.schema
+                sales_writer = pq.ParquetWriter(os.path.join(path, 'Sales_Orders_Raw.parquet'), sales_schema)
+            sales_writer.write_table(table.cast(sales_schema))
+    finally:
+        if sales_writer is not None:
+            sales_writer.close()
+    return path
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arguments.add_argument('--rows', type=int, default=10_000)
+    arguments.add_argument('--seed', type=int, default=42)
+    arguments.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    arguments.add_argument('--template', default=TEMPLATE_PATH)
+    arguments.add_argument('--out', required=True, help=".xlsx workbook or folder for Parquet sheets")
+    options = arguments.parse_args()
+
+    path = write_synthetic_input(options.out, options.rows, options.seed, options.chunk_size, options.template)
+    print(f"✅ {options.rows:,} synthetic orders written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Declarative Validation Rules for the EG Retail Sales cleaning pipeline
+Every business rule of Data_Quality_Report.md is declared once and all of them are checked in one pass
+
+Approach:
+1. A rule is a name, a DAMA dimension, a description and a Python expression over column names
+   (e.g. "DeliveryDate < OrderDate"); the expression marks the rows that VIOLATE the rule
+2. RuleSet compiles every expression once and reads the columns it references from the AST;
+   a rule whose columns are not in the frame (a stage skipped in lean mode) is reported as skipped
+3. evaluate() runs all compiled rules over the frame in one pass: each rule is one vectorized
+   column expression, the results go into one boolean matrix (rows × rules)
+4. The ValidationReport gives per-rule violation counts, the violating row labels and the masks,
+   so cleaning steps reuse a mask instead of re-deriving it with another scan and print
+
+Expressions may use the columns, the operators & | ~ < <= == != >= > + - * /, numbers, strings and
+the helpers in RULE_FUNCTIONS. Missing values never count as violations unless a rule asks for
+them with isna().
+A new rule also needs a DQ_Flags bit: add it to Quality_Flags.RULE_FLAG_BITS with the next free bit.
+"""
+
+import ast
+import json
+
+import numpy as np
+import pandas as pd
+
+# Approximate bounding box of Egypt (latitude, longitude)
+EGYPT_BOUNDS = {'lat_min': 22, 'lat_max': 32, 'long_min': 25, 'long_max': 35}
+
+# Row labels per rule kept in the JSON report (the masks in memory keep every row)
+INDEX_SAMPLE_SIZE = 1000
+
+
+def _isna(values):
+    return values.isna()
+
+
+def _notna(values):
+    return values.notna()
+
+
+def _coordinate(values):
+    """Raw Latitude/Longitude text as a number (comma decimal separator allowed, invalid -> NaN)"""
+    return pd.to_numeric(values.astype(str).str.replace(',', '.', regex=False), errors='coerce')
+
+
+def _outside(values, low, high):
+    """True where a present value lies outside [low, high]"""
+    return (values < low) | (values > high)
+
+
+def _mismatch(left, right, tolerance=0.01):
+    """True where both values are present and differ by more than `tolerance`"""
+    return (left - right).abs() > tolerance
+
+
+RULE_FUNCTIONS = {
+    'isna': _isna,
+    'notna': _notna,
+    'coordinate': _coordinate,
+    'outside': _outside,
+    'mismatch': _mismatch,
+}
+
+# Helpers that derive a new column from one column; evaluated once per column and evaluation
+DERIVING_FUNCTIONS = {'coordinate'}
+
+
+def _functions(cache):
+    """RULE_FUNCTIONS, with the deriving helpers memoized in `cache` by (helper, column name)"""
+    functions = dict(RULE_FUNCTIONS)
+    for name in DERIVING_FUNCTIONS:
+        def derived(values, _name=name):
+            key = (_name, values.name)
+            if key not in cache:
+                cache[key] = RULE_FUNCTIONS[_name](values)
+            return cache[key]
+        functions[name] = derived
+    return functions
+
+# (name, dimension, description, expression) - the expression selects the violating rows
+DATA_QUALITY_RULES = [
+    # 1.1 Completeness
+    ('orderdate_missing', 'Completeness', "OrderDate missing or unparseable",
+     "isna(OrderDate)"),
+    ('deliverydate_missing', 'Completeness', "DeliveryDate missing or unparseable",
+     "isna(DeliveryDate)"),
+    # 1.2.1 Date logic
+    ('delivery_before_order', 'Accuracy', "DeliveryDate before OrderDate",
+     "DeliveryDate < OrderDate"),
+    ('return_before_order', 'Accuracy', "ReturnDate before OrderDate",
+     "ReturnDate < OrderDate"),
+    ('return_before_delivery', 'Accuracy', "ReturnDate before DeliveryDate",
+     "ReturnDate < DeliveryDate"),
+    # 1.2.2 Calculations
+    ('subtotal_mismatch', 'Accuracy', "Subtotal ≠ UnitPrice × Quantity",
+     "mismatch(Subtotal, UnitPrice * Quantity)"),
+    ('quantity_not_positive', 'Validity', "Quantity = 0 or negative",
+     "Quantity <= 0"),
+    # 1.2.3 Geography
+    ('coords_outside_global_bounds', 'Accuracy', "Coordinates outside ±90 / ±180",
+     "outside(coordinate(Latitude), -90, 90) | outside(coordinate(Longitude), -180, 180)"),
+    ('coords_outside_egypt', 'Accuracy', "Coordinates outside Egypt (22-32N, 25-35E)",
+     "notna(coordinate(Latitude)) & notna(coordinate(Longitude)) & "
+     "(outside(coordinate(Latitude), lat_min, lat_max) | outside(coordinate(Longitude), long_min, long_max))"),
+    # 1.4 Business rules
+    ('store_with_shipping', 'Validity', "Channel=Store WITH ShippingCost/ShipperName",
+     "(Channel_Clean == 'Store') & (notna(ShipperName) | (ShippingCost > 0))"),
+    ('no_return_with_returndate', 'Validity', "ReturnFlag=No WITH ReturnDate populated",
+     "(ReturnFlag_Clean == 'No') & notna(ReturnDate)"),
+    ('unpaid_delivered', 'Validity', "PaymentStatus=Unpaid WITH Status=Delivered",
+     "(PaymentStatus_Clean == 'Unpaid') & (Status_Clean == 'Delivered')"),
+    ('free_shipping_not_store', 'Validity', "ShippingCost = 0 for non-Store channels",
+     "notna(Channel_Clean) & (Channel_Clean != 'Store') & (ShippingCost == 0)"),
+]
+
+
+class Rule:
+    """One declared rule, compiled once"""
+
+    def __init__(self, name, dimension, description, expression, constants=None):
+        self.name = name
+        self.dimension = dimension
+        self.description = description
+        self.expression = expression
+        tree = ast.parse(expression, mode='eval')
+        names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        self.constants = {key: value for key, value in (constants or {}).items() if key in names}
+        self.columns = sorted(names - set(RULE_FUNCTIONS) - set(self.constants))
+        self.code = compile(tree, f"<rule {name}>", 'eval')
+
+    def mask(self, df, cache=None):
+        """
+        Boolean array of the violating rows of `df` (missing values -> False).
+        cache - shared by the rules of one evaluation so derived columns are computed once
+        """
+        namespace = dict(_functions({} if cache is None else cache), **self.constants)
+        namespace.update((column, df[column]) for column in self.columns)
+        result = eval(self.code, {'__builtins__': {}}, namespace)
+        if np.isscalar(result):
+            return np.full(len(df), bool(result))
+        return pd.Series(result, index=df.index).fillna(False).to_numpy(dtype=bool)
+
+
+class RuleSet:
+    """The compiled rules; evaluate() checks all of them in one pass over a frame"""
+
+    def __init__(self, rules=DATA_QUALITY_RULES, constants=EGYPT_BOUNDS):
+        self.rules = [Rule(*rule, constants=constants) for rule in rules]
+
+    def __getitem__(self, name):
+        for rule in self.rules:
+            if rule.name == name:
+                return rule
+        raise KeyError(f"No validation rule named '{name}'")
+
+    def evaluate(self, df):
+        """ValidationReport of `df`; rules that reference absent columns are skipped"""
+        present = set(df.columns)
+        runnable = [rule for rule in self.rules if present.issuperset(rule.columns)]
+        skipped = [(rule, [column for column in rule.columns if column not in present])
+                   for rule in self.rules if not present.issuperset(rule.columns)]
+
+        matrix = np.zeros((len(df), len(runnable)), dtype=bool)
+        cache = {}
+        for position, rule in enumerate(runnable):
+            matrix[:, position] = rule.mask(df, cache)
+        masks = pd.DataFrame(matrix, index=df.index, columns=[rule.name for rule in runnable])
+        return ValidationReport(runnable, skipped, masks)
+
+
+class ValidationReport:
+    """Per-rule violation masks, counts and row labels of one evaluation"""
+
+    def __init__(self, rules, skipped, masks):
+        """skipped - (rule, missing columns) of the rules that could not run"""
+        self.rules = rules
+        self.skipped = skipped
+        self.masks = masks
+
+    def mask(self, name):
+        """Boolean Series of the rows violating rule `name`"""
+        return self.masks[name]
+
+    def counts(self):
+        return self.masks.sum()
+
+    def indices(self, name):
+        """Row labels violating rule `name`"""
+        return self.masks.index[self.masks[name].to_numpy()]
+
+    def any_violation(self):
+        return self.masks.any(axis=1)
+
+    def summary(self):
+        rows = len(self.masks)
+        summary = pd.DataFrame({
+            'rule': [rule.name for rule in self.rules],
+            'dimension': [rule.dimension for rule in self.rules],
+            'description': [rule.description for rule in self.rules],
+            'violations': self.counts().to_numpy(),
+        })
+        summary['% of rows'] = (summary['violations'] / rows * 100).round(1) if rows else 0.0
+        return summary
+
+    def write_json(self, path, sample_size=INDEX_SAMPLE_SIZE):
+        """Counts, expressions and (the first `sample_size`) violating row labels per rule"""
+        report = {
+            'rows': len(self.masks),
+            'rules': [{
+                'rule': rule.name,
+                'dimension': rule.dimension,
+                'description': rule.description,
+                'expression': rule.expression,
+                'violations': int(self.masks[rule.name].sum()),
+                'rows': [_plain(label) for label in self.indices(rule.name)[:sample_size]],
+            } for rule in self.rules],
+            'skipped': [{'rule': rule.name, 'missing_columns': missing} for rule, missing in self.skipped],
+        }
+        with open(path, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=2)
+
+
+def _plain(label):
+    return label.item() if hasattr(label, 'item') else label